@@ -82,6 +82,17 @@ class ServiceType:
 AVAILABLE_SERVICE_TYPES = [ServiceType.WMS, ServiceType.WMTS, ServiceType.WFS]
 
 
+class EndpointClass:
+    """Classes of Sentinel Hub service endpoints for which metrics are collected separately"""
+
+    OAUTH = "oauth"
+    CONFIGURATION = "configuration"
+    CAPABILITIES = "capabilities"
+    WFS = "wfs"
+    WCS = "wcs"
+    OTHER = "other"
+
+
 class TimeType(Enum):
     """A type of time"""
 
@@ -97,11 +108,55 @@ class ExtentType(Enum):
 
 
 DEFAULT_REQUEST_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+DOWNLOAD_RETRIES = 2
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RESUME_ATTEMPTS = 3
 USER_INFO_REQUEST_TIMEOUT = 1
 
+SESSION_CACHE_SIZE = 10
+SESSION_IDLE_TIMEOUT = 1800
+SESSION_REFRESH_RETRY_DELAY = 10
+
+WCS_MAX_IMAGE_SIZE = 2500
+WCS_DOWNLOAD_WORKERS = 4
+
+BATCH_DOWNLOAD_CONCURRENCY = 2
+BATCH_JOURNAL_FILENAME = ".sentinelhub_batch.json"
+
 VECTOR_LAYER_COLOR_OPACITY = 0.1
 
 COVERAGE_REQUEST_TIMEOUT = 1
 COVERAGE_MAX_BBOX_SIZE = 1000000
+COVERAGE_CELL_SIZE = 100000
+COVERAGE_CACHE_TTL = 3600
+COVERAGE_CACHE_SETTLE_DAYS = 3
+COVERAGE_DOWNLOAD_WORKERS = 4
+COVERAGE_INDEX_SIZE = 1000
+# A maximal number of grid cells requested for a single calendar view, larger views are requested at once
+COVERAGE_MAX_CELL_REQUESTS = 4
+
+WFS_MAX_FEATURES = 100
+
+CONFIGURATION_CACHE_TTL = 600
+CONFIGURATION_PREFETCH_WORKERS = 4
+CAPABILITIES_CACHE_TTL = 24 * 3600
 
 ACTION_COOLDOWN = 1
+
+SETTINGS_FLUSH_DELAY = 1000
+
+CALENDAR_REFRESH_DELAY = 500
+
+# Upper bounds of latency histogram buckets in seconds
+LATENCY_HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# A maximal number of trace events kept in memory
+TRACE_MAX_EVENTS = 20000
+
+# A number of functions in a logged profile summary and a maximal number of kept profile files
+PROFILE_SUMMARY_SIZE = 20
+PROFILE_MAX_FILES = 100
+
+# A number of seconds a background task of a profiled action waits for the action to stop profiling
+PROFILE_TASK_WAIT_TIMEOUT = 5
@@ -6,9 +6,14 @@ import os
 
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QDockWidget
-from PyQt5.uic import loadUiType
 
-FORM_CLASS, _ = loadUiType(os.path.join(os.path.dirname(__file__), "dockwidget.ui"))
+try:
+    # The form is compiled ahead of time when the plugin is built with pb_tool
+    from .dockwidget_base import Ui_SentinelHubDockWidgetBase as FORM_CLASS
+except ImportError:
+    from PyQt5.uic import loadUiType
+
+    FORM_CLASS, _ = loadUiType(os.path.join(os.path.dirname(__file__), "dockwidget_base.ui"))
 
 
 class SentinelHubDockWidget(QDockWidget, FORM_CLASS):
@@ -1,6 +1,7 @@
 """
 Utilities for handling exceptions and error messaging
 """
+import contextlib
 import time
 from abc import ABC, abstractmethod
 
@@ -8,6 +9,8 @@ from qgis.utils import iface
 
 from .constants import ExtentType, MessageType
 from .utils.meta import PLUGIN_NAME
+from .utils.profiling import PROFILER
+from .utils.tracing import TRACER
 
 
 def show_message(message, message_type):
@@ -25,7 +28,8 @@ def action_handler(validators=(), cooldown=0, suppressed_exceptions=()):
     """A decorator for handling plugin actions.
 
     It is designed to handle exceptions, do parameter validations and prevents a method to be called too ofter. It can
-    only be applied to the methods of the main SentinelHubPlugin class
+    only be applied to the methods of the main SentinelHubPlugin class. If profiling of actions is enabled in plugin
+    settings, the action is also profiled, together with background tasks which it submits.
 
     :param validators: A tuple of validators
     :type validators: tuple(BaseValidator)
@@ -51,22 +55,45 @@ class ActionHandler:
         """Method that builds a replacement action method"""
 
         def new_action_method(plugin, *args, **kwargs):
-            try:
-                if self.last_time_called + self.cooldown > time.time():
-                    raise CooldownException(self.cooldown)
-                self.last_time_called = time.time()
+            with TRACER.span(action_method.__name__, category="action"), self._profile(plugin, action_method):
+                try:
+                    if self.last_time_called + self.cooldown > time.time():
+                        raise CooldownException(self.cooldown)
+                    self.last_time_called = time.time()
 
-                for validator in self.validators:
-                    validator().validate(plugin)
+                    for validator in self.validators:
+                        validator().validate(plugin)
 
-                action_method(plugin, *args, **kwargs)
-            except self.suppressed_exceptions:
-                pass
-            except PluginException as exception:
-                show_message(exception.message, exception.message_type)
+                    action_method(plugin, *args, **kwargs)
+                except Exception as exception:  # pylint: disable=broad-except
+                    handle_action_exception(exception, self.suppressed_exceptions)
 
         return new_action_method
 
+    @staticmethod
+    def _profile(plugin, action_method):
+        """Provides a context manager which profiles an action if profiling is enabled"""
+        if plugin.settings.profile_actions == "true":
+            return PROFILER.profile(action_method.__name__)
+        return contextlib.nullcontext()
+
+
+def handle_action_exception(exception, suppressed_exceptions=()):
+    """Handles an exception raised by a plugin action. Actions running in the background should report their
+    exceptions here as well, so that errors are handled in the same way regardless of where an action runs.
+
+    :param exception: An exception raised by an action
+    :type exception: Exception
+    :param suppressed_exceptions: A tuple of exceptions to suppress
+    :type suppressed_exceptions: tuple(Exception)
+    """
+    if isinstance(exception, suppressed_exceptions):
+        return
+    if isinstance(exception, PluginException):
+        show_message(exception.message, exception.message_type)
+        return
+    raise exception
+
 
 class PluginException(Exception):
     """Base class of all custom exceptions defined in the plugin"""
@@ -109,6 +136,13 @@ class DownloadError(PluginException):
         super().__init__(message, MessageType.CRITICAL)
 
 
+class DownloadCancelledError(PluginException):
+    """An error that is raised if a download is cancelled before it is finished"""
+
+    def __init__(self):
+        super().__init__("Download was cancelled", MessageType.INFO)
+
+
 class SessionError(DownloadError):
     """An error that is raised if a session creation fails"""
 
@@ -1,16 +1,18 @@
 """
 The main module
 """
+import functools
 import os
 
-from PyQt5.QtCore import QDate, Qt
-from PyQt5.QtGui import QIcon, QTextCharFormat
+from PyQt5.QtCore import QDate, Qt, QTimer
+from PyQt5.QtGui import QFontDatabase, QIcon, QTextCharFormat
 from PyQt5.QtWidgets import QAction, QFileDialog
 from qgis.core import QgsMessageLog, QgsProject, QgsRasterLayer, QgsVectorLayer
 
 from .constants import (
     ACTION_COOLDOWN,
     AVAILABLE_SERVICE_TYPES,
+    CALENDAR_REFRESH_DELAY,
     COVERAGE_MAX_BBOX_SIZE,
     VECTOR_LAYER_COLOR_OPACITY,
     BaseUrl,
@@ -22,7 +24,6 @@ from .constants import (
     ServiceType,
     TimeType,
 )
-from .dockwidget import SentinelHubDockWidget
 from .exceptions import (
     BBoxTransformError,
     DownloadFolderValidator,
@@ -32,18 +33,23 @@ from .exceptions import (
     action_handler,
     show_message,
 )
-from .sentinelhub.client import Client
-from .sentinelhub.configuration import ConfigurationManager
 from .sentinelhub.ogc import get_service_uri
-from .sentinelhub.wcs import download_wcs_image
-from .sentinelhub.wfs import get_cloud_cover
 from .settings import Settings
 from .utils.common import is_float_or_undefined
-from .utils.geo import bbox_to_string, get_bbox, get_custom_bbox, is_bbox_too_large, is_current_map_crs
+from .utils.geo import (
+    bbox_to_string,
+    clear_transform_cache,
+    get_bbox,
+    get_custom_bbox,
+    is_bbox_too_large,
+    is_current_map_crs,
+)
 from .utils.map import get_qgis_layers, set_layer_fill_color_opacity
 from .utils.meta import PLUGIN_NAME, get_plugin_version
+from .utils.metrics import METRICS
 from .utils.naming import get_qgis_layer_name
-from .utils.time import get_month_time_interval, parse_date
+from .utils.tasks import TaskRunner
+from .utils.tracing import TRACER
 
 
 class SentinelHubPlugin:
@@ -56,9 +62,16 @@ class SentinelHubPlugin:
 
     Any other public method is connected to UI and can be triggered by a user's action in QGIS. Non-public methods are
     the ones that are only called by other methods.
+
+    Actions that have to wait for Sentinel Hub service do so in background tasks. Once a task is finished, its result
+    is applied to UI by a corresponding non-public `_apply_*` method, unless the user has meanwhile moved on.
+
+    Modules with UI and network dependencies are imported only once they are needed. This way the plugin doesn't slow
+    down QGIS startup.
     """
 
     # pylint: disable=too-many-public-methods
+    # pylint: disable=import-outside-toplevel
 
     ICON_PATH = ":/plugins/SentinelHub/favicon.ico"
 
@@ -75,10 +88,13 @@ class SentinelHubPlugin:
         self.dockwidget = None
 
         self.settings = Settings()
-        self.client = Client()
+        self.client = None
         self.manager = None
+        self.task_runner = TaskRunner()
 
         self._default_layer_selection_event = None
+        self._calendar_refresh_timer = None
+        self._is_calendar_outdated = False
 
     def initGui(self):
         """This method is called by QGIS when the main GUI starts up or when the plugin is enabled in the
@@ -96,6 +112,9 @@ class SentinelHubPlugin:
 
         self.plugin_actions.append(action)
 
+        # Cached coordinate transforms depend on the project transform context
+        QgsProject.instance().transformContextChanged.connect(clear_transform_cache)
+
     def unload(self):
         """This is called by QGIS when a user disables or uninstalls the plugin. This method removes the plugin and
         it's icon from everywhere it appears in QGIS GUI.
@@ -103,6 +122,16 @@ class SentinelHubPlugin:
         if self.dockwidget:
             self.dockwidget.close()
 
+        self.settings.flush()
+
+        self.task_runner.cancel_all()
+        if self.client is not None:
+            self.client.close()
+            self.client.clear_sessions()
+
+        QgsProject.instance().transformContextChanged.disconnect(clear_transform_cache)
+        clear_transform_cache()
+
         for action in self.plugin_actions:
             self.iface.removePluginWebMenu(PLUGIN_NAME, action)
             self.iface.removeToolBarIcon(action)
@@ -113,10 +142,23 @@ class SentinelHubPlugin:
         if self.dockwidget is not None:
             return
 
+        from .dockwidget import SentinelHubDockWidget
+        from .sentinelhub.client import Client
+
+        if self.client is None:
+            self.client = Client()
+
         self.dockwidget = SentinelHubDockWidget()
         self.dockwidget.setWindowTitle(f"{PLUGIN_NAME} plugin v{get_plugin_version()}")
         self.initialize_ui()
 
+        self._connect_signals()
+
+        self.iface.addDockWidget(Qt.BottomDockWidgetArea, self.dockwidget)
+        self.dockwidget.show()
+
+    def _connect_signals(self):
+        """Binds all UI actions of the dock widget"""
         # Login widget
         self.dockwidget.loginPushButton.clicked.connect(self.login)
 
@@ -148,6 +190,14 @@ class SentinelHubPlugin:
         # Tracks which layer is selected in left menu
         self.iface.currentLayerChanged.connect(self.update_current_map_layers)
 
+        # Refreshes available dates once the map canvas stops moving
+        self._calendar_refresh_timer = QTimer()
+        self._calendar_refresh_timer.setSingleShot(True)
+        self._calendar_refresh_timer.setInterval(CALENDAR_REFRESH_DELAY)
+        self._calendar_refresh_timer.timeout.connect(self.update_available_calendar_dates)
+        self.iface.mapCanvas().extentsChanged.connect(self.schedule_calendar_refresh)
+        self.dockwidget.tabWidget.currentChanged.connect(self.refresh_outdated_calendar)
+
         # Download widget
         self.dockwidget.imageFormatComboBox.activated.connect(self.update_download_format)
 
@@ -168,12 +218,18 @@ class SentinelHubPlugin:
 
         self.dockwidget.downloadPushButton.clicked.connect(self.download_caption)
 
+        # Diagnostics widget
+        self.dockwidget.tabWidget.currentChanged.connect(self.update_diagnostics)
+        self.dockwidget.refreshDiagnosticsPushButton.clicked.connect(self.update_diagnostics)
+        self.dockwidget.resetDiagnosticsPushButton.clicked.connect(self.reset_diagnostics)
+        self.dockwidget.exportDiagnosticsPushButton.clicked.connect(self.export_diagnostics)
+        self.dockwidget.exportTracePushButton.clicked.connect(self.export_trace)
+        self.dockwidget.prefetchLayersCheckBox.stateChanged.connect(self.change_prefetch_layers)
+        self.dockwidget.profileActionsCheckBox.stateChanged.connect(self.change_profile_actions)
+
         # Close event
         self.dockwidget.closingPlugin.connect(self.on_close_plugin)
 
-        self.iface.addDockWidget(Qt.BottomDockWidgetArea, self.dockwidget)
-        self.dockwidget.show()
-
     def initialize_ui(self):
         """Initializes and resets entire UI"""
         self.dockwidget.clientIdLineEdit.setText(self.settings.client_id)
@@ -189,6 +245,9 @@ class SentinelHubPlugin:
         self.dockwidget.startTimeLineEdit.setText(self.settings.start_time)
         self.dockwidget.endTimeLineEdit.setText(self.settings.end_time)
         self.dockwidget.calendarSpacer.hide()
+        self.dockwidget.diagnosticsTextEdit.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.dockwidget.prefetchLayersCheckBox.setChecked(self.settings.prefetch_layers == "true")
+        self.dockwidget.profileActionsCheckBox.setChecked(self.settings.profile_actions == "true")
 
         self.dockwidget.priorityComboBox.addItems([priority.nice_name for priority in ImagePriority])
         priorities = [priority.url_param for priority in ImagePriority]
@@ -215,13 +274,31 @@ class SentinelHubPlugin:
     @action_handler(cooldown=ACTION_COOLDOWN)
     def login(self, *_):
         """Uses credentials to connect to Sentinel Hub services and updates"""
-        new_settings = self.settings.copy()
+        from .sentinelhub.configuration import ConfigurationManager
+
+        new_settings = self.settings.copy(auto_save=False)
         self._load_new_credentials(new_settings)
 
-        new_manager = ConfigurationManager(new_settings, self.client)
-        configurations = new_manager.get_configurations(reload=True)
+        if self.manager is not None and self.manager.settings.base_url != new_settings.base_url:
+            # Connections to the previous deployment won't be needed anymore
+            self.client.close()
 
-        self.settings = new_settings
+        new_manager = ConfigurationManager(new_settings, self.client)
+        self.task_runner.run(
+            "Logging in to Sentinel Hub",
+            lambda _: new_manager.get_configurations(reload=True),
+            lambda configurations: self._apply_login(new_settings, new_manager, configurations),
+            key="login",
+        )
+
+    def _apply_login(self, new_settings, new_manager, configurations):
+        """Applies a successful login and shows obtained configurations
+
+        Only the credentials are taken from the settings used for login, so that any other setting changed while
+        logging in is kept.
+        """
+        self.settings.update_credentials(new_settings)
+        new_manager.settings = self.settings
         self.manager = new_manager
         self.settings.save_credentials()
 
@@ -233,12 +310,43 @@ class SentinelHubPlugin:
         self.dockwidget.loginInfoLabel.setText(login_text)
 
         configuration_names = [configuration.name for configuration in configurations]
-        self.dockwidget.configurationComboBox.addItems(configuration_names)
+        self._fill_combo_box(self.dockwidget.configurationComboBox, configuration_names)
         configuration_index = self.manager.get_configuration_index(self.settings.instance_id)
         self.update_configuration(configuration_index)
 
         show_message("Login successful", MessageType.SUCCESS)
 
+        if self.settings.prefetch_layers == "true":
+            self.task_runner.run(
+                "Loading layers of all Sentinel Hub configurations",
+                lambda task: new_manager.prefetch_layers(is_cancelled=task.isCanceled),
+                lambda _: None,
+                key="layers_prefetch",
+            )
+
+        if new_manager.needs_revalidation():
+            self.task_runner.run(
+                "Refreshing Sentinel Hub configurations",
+                lambda _: new_manager.get_configurations(revalidate=True),
+                lambda configurations: self._apply_revalidated_configurations(new_manager, configurations),
+                key="configurations_revalidation",
+            )
+
+    def _apply_revalidated_configurations(self, manager, configurations):
+        """Updates the list of configurations if it changed since it was shown from the cache"""
+        combo_box = self.dockwidget.configurationComboBox
+        configuration_names = [configuration.name for configuration in configurations]
+        if manager is not self.manager or configuration_names == self._get_combo_box_items(combo_box):
+            return
+
+        self._fill_combo_box(combo_box, configuration_names)
+
+        configuration_index = manager.get_configuration_index(self.settings.instance_id)
+        if configuration_index < 0:
+            self.update_configuration(configuration_index)
+        else:
+            combo_box.setCurrentIndex(configuration_index)
+
     def _load_new_credentials(self, settings):
         """Loads new credentials into settings"""
         settings.base_url = self.dockwidget.serviceUrlLineEdit.currentText()
@@ -256,16 +364,69 @@ class SentinelHubPlugin:
             self.settings.instance_id = ""
             return
 
-        self.settings.instance_id = self.manager.get_configurations()[configuration_index].id
+        instance_id = self.manager.get_configurations()[configuration_index].id
+        self.settings.instance_id = instance_id
 
         self.dockwidget.layersComboBox.clear()
-        layers = self.manager.get_layers(self.settings.instance_id)
-        self.dockwidget.layersComboBox.addItems([layer.name for layer in layers])
-        layer_index = self.manager.get_layer_index(self.settings.instance_id, self.settings.layer_id)
+        self.dockwidget.crsComboBox.clear()
+
+        manager = self.manager
+
+        def load_configuration(_):
+            layers = manager.get_layers(instance_id)
+            manager.get_available_crs()
+            return layers
+
+        self.task_runner.run(
+            "Loading Sentinel Hub configuration",
+            load_configuration,
+            lambda layers: self._apply_configuration(manager, instance_id, layers),
+            key="configuration",
+        )
+
+    def _apply_configuration(self, manager, instance_id, layers):
+        """Shows layers and CRS of a loaded configuration"""
+        if manager is not self.manager or instance_id != self.settings.instance_id:
+            return
+
+        self._fill_combo_box(self.dockwidget.layersComboBox, [layer.name for layer in layers])
+        layer_index = self.manager.get_layer_index(instance_id, self.settings.layer_id)
         self.update_layer(layer_index)
 
         self._update_available_crs()
 
+        if manager.needs_revalidation(instance_id):
+            self.task_runner.run(
+                "Refreshing Sentinel Hub layers",
+                lambda _: manager.get_layers(instance_id, revalidate=True),
+                lambda layers: self._apply_revalidated_layers(manager, instance_id, layers),
+                key="layers_revalidation",
+            )
+
+    def _apply_revalidated_layers(self, manager, instance_id, layers):
+        """Updates the list of layers if it changed since it was shown from the cache"""
+        combo_box = self.dockwidget.layersComboBox
+        layer_names = [layer.name for layer in layers]
+        if manager is not self.manager or instance_id != self.settings.instance_id:
+            return
+        if layer_names == self._get_combo_box_items(combo_box):
+            return
+
+        self._fill_combo_box(combo_box, layer_names)
+        self.update_layer(manager.get_layer_index(instance_id, self.settings.layer_id))
+
+    @staticmethod
+    def _get_combo_box_items(combo_box):
+        """Provides texts of all items in a combo box"""
+        return [combo_box.itemText(index) for index in range(combo_box.count())]
+
+    @staticmethod
+    def _fill_combo_box(combo_box, items):
+        """Replaces all items of a combo box"""
+        with TRACER.span(f"fill {combo_box.objectName()}", category="ui", items=len(items)):
+            combo_box.clear()
+            combo_box.addItems(items)
+
     @action_handler()
     def update_service_type(self, service_type=None):
         """Update service type and content that depends on it"""
@@ -340,8 +501,7 @@ class SentinelHubPlugin:
 
     def _update_available_crs(self):
         """Updates the list of available CRS"""
-        self.dockwidget.crsComboBox.clear()
-        self.dockwidget.crsComboBox.addItems([crs.name for crs in self.manager.get_available_crs()])
+        self._fill_combo_box(self.dockwidget.crsComboBox, [crs.name for crs in self.manager.get_available_crs()])
         crs_index = self.manager.get_crs_index(self.settings.crs)
         self.update_crs(crs_index)
 
@@ -355,6 +515,8 @@ class SentinelHubPlugin:
 
     def update_dates(self):
         """Checks if newly inserted dates are valid and updates date attributes"""
+        from .utils.time import parse_date
+
         new_start_time = parse_date(self.dockwidget.startTimeLineEdit.text())
         new_end_time = parse_date(self.dockwidget.endTimeLineEdit.text())
 
@@ -408,14 +570,39 @@ class SentinelHubPlugin:
         else:
             show_message("Start date must not be later than end date", MessageType.INFO)
 
+    def schedule_calendar_refresh(self, *_):
+        """Refreshes available dates after the map canvas extent hasn't changed for a while. A refresh that is still
+        running is cancelled right away because it is for an outdated extent. If the calendar isn't visible, it is
+        only marked as outdated and refreshed once it is shown again."""
+        self.task_runner.cancel("calendar")
+
+        if not self.dockwidget.calendarWidget.isVisible():
+            self._calendar_refresh_timer.stop()
+            self._is_calendar_outdated = True
+            return
+
+        self._calendar_refresh_timer.start()
+
+    def refresh_outdated_calendar(self, *_):
+        """Refreshes available dates if the map canvas extent changed while the calendar wasn't visible"""
+        if self._is_calendar_outdated and self.dockwidget.calendarWidget.isVisible():
+            self.update_available_calendar_dates()
+
     @action_handler(suppressed_exceptions=(BBoxTransformError,))
     def update_available_calendar_dates(self, *_):
         """For the current extent, current layer and current month it will find all days for which there is available
         data for that layer
         """
+        # Any scheduled refresh would be redundant
+        self._calendar_refresh_timer.stop()
+        self._is_calendar_outdated = False
+
         if self.manager is None or not self.settings.instance_id or not self.settings.layer_id:
             return
 
+        from .sentinelhub.wfs import get_cloud_cover
+        from .utils.time import get_month_time_interval
+
         self._clear_calendar_cells()
 
         bbox = get_bbox(CrsType.POP_WEB)
@@ -426,8 +613,41 @@ class SentinelHubPlugin:
         month = self.dockwidget.calendarWidget.monthShown()
         time_interval = get_month_time_interval(year, month)
 
-        layer = self.manager.get_layer(self.settings.instance_id, self.settings.layer_id, load_url=True)
-        cloud_cover_map = get_cloud_cover(self.settings, layer, bbox, time_interval, self.client)
+        settings = self.settings.copy(auto_save=False)
+        manager, client = self.manager, self.client
+
+        def load_cloud_cover(task):
+            layer = manager.get_layer(settings.instance_id, settings.layer_id, load_url=True)
+            return get_cloud_cover(
+                settings,
+                layer,
+                bbox,
+                time_interval,
+                client,
+                partial_result_callback=task.report_partial_result,
+                is_cancelled=task.isCanceled,
+            )
+
+        def apply_cloud_cover(cloud_cover_map):
+            self._apply_calendar_dates(settings.layer_id, year, month, cloud_cover_map)
+
+        self.task_runner.run(
+            "Loading available dates",
+            load_cloud_cover,
+            apply_cloud_cover,
+            key="calendar",
+            suppressed_exceptions=(BBoxTransformError,),
+            on_partial_result=apply_cloud_cover,
+        )
+
+    def _apply_calendar_dates(self, layer_id, year, month, cloud_cover_map):
+        """Highlights calendar cells of dates with available data. It can be applied multiple times as more data is
+        obtained."""
+        calendar = self.dockwidget.calendarWidget
+        if (layer_id, year, month) != (self.settings.layer_id, calendar.yearShown(), calendar.monthShown()):
+            return
+
+        self._clear_calendar_cells()
 
         for date, cloud_cover_percentage in cloud_cover_map.items():
             if cloud_cover_percentage <= int(self.settings.maxcc):
@@ -458,15 +678,36 @@ class SentinelHubPlugin:
         """An action that creates and adds a new QGIS layer to the Layers menu"""
         self._create_and_add_qgis_layer()
 
-    def _create_and_add_qgis_layer(self):
+    def _create_and_add_qgis_layer(self, on_layer_added=None):
+        """Loads info about the chosen layer and its data source in a background task. Then it creates and adds a new
+        QGIS layer. Only the latest of such tasks is applied and it is cancelled once the plugin is closed.
+
+        :param on_layer_added: A function which receives a new QGIS layer once it is added
+        :type on_layer_added: callable or None
+        """
+        settings = self.settings.copy(auto_save=False)
+        manager = self.manager
+
+        def add_layer(layer):
+            new_layer = self._add_qgis_layer(settings, layer)
+            if new_layer and on_layer_added is not None:
+                on_layer_added(new_layer)
+
+        self.task_runner.run(
+            "Loading Sentinel Hub layer",
+            lambda _: manager.get_layer(settings.instance_id, settings.layer_id, load_url=True),
+            add_layer,
+            key="qgis_layer",
+        )
+
+    def _add_qgis_layer(self, settings, layer):
         """Creates, adds and returns a new QGIS layer"""
-        layer = self.manager.get_layer(self.settings.instance_id, self.settings.layer_id, load_url=True)
-        qgis_layer_name = get_qgis_layer_name(self.settings, layer)
+        qgis_layer_name = get_qgis_layer_name(settings, layer)
 
-        service_uri = get_service_uri(self.settings, layer)
+        service_uri = get_service_uri(settings, layer)
         QgsMessageLog.logMessage(str(service_uri))
 
-        if self.settings.service_type.upper() == ServiceType.WFS:
+        if settings.service_type.upper() == ServiceType.WFS:
             new_layer = QgsVectorLayer(service_uri, qgis_layer_name, ServiceType.WFS)
             set_layer_fill_color_opacity(new_layer, VECTOR_LAYER_COLOR_OPACITY)
         else:
@@ -476,7 +717,7 @@ class SentinelHubPlugin:
             show_message(f"Failed to create layer {qgis_layer_name}.", MessageType.CRITICAL)
             return None
 
-        if self.settings.service_type.upper() == ServiceType.WFS and not is_current_map_crs(CrsType.POP_WEB):
+        if settings.service_type.upper() == ServiceType.WFS and not is_current_map_crs(CrsType.POP_WEB):
             show_message(
                 (
                     "WFS layer will only be visible if the underlying CRS on your map is set to "
@@ -500,23 +741,23 @@ class SentinelHubPlugin:
         for layer in get_qgis_layers():
             if layer.name() == chosen_layer_name:
                 self.iface.setActiveLayer(layer)
-                new_layer = self._create_and_add_qgis_layer()
-
-                if new_layer:
-                    QgsProject.instance().removeMapLayer(layer)
-                    self.update_current_map_layers(selected_layer=new_layer)
+                self._create_and_add_qgis_layer(on_layer_added=functools.partial(self._replace_qgis_layer, layer.id()))
                 return
 
         show_message(f"Chosen layer {chosen_layer_name} does not exist anymore", MessageType.INFO)
         self.update_current_map_layers()
 
+    def _replace_qgis_layer(self, layer_id, new_layer):
+        """Removes an existing QGIS layer, if it still exists, and selects a new layer instead of it"""
+        QgsProject.instance().removeMapLayer(layer_id)
+        self.update_current_map_layers(selected_layer=new_layer)
+
     def update_current_map_layers(self, selected_layer=None):
         """Updates the list of QGIS layers available in the combo box"""
         qgis_layers = get_qgis_layers()
         layer_names = [layer.name() for layer in qgis_layers]
 
-        self.dockwidget.mapLayerComboBox.clear()
-        self.dockwidget.mapLayerComboBox.addItems(layer_names)
+        self._fill_combo_box(self.dockwidget.mapLayerComboBox, layer_names)
 
         if selected_layer and selected_layer in qgis_layers:
             layer_index = qgis_layers.index(selected_layer)
@@ -610,13 +851,89 @@ class SentinelHubPlugin:
     )
     def download_caption(self, *_):
         """Downloads an image from given parameters"""
-        layer = self.manager.get_layer(self.settings.instance_id, self.settings.layer_id, load_url=True)
+        from .sentinelhub.wcs import download_wcs_image
 
         is_current_extent = self.settings.download_extent_type is ExtentType.CURRENT
         bbox = get_bbox(self.settings.crs) if is_current_extent else get_custom_bbox(self.settings)
 
-        filename = download_wcs_image(self.settings, layer, bbox, self.client)
-        show_message(f"Image downloaded to file {filename}", MessageType.SUCCESS)
+        settings = self.settings.copy(auto_save=False)
+        manager, client = self.manager, self.client
+
+        def download_image(task):
+            layer = manager.get_layer(settings.instance_id, settings.layer_id, load_url=True)
+            return download_wcs_image(
+                settings,
+                layer,
+                bbox,
+                client,
+                progress_callback=task.set_download_progress,
+                is_cancelled=task.isCanceled,
+            )
+
+        self.task_runner.run(
+            "Downloading Sentinel Hub image",
+            download_image,
+            lambda filename: show_message(f"Image downloaded to file {filename}", MessageType.SUCCESS),
+        )
+
+    def update_diagnostics(self, *_):
+        """Shows current metrics of requests and caches, but only if the diagnostics tab is open"""
+        if self.dockwidget.tabWidget.currentWidget() is not self.dockwidget.diagnosticsTab:
+            return
+
+        self.dockwidget.diagnosticsTextEdit.setPlainText(METRICS.format_summary())
+
+    def reset_diagnostics(self):
+        """Starts collecting metrics and traces from scratch"""
+        METRICS.reset()
+        TRACER.clear()
+        self.update_diagnostics()
+
+    def export_diagnostics(self):
+        """Exports metrics of requests and caches into a JSON or a CSV file"""
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self.dockwidget, "Export diagnostics", "", "JSON (*.json);;CSV (*.csv)"
+        )
+        if not path:
+            return
+
+        if not path.lower().endswith((".json", ".csv")):
+            path += ".csv" if selected_filter.startswith("CSV") else ".json"
+        content = METRICS.to_csv() if path.lower().endswith(".csv") else METRICS.to_json()
+
+        try:
+            with open(path, "w", newline="") as fp:
+                fp.write(content)
+        except OSError as exception:
+            show_message(f"Failed to export diagnostics to file {path}: {exception}", MessageType.CRITICAL)
+            return
+        show_message(f"Diagnostics exported to file {path}", MessageType.SUCCESS)
+
+    def export_trace(self):
+        """Exports traces of recent actions into a JSON file in Chrome trace-event format, which can be opened in
+        chrome://tracing or in Perfetto"""
+        path, _ = QFileDialog.getSaveFileName(self.dockwidget, "Export trace", "", "JSON (*.json)")
+        if not path:
+            return
+
+        if not path.lower().endswith(".json"):
+            path += ".json"
+
+        try:
+            with open(path, "w") as fp:
+                fp.write(TRACER.to_chrome_trace())
+        except OSError as exception:
+            show_message(f"Failed to export trace to file {path}: {exception}", MessageType.CRITICAL)
+            return
+        show_message(f"Trace exported to file {path}", MessageType.SUCCESS)
+
+    def change_prefetch_layers(self):
+        """Determines if layers of all configurations will be loaded in the background after login"""
+        self.settings.prefetch_layers = "true" if self.dockwidget.prefetchLayersCheckBox.isChecked() else "false"
+
+    def change_profile_actions(self):
+        """Determines if plugin actions will be profiled"""
+        self.settings.profile_actions = "true" if self.dockwidget.profileActionsCheckBox.isChecked() else "false"
 
     def on_close_plugin(self):
         """Cleanup necessary items here when a close event on the dockwidget is triggered
@@ -625,7 +942,18 @@ class SentinelHubPlugin:
         """
         self._load_new_credentials(self.settings)
         self.settings.save_credentials()
-
+        self.settings.flush()
+
+        self.task_runner.cancel("login")
+        self.task_runner.cancel("configurations_revalidation")
+        self.task_runner.cancel("configuration")
+        self.task_runner.cancel("layers_revalidation")
+        self.task_runner.cancel("layers_prefetch")
+        self.task_runner.cancel("calendar")
+        self.task_runner.cancel("qgis_layer")
+
+        self._calendar_refresh_timer.stop()
+        self.iface.mapCanvas().extentsChanged.disconnect(self.schedule_calendar_refresh)
         self.iface.currentLayerChanged.disconnect(self.update_current_map_layers)
 
         self.dockwidget.closingPlugin.disconnect(self.on_close_plugin)
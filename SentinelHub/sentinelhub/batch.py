@@ -0,0 +1,254 @@
+"""
+Module for downloading batches of images from Sentinel Hub WCS service
+"""
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from qgis.core import QgsRectangle
+
+from ..constants import BATCH_DOWNLOAD_CONCURRENCY, BATCH_JOURNAL_FILENAME, ExtentType
+from ..exceptions import DownloadCancelledError, PluginException
+from .wcs import download_wcs_image, get_wcs_filename
+
+
+class BatchItemStatus(Enum):
+    """A status of a single batch item"""
+
+    PENDING = "pending"
+    DONE = "done"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+
+class BatchItem:
+    """Stores info about a single image of a batch download"""
+
+    def __init__(self, layer, date, bbox, extent_type, status=BatchItemStatus.PENDING, error=None):
+        """
+        :param layer: A layer with a loaded data source info
+        :type layer: Layer
+        :param date: A date in a form YYYY-MM-DD or None for time independent layers
+        :type date: str or None
+        :param bbox: A bbox of an image. Its CRS is defined by the extent type in the same way as for a single download
+        :type bbox: QgsRectangle
+        :param extent_type: A type of extent
+        :type extent_type: ExtentType
+        :param status: A status of the item
+        :type status: BatchItemStatus
+        :param error: An error message if the item failed
+        :type error: str or None
+        """
+        self.layer = layer
+        self.date = date
+        self.bbox = bbox
+        self.extent_type = extent_type
+        self.status = status
+        self.error = error
+
+    @property
+    def key(self):
+        """A string uniquely identifying the item within a batch"""
+        bbox_coords = (self.bbox.xMinimum(), self.bbox.yMinimum(), self.bbox.xMaximum(), self.bbox.yMaximum())
+        return "|".join([self.layer.id, self.date or "", self.extent_type.value, *map(repr, bbox_coords)])
+
+    def to_json(self):
+        """Provides a JSON-serializable representation of the item"""
+        return {
+            "layer_id": self.layer.id,
+            "date": self.date,
+            "bbox": [self.bbox.xMinimum(), self.bbox.yMinimum(), self.bbox.xMaximum(), self.bbox.yMaximum()],
+            "extent_type": self.extent_type.value,
+            "status": self.status.value,
+            "error": self.error,
+        }
+
+    @classmethod
+    def load(cls, payload, layer):
+        """Creates an instance of the class from a journal payload"""
+        return cls(
+            layer=layer,
+            date=payload["date"],
+            bbox=QgsRectangle(*payload["bbox"]),
+            extent_type=ExtentType(payload["extent_type"]),
+            status=BatchItemStatus(payload["status"]),
+            error=payload.get("error"),
+        )
+
+
+class BatchJob:
+    """Downloads a Cartesian product of layers, dates and extents
+
+    Progress of a job is tracked in a journal file in the download folder. The journal is rewritten atomically after
+    each finished item, therefore a job interrupted in any way can be resumed with `BatchJob.resume`. Items which are
+    marked as done in the journal are skipped. Items whose image file already exists are skipped without a request,
+    because downloads are written to a temporary file and only renamed once complete.
+    """
+
+    _JOB_SETTINGS_PARAMETERS = (
+        "instance_id",
+        "crs",
+        "maxcc",
+        "priority",
+        "image_format",
+        "resx",
+        "resy",
+        "show_logo",
+        "download_folder",
+    )
+
+    def __init__(self, settings, items, client, concurrency=BATCH_DOWNLOAD_CONCURRENCY):
+        """
+        :param settings: Settings with download parameters shared by all items
+        :type settings: Settings
+        :param items: A list of batch items
+        :type items: list(BatchItem)
+        :param client: An instance of a client for download from Sentinel Hub
+        :type client: Client
+        :param concurrency: A maximal number of images downloaded at the same time
+        :type concurrency: int
+        """
+        self.settings = settings.copy(auto_save=False)
+        self.items = items
+        self.client = client
+        self.concurrency = concurrency
+
+        self._journal_lock = threading.Lock()
+
+    @property
+    def journal_path(self):
+        """A path to the journal file of the job"""
+        return os.path.join(self.settings.download_folder, BATCH_JOURNAL_FILENAME)
+
+    @classmethod
+    def from_product(cls, settings, layers, dates, extents, client, concurrency=BATCH_DOWNLOAD_CONCURRENCY):
+        """Creates a job from all combinations of given layers, dates and extents
+
+        :param layers: A list of layers with loaded data source info
+        :type layers: list(Layer)
+        :param dates: A list of dates in a form YYYY-MM-DD
+        :type dates: list(str)
+        :param extents: A list of pairs of a bbox and its extent type
+        :type extents: list(tuple(QgsRectangle, ExtentType))
+        """
+        items = {}
+        for layer, date, (bbox, extent_type) in itertools.product(layers, dates, extents):
+            item = BatchItem(layer, None if layer.data_source.is_timeless() else date, bbox, extent_type)
+            items.setdefault(item.key, item)
+
+        return cls(settings, list(items.values()), client, concurrency=concurrency)
+
+    @classmethod
+    def resume(cls, settings, manager, client, concurrency=BATCH_DOWNLOAD_CONCURRENCY):
+        """Loads an interrupted job from a journal in the download folder of given settings
+
+        :param manager: A configuration manager used to obtain layers of the job
+        :type manager: ConfigurationManager
+        :return: A job or None if there is no journal
+        :rtype: BatchJob or None
+        """
+        journal_path = os.path.join(settings.download_folder, BATCH_JOURNAL_FILENAME)
+        if not os.path.exists(journal_path):
+            return None
+
+        with open(journal_path, "r") as fp:
+            journal = json.load(fp)
+
+        job_settings = settings.copy(auto_save=False)
+        for parameter, value in journal["settings"].items():
+            setattr(job_settings, parameter, value)
+
+        instance_id = job_settings.instance_id
+        manager.get_layers(instance_id)
+        items = [
+            BatchItem.load(payload, manager.get_layer(instance_id, payload["layer_id"], load_url=True))
+            for payload in journal["items"]
+        ]
+        return cls(job_settings, items, client, concurrency=concurrency)
+
+    def run(self, progress_callback=None, is_cancelled=None):
+        """Downloads all items that haven't been successfully downloaded yet
+
+        :param progress_callback: A function which is called with a batch item every time the item is processed
+        :type progress_callback: callable or None
+        :param is_cancelled: A function which returns True if the job should be stopped
+        :type is_cancelled: callable or None
+        :return: A list of items that failed to download
+        :rtype: list(BatchItem)
+        """
+        self._write_journal()
+
+        unfinished_items = [
+            item for item in self.items if item.status in (BatchItemStatus.PENDING, BatchItemStatus.FAILED)
+        ]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                executor.submit(self._process_item, item, progress_callback, is_cancelled) for item in unfinished_items
+            ]
+
+        for item, future in zip(unfinished_items, futures):
+            try:
+                future.result()
+            except Exception as exception:  # pylint: disable=broad-except
+                item.status, item.error = BatchItemStatus.FAILED, str(exception) or type(exception).__name__
+                self._write_journal()
+
+        failed_items = [item for item in self.items if item.status is BatchItemStatus.FAILED]
+        if all(item.status in (BatchItemStatus.DONE, BatchItemStatus.SKIPPED) for item in self.items):
+            os.remove(self.journal_path)
+
+        return failed_items
+
+    def _process_item(self, item, progress_callback, is_cancelled):
+        """Downloads a single item unless its image already exists. Unexpected exceptions are left to the caller,
+        which marks the item as failed."""
+        if is_cancelled is not None and is_cancelled():
+            return
+
+        item_settings = self._get_item_settings(item)
+        path = os.path.join(item_settings.download_folder, get_wcs_filename(item_settings, item.layer, item.bbox))
+
+        if os.path.exists(path):
+            item.status, item.error = BatchItemStatus.SKIPPED, None
+        else:
+            try:
+                download_wcs_image(item_settings, item.layer, item.bbox, self.client, is_cancelled=is_cancelled)
+                item.status, item.error = BatchItemStatus.DONE, None
+            except DownloadCancelledError:
+                return
+            except PluginException as exception:
+                item.status, item.error = BatchItemStatus.FAILED, exception.message
+            except OSError as exception:
+                item.status, item.error = BatchItemStatus.FAILED, str(exception)
+
+        self._write_journal()
+        if progress_callback is not None:
+            progress_callback(item)
+
+    def _get_item_settings(self, item):
+        """Provides settings for downloading a single item"""
+        item_settings = self.settings.copy(auto_save=False)
+        item_settings.layer_id = item.layer.id
+        item_settings.download_extent_type = item.extent_type
+        item_settings.is_exact_date = True
+        item_settings.start_time = item.date or ""
+        item_settings.end_time = item.date or ""
+        return item_settings
+
+    def _write_journal(self):
+        """Atomically writes the current state of the job into the journal file"""
+        with self._journal_lock:
+            journal = {
+                "settings": {
+                    parameter: getattr(self.settings, parameter) for parameter in self._JOB_SETTINGS_PARAMETERS
+                },
+                "items": [item.to_json() for item in self.items],
+            }
+
+            temporary_path = f"{self.journal_path}.tmp"
+            with open(temporary_path, "w") as fp:
+                json.dump(journal, fp)
+            os.replace(temporary_path, self.journal_path)
@@ -1,43 +1,50 @@
 """
 Module handling Sentinel Hub service capabilities
 """
+import json
+import os
+from functools import lru_cache
 from xml.etree import ElementTree
 
-from ..constants import CrsType, ServiceType
+from ..constants import CAPABILITIES_CACHE_TTL, CrsType, ServiceType
 from ..utils.geo import is_supported_crs
+from ..utils.meta import get_cache_folder
+from ..utils.metrics import METRICS
+from ..utils.tracing import traced
 from .common import CRS
+from .http_cache import HttpCache
 
 
 class WmsCapabilities:
-    """Stores info about capabilities of Sentinel Hub services"""
+    """Stores info about capabilities of Sentinel Hub services
+
+    Capabilities depend on a configuration instance, therefore they are kept separately for each instance ID. They are
+    also cached on disk.
+    """
 
     def __init__(self, settings, client):
         self.settings = settings
         self.client = client
 
-        self._xml_root = None
-
-        self._crs_list = None
+        self._crs_lists = {}
 
     def get_available_crs(self):
         """Provides a list of all available CRS from Sentinel Hub WMS capabilities"""
-        if self._crs_list is None:
-            self._load_xml()
-            namespace = self._get_xml_namespace()
-
-            crs_tag_iter = self._xml_root.findall(f"./{namespace}Capability/{namespace}Layer/{namespace}CRS")
-            self._crs_list = [CRS(crs.text, crs.text.replace(":", ": ")) for crs in crs_tag_iter]
-
-            self._filter_unknown_crs()
-            self._sort_crs_list()
+        instance_id = self.settings.instance_id
+        crs_list = self._crs_lists.get(instance_id)
+        if crs_list is None:
+            crs_list = [CRS(crs_id, crs_id.replace(":", ": ")) for crs_id in self._load_crs_ids()]
+            crs_list = [crs for crs in crs_list if is_supported_crs(crs.id)]
+            crs_list.sort(key=_crs_sort_function)
+            self._crs_lists[instance_id] = crs_list
 
         if self.settings.service_type.upper() != ServiceType.WMS:
             # Reasons why other CRS aren't supported
             # - for WMTS CRS is specified with TileMatrixSet parameter which has different names and for UTM something
             #   is not configured correctly
             # - for WFS the problem is that QGIS would pass CRS in a way that the service couldn't parse
-            return [crs for crs in self._crs_list if crs.id == CrsType.POP_WEB]
-        return self._crs_list
+            return [crs for crs in crs_list if crs.id == CrsType.POP_WEB]
+        return crs_list
 
     def get_crs_index(self, crs_id):
         """For a given CRS it provides its position in the list of all available CRS"""
@@ -47,15 +54,24 @@ class WmsCapabilities:
             return crs_id_list.index(crs_id)
         return 0
 
-    def _load_xml(self):
-        """Downloads and provides an XML"""
-        if self._xml_root is None:
-            url = self._get_capabilities_url()
-            response = self.client.download(url)
+    def _load_crs_ids(self):
+        """Provides IDs of CRS from the disk cache or it streams and parses them from WMS capabilities"""
+        url = self._get_capabilities_url()
+        cache = _get_capabilities_cache()
+
+        entry = cache.get(url)
+        if entry is not None and cache.is_fresh(entry):
+            return json.loads(entry.content)
 
-            self._xml_root = ElementTree.fromstring(response.content)
+        response = self.client.download(url, stream=True)
+        try:
+            response.raw.decode_content = True
+            crs_ids = parse_capabilities_crs(response.raw)
+        finally:
+            response.close()
 
-        return self._xml_root
+        cache.put(url, json.dumps(crs_ids).encode())
+        return crs_ids
 
     def _get_capabilities_url(self, get_json=False):
         """Generates url for obtaining service capabilities"""
@@ -68,20 +84,45 @@ class WmsCapabilities:
             return url + "&format=application/json"
         return url
 
-    def _get_xml_namespace(self):
-        """Parses a namespace string out of the xml"""
-        if self._xml_root.tag.startswith("{"):
-            item = self._xml_root.tag.split("}")[0]
-            return f"{item}}}"
-        return ""
-
-    def _filter_unknown_crs(self):
-        """Filters CRS that are unknown to QGIS"""
-        self._crs_list = [crs for crs in self._crs_list if is_supported_crs(crs.id)]
 
-    def _sort_crs_list(self):
-        """Sorts list of CRS"""
-        self._crs_list.sort(key=_crs_sort_function)
+@traced(category="parse")
+def parse_capabilities_crs(source):
+    """Incrementally parses IDs of CRS of the top layer from a WMS capabilities XML
+
+    Parsing stops at the first nested layer, therefore definitions of all layers, which make up most of the document,
+    are never read. Already parsed elements are cleared to free memory.
+
+    :param source: A file-like object with a WMS capabilities XML
+    :type source: object
+    :return: A list of CRS IDs
+    :rtype: list(str)
+    """
+    crs_ids = []
+    layer_depth = 0
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        tag = element.tag.rsplit("}", 1)[-1]
+
+        if tag == "Layer":
+            if event == "start":
+                layer_depth += 1
+                if layer_depth > 1:
+                    break
+            continue
+
+        if event == "end":
+            if tag == "CRS" and layer_depth == 1:
+                crs_ids.append(element.text)
+            element.clear()
+
+    return crs_ids
+
+
+@lru_cache(maxsize=1)
+def _get_capabilities_cache():
+    """Provides a persistent cache of CRS IDs parsed from WMS capabilities"""
+    cache = HttpCache(os.path.join(get_cache_folder(), "capabilities.sqlite"), ttl=CAPABILITIES_CACHE_TTL)
+    METRICS.register_cache("capabilities", cache)
+    return cache
 
 
 def _crs_sort_function(crs):
@@ -1,15 +1,32 @@
 """
 Download client for Sentinel Hub service
 """
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlsplit
 from xml.etree import ElementTree
 
 import requests
 import requests.auth
 from PyQt5.QtCore import QSettings
-
-from ..constants import DEFAULT_REQUEST_TIMEOUT
-from ..exceptions import DownloadError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..constants import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REQUEST_TIMEOUT,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_RESUME_ATTEMPTS,
+    DOWNLOAD_RETRIES,
+    SESSION_CACHE_SIZE,
+)
+from ..exceptions import DownloadCancelledError, DownloadError
 from ..utils.meta import get_plugin_version
+from ..utils.metrics import METRICS
 from .session import Session
 
 
@@ -17,33 +34,224 @@ class Client:
     """Handles all interactions with Sentinel Hub service
 
     Note that the class is caching sessions to a class attribute in order to minimize the number of times a new
-    session has to be created.
+    session has to be created. Only a limited number of the most recently used sessions is kept and sessions that
+    haven't been used for a while are removed.
+
+    Requests are sent through pooled keep-alive HTTP transports, one per service deployment, so that consecutive
+    requests to the same host reuse already established TCP and TLS connections.
+
+    Identical requests that are sent while the same request is still in flight are not sent again. Instead, they wait
+    for the response of the request in flight and share it.
     """
 
-    _CACHED_SESSIONS = {}
+    _CACHED_SESSIONS = OrderedDict()
+    _CACHED_SESSIONS_LOCK = threading.Lock()
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        """
+        :param pool_size: A maximal number of connections kept alive for each service deployment
+        :type pool_size: int
+        """
+        self.pool_size = pool_size
+
+        self._transports = {}
+        self._transports_lock = threading.Lock()
+
+        self.coalesced_requests = 0
+        self._requests_in_flight = {}
+        self._requests_in_flight_lock = threading.Lock()
 
-    def download(self, url, timeout=DEFAULT_REQUEST_TIMEOUT, session_settings=None):
+    def download(self, url, timeout=DEFAULT_REQUEST_TIMEOUT, session_settings=None, headers=None, stream=False):
         """Downloads data from url and handles possible errors
 
+        Non-streamed requests are coalesced with an identical request in flight, in which case the returned response
+        object is shared between callers and must not be modified.
+
         :param url: download url
         :type url: str
         :param timeout: A number of seconds before a request will time out
         :type timeout: int
         :param session_settings: If specified, these settings will be used to create a session
         :type session_settings: Settings or None
+        :param headers: Additional request headers
+        :type headers: dict or None
+        :param stream: If True, the response content isn't downloaded immediately and the response has to be closed
+            once its content is consumed
+        :type stream: bool
         :return: download response or None if download failed
         :rtype: requests.Response or None
         """
-        proxy_dict, auth = get_proxy_config()
-        headers = self._prepare_headers(session_settings)
+        if stream:
+            return self._download(url, timeout, session_settings, headers, stream)
+
+        request_key = _get_request_key(url, session_settings, headers)
+        with self._requests_in_flight_lock:
+            future = self._requests_in_flight.get(request_key)
+            is_coalesced = future is not None
+            if is_coalesced:
+                self.coalesced_requests += 1
+                METRICS.count_coalesced_request(url)
+            else:
+                future = Future()
+                self._requests_in_flight[request_key] = future
+
+        if is_coalesced:
+            return future.result()
+
         try:
-            response = requests.get(url, headers=headers, timeout=timeout, proxies=proxy_dict, auth=auth)
-            response.raise_for_status()
-        except requests.RequestException as exception:
-            raise DownloadError(get_error_message(exception)) from exception
+            response = self._download(url, timeout, session_settings, headers, stream)
+        except Exception as exception:
+            future.set_exception(exception)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._requests_in_flight_lock:
+                del self._requests_in_flight[request_key]
+
+    def _download(self, url, timeout, session_settings, headers, stream):
+        """Sends a single request and handles possible errors"""
+        proxy_dict, auth = get_proxy_config()
+        extra_headers = headers or {}
+        headers = {**self._prepare_headers(session_settings), **extra_headers}
+        transport = self._get_transport(url)
+        with METRICS.measure_request(url) as observation:
+            try:
+                response = transport.get(
+                    url, headers=headers, timeout=timeout, proxies=proxy_dict, auth=auth, stream=stream
+                )
+                observation.retries += _get_retry_count(response)
+                if response.status_code == 401 and session_settings:
+                    # A persisted token could have been revoked, in that case a new token is fetched once
+                    if self._get_session(session_settings).discard_token(headers):
+                        headers = {**self._prepare_headers(session_settings), **extra_headers}
+                        response.close()
+                        response = transport.get(
+                            url, headers=headers, timeout=timeout, proxies=proxy_dict, auth=auth, stream=stream
+                        )
+                        observation.retries += 1 + _get_retry_count(response)
+                response.raise_for_status()
+            except requests.RequestException as exception:
+                raise DownloadError(get_error_message(exception)) from exception
+
+            observation.transferred_bytes += _get_response_size(response, stream)
 
         return response
 
+    def download_to_file(self, url, path, timeout=DEFAULT_REQUEST_TIMEOUT, progress_callback=None, is_cancelled=None):
+        """Streams data from url directly into a file without keeping the entire response in memory
+
+        Data is first written into a temporary file which is renamed to the final path only once the download is
+        complete. If a connection drops in the middle of a download, the download is resumed with an HTTP Range request
+        or, if the service doesn't support that, restarted.
+
+        :param url: download url
+        :type url: str
+        :param path: A path of a file into which data will be saved
+        :type path: str
+        :param timeout: A number of seconds before a request will time out
+        :type timeout: int
+        :param progress_callback: A function which will be called with a number of already downloaded bytes and a
+            total number of bytes (or None if unknown) after each received chunk of data
+        :type progress_callback: callable or None
+        :param is_cancelled: A function which returns True if a download should be stopped
+        :type is_cancelled: callable or None
+        :raises: DownloadError, DownloadCancelledError
+        """
+        temporary_path = f"{path}.part"
+        proxy_dict, auth = get_proxy_config()
+        headers = self._prepare_headers(None)
+        transport = self._get_transport(url)
+
+        downloaded_bytes = 0
+        try:
+            with METRICS.measure_request(url) as observation:
+                for attempt in range(DOWNLOAD_RESUME_ATTEMPTS + 1):
+                    if downloaded_bytes:
+                        request_headers = {**headers, "Range": f"bytes={downloaded_bytes}-"}
+                    else:
+                        request_headers = headers
+                    observation.retries += int(attempt > 0)
+                    try:
+                        with transport.get(
+                            url, headers=request_headers, timeout=timeout, proxies=proxy_dict, auth=auth, stream=True
+                        ) as response:
+                            observation.retries += _get_retry_count(response)
+                            response.raise_for_status()
+
+                            if response.status_code != 206:
+                                downloaded_bytes = 0
+                            total_bytes = _get_total_size(response, downloaded_bytes)
+
+                            with open(temporary_path, "ab" if downloaded_bytes else "wb") as fp:
+                                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                                    if is_cancelled is not None and is_cancelled():
+                                        raise DownloadCancelledError()
+
+                                    fp.write(chunk)
+                                    downloaded_bytes += len(chunk)
+                                    observation.transferred_bytes += len(chunk)
+                                    if progress_callback is not None:
+                                        progress_callback(downloaded_bytes, total_bytes)
+                        break
+                    except (
+                        requests.ConnectionError,
+                        requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError,
+                    ) as exception:
+                        if attempt == DOWNLOAD_RESUME_ATTEMPTS:
+                            raise DownloadError(get_error_message(exception)) from exception
+                    except requests.RequestException as exception:
+                        raise DownloadError(get_error_message(exception)) from exception
+
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def close(self):
+        """Closes all pooled transports and their connections. A new transport will be created on the next download."""
+        with self._transports_lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+
+        for transport in transports:
+            transport.close()
+
+    def _get_transport(self, url):
+        """Provides a pooled HTTP transport for the service deployment at which the given URL points
+
+        Proxy settings are intentionally not stored in a transport but passed with each request. This way any change of
+        QGIS proxy configuration is picked up by the next request.
+        """
+        url_parts = urlsplit(url)
+        deployment = f"{url_parts.scheme}://{url_parts.netloc}"
+
+        with self._transports_lock:
+            transport = self._transports.get(deployment)
+            if transport is None:
+                transport = self._create_transport()
+                self._transports[deployment] = transport
+
+        return transport
+
+    def _create_transport(self):
+        """Creates a new HTTP transport with a connection pool"""
+        retries = Retry(
+            total=DOWNLOAD_RETRIES,
+            read=0,
+            status_forcelist=(429, 502, 503, 504),
+            backoff_factor=0.5,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retries)
+
+        transport = requests.Session()
+        transport.mount("http://", adapter)
+        transport.mount("https://", adapter)
+        return transport
+
     def _prepare_headers(self, session_settings):
         """Prepares final headers by potentially joining them with session headers"""
         headers = {"User-Agent": f"sh_qgis_plugin_{get_plugin_version()}"}
@@ -56,18 +264,85 @@ class Client:
 
     @staticmethod
     def _get_session(settings):
-        """Provides a session object either from cache or it creates a new one"""
-        cache_key = settings.client_id, settings.client_secret, settings.base_url
-        if cache_key in Client._CACHED_SESSIONS:
-            return Client._CACHED_SESSIONS[cache_key]
-
-        session = Session(
-            base_url=settings.base_url, client_id=settings.client_id, client_secret=settings.client_secret
-        )
+        """Provides a session object either from cache or it creates a new one
 
-        Client._CACHED_SESSIONS[cache_key] = session
+        A session is created without a token, which is fetched once the session is used. This way concurrent callers
+        share the same session and wait for the same token.
+        """
+        cache_key = _get_session_key(settings)
+        with Client._CACHED_SESSIONS_LOCK:
+            session = Client._CACHED_SESSIONS.get(cache_key)
+            if session is None:
+                session = Session(
+                    base_url=settings.base_url, client_id=settings.client_id, client_secret=settings.client_secret
+                )
+                Client._CACHED_SESSIONS[cache_key] = session
+            Client._CACHED_SESSIONS.move_to_end(cache_key)
+
+            session.last_used = time.time()
+            evicted_sessions = Client._evict_sessions()
+
+        for evicted_session in evicted_sessions:
+            evicted_session.close()
         return session
 
+    @staticmethod
+    def _evict_sessions():
+        """Removes idle sessions and the least recently used sessions above the cache size limit. It has to be called
+        while holding the session cache lock."""
+        evicted_sessions = [
+            Client._CACHED_SESSIONS.pop(cache_key)
+            for cache_key, session in list(Client._CACHED_SESSIONS.items())
+            if session.is_idle
+        ]
+        while len(Client._CACHED_SESSIONS) > SESSION_CACHE_SIZE:
+            evicted_sessions.append(Client._CACHED_SESSIONS.popitem(last=False)[1])
+        return evicted_sessions
+
+    @staticmethod
+    def clear_sessions():
+        """Removes all cached sessions and stops their background token refreshing"""
+        with Client._CACHED_SESSIONS_LOCK:
+            sessions = list(Client._CACHED_SESSIONS.values())
+            Client._CACHED_SESSIONS.clear()
+
+        for session in sessions:
+            session.close()
+
+
+def _get_session_key(settings):
+    """Provides a key of a cached session. Credentials are hashed so that secrets aren't used as plain keys."""
+    key_parts = settings.client_id, settings.client_secret, settings.base_url
+    return hashlib.sha256("\0".join(key_parts).encode()).hexdigest()
+
+
+def _get_request_key(url, session_settings, headers):
+    """Provides a key under which identical requests are coalesced"""
+    session_key = None if session_settings is None else _get_session_key(session_settings)
+    return url, session_key, tuple(sorted((headers or {}).items()))
+
+
+def _get_retry_count(response):
+    """Provides a number of retries which the transport made before it obtained a response"""
+    retries = getattr(response.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def _get_response_size(response, stream):
+    """Provides a number of transferred bytes of a response. The size of a streamed response isn't known yet, therefore
+    it is taken from its headers."""
+    if stream:
+        return int(response.headers.get("Content-Length", 0))
+    return len(response.content)
+
+
+def _get_total_size(response, downloaded_bytes):
+    """Provides a total size of a downloaded file in bytes from response headers or None if it is not known"""
+    content_length = response.headers.get("Content-Length")
+    if content_length is None:
+        return None
+    return downloaded_bytes + int(content_length)
+
 
 def get_error_message(exception):
     """Creates an error message from the given exception
@@ -0,0 +1,356 @@
+"""
+Module for caching and aggregating cloud cover info of Sentinel Hub WFS features
+
+WFS features are cached per data source, per cell of a fixed spatial grid in Popular Web Mercator and per time
+interval. A cloud cover of any area can then be assembled from cached features of the grid cells that cover it.
+
+Footprints of features are kept as WKB geometries together with their bboxes. Bboxes are only used to quickly discard
+features that can't intersect an area, footprints decide which features actually intersect it.
+"""
+import json
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from qgis.core import QgsGeometry, QgsRectangle
+
+from .sqlite_cache import SqliteCache
+
+# A geometry is a footprint in WKB. If it is None, the bbox is considered to be the footprint.
+CloudCoverFeature = namedtuple(
+    "CloudCoverFeature",
+    ["id", "date", "cloud_cover", "min_x", "min_y", "max_x", "max_y", "geometry"],
+    defaults=(None,),
+)
+
+
+def get_grid_cells(bbox, cell_size):
+    """Provides indices of all grid cells that intersect a bbox
+
+    :param bbox: A bbox in a form (min_x, min_y, max_x, max_y)
+    :type bbox: tuple(float)
+    :param cell_size: A size of a grid cell in units of the bbox
+    :type cell_size: float
+    :return: A list of pairs of column and row indices
+    :rtype: list(tuple(int, int))
+    """
+    min_x, min_y, max_x, max_y = bbox
+    columns = range(math.floor(min_x / cell_size), math.floor(max_x / cell_size) + 1)
+    rows = range(math.floor(min_y / cell_size), math.floor(max_y / cell_size) + 1)
+    return [(column, row) for column in columns for row in rows]
+
+
+def get_cell_bbox(cell, cell_size):
+    """Provides a bbox of a grid cell in a form (min_x, min_y, max_x, max_y)"""
+    column, row = cell
+    return column * cell_size, row * cell_size, (column + 1) * cell_size, (row + 1) * cell_size
+
+
+def parse_cloud_cover_features(content):
+    """Parses a WFS GeoJSON response into a list of features with only info needed for cloud cover
+
+    Every JSON object is reduced as soon as it is parsed. Geometries are replaced by their bboxes and WKB and
+    properties by the few that are needed, therefore the entire parsed response is never held in memory. Features
+    without a geometry can't cover any area and are skipped.
+
+    :param content: A WFS response content
+    :type content: bytes or str
+    :rtype: list(CloudCoverFeature)
+    """
+    features = json.loads(content, object_hook=_reduce_geojson_object)["features"]
+    return [feature for feature in features if feature is not None]
+
+
+def _reduce_geojson_object(json_object):
+    """Reduces a parsed JSON object of a GeoJSON response. Objects are parsed bottom-up, therefore geometry and
+    properties of a feature are already reduced by the time the feature itself is parsed. A feature without a geometry
+    is reduced into None."""
+    if "coordinates" in json_object:
+        coordinates = json_object["coordinates"]
+        return (*_get_coordinates_bbox(coordinates), _get_polygons_wkb(json_object.get("type"), coordinates))
+
+    if "date" in json_object:
+        return {key: json_object.get(key) for key in ("id", "date", "time", "cloudCoverPercentage")}
+
+    if "geometry" in json_object and "properties" in json_object:
+        if json_object["geometry"] is None:
+            return None
+
+        properties = json_object["properties"]
+        date = str(properties["date"])
+        min_x, min_y, max_x, max_y, geometry = json_object["geometry"]
+        feature_id = properties["id"] or f"{date}|{properties['time']}|{min_x},{min_y},{max_x},{max_y}"
+        return CloudCoverFeature(
+            feature_id, date, float(properties["cloudCoverPercentage"] or 0), min_x, min_y, max_x, max_y, geometry
+        )
+
+    return json_object
+
+
+def _get_coordinates_bbox(coordinates):
+    """Provides a bbox of nested GeoJSON geometry coordinates"""
+    x_coords, y_coords = [], []
+    stack = [coordinates]
+    while stack:
+        item = stack.pop()
+        if isinstance(item[0], (int, float)):
+            x_coords.append(item[0])
+            y_coords.append(item[1])
+        else:
+            stack.extend(item)
+
+    return min(x_coords), min(y_coords), max(x_coords), max(y_coords)
+
+
+def _get_polygons_wkb(geometry_type, coordinates):
+    """Encodes coordinates of a GeoJSON polygon or multipolygon into a WKB multipolygon. Footprints of other
+    geometry types aren't kept, they are represented by their bboxes."""
+    if geometry_type == "Polygon":
+        polygons = [coordinates]
+    elif geometry_type == "MultiPolygon":
+        polygons = coordinates
+    else:
+        return None
+
+    wkb_parts = [struct.pack("<BII", 1, 6, len(polygons))]
+    for polygon in polygons:
+        wkb_parts.append(struct.pack("<BII", 1, 3, len(polygon)))
+        for ring in polygon:
+            wkb_parts.append(
+                struct.pack(f"<I{2 * len(ring)}d", len(ring), *(coord for point in ring for coord in point[:2]))
+            )
+    return b"".join(wkb_parts)
+
+
+def get_cloud_cover_map(features, bbox):
+    """Provides a cloud cover percentage for each date on which any of the features intersects a bbox
+
+    If multiple features intersect the bbox on the same date, their cloud cover percentages are averaged, weighted by
+    areas of intersections of their footprints with the given bbox. Features whose bboxes don't intersect the given
+    bbox are discarded at once with NumPy arrays, only footprints of the remaining features are intersected.
+
+    :param features: An iterable of cloud cover features
+    :type features: iterable(CloudCoverFeature)
+    :param bbox: A bbox in a form (min_x, min_y, max_x, max_y)
+    :type bbox: tuple(float)
+    :return: A dictionary mapping dates to cloud cover percentages
+    :rtype: dict(str, float)
+    """
+    features = list(features)
+    if not features:
+        return {}
+
+    dates = np.array([feature.date for feature in features])
+    values = np.array([feature[2:7] for feature in features], dtype=np.float64)
+    cloud_cover, feature_bboxes = values[:, 0], values[:, 1:]
+
+    candidates, bbox_areas = _filter_by_bbox(feature_bboxes, bbox)
+    areas = _get_intersection_areas([features[index] for index in candidates], bbox, bbox_areas)
+    is_intersecting = ~np.isnan(areas)
+    if not is_intersecting.any():
+        return {}
+
+    intersects, areas = candidates[is_intersecting], areas[is_intersecting]
+    unique_dates, date_indices = np.unique(dates[intersects], return_inverse=True)
+
+    # Features of a date that only touch the bbox have no area, therefore they are weighted equally
+    date_areas = np.bincount(date_indices, weights=areas, minlength=unique_dates.size)
+    weights = np.where(date_areas[date_indices] > 0, areas, 1.0)
+
+    weighted_cloud_cover = np.bincount(date_indices, weights=weights * cloud_cover[intersects])
+    date_weights = np.bincount(date_indices, weights=weights)
+    return dict(zip(unique_dates.tolist(), (weighted_cloud_cover / date_weights).tolist()))
+
+
+def _filter_by_bbox(feature_bboxes, bbox):
+    """Finds features whose bboxes intersect a bbox
+
+    :param feature_bboxes: An array of feature bboxes, each in a form (min_x, min_y, max_x, max_y)
+    :type feature_bboxes: numpy.ndarray
+    :param bbox: A bbox in a form (min_x, min_y, max_x, max_y)
+    :type bbox: tuple(float)
+    :return: Indices of the features and areas of intersections of their bboxes with the bbox
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    min_x, min_y, max_x, max_y = bbox
+    widths = np.minimum(feature_bboxes[:, 2], max_x) - np.maximum(feature_bboxes[:, 0], min_x)
+    heights = np.minimum(feature_bboxes[:, 3], max_y) - np.maximum(feature_bboxes[:, 1], min_y)
+    candidates = np.flatnonzero((widths >= 0) & (heights >= 0))
+    return candidates, widths[candidates] * heights[candidates]
+
+
+def _get_intersection_areas(features, bbox, bbox_intersection_areas):
+    """Computes areas of intersections of feature footprints with a bbox. Features whose footprints don't intersect
+    the bbox get NaN.
+
+    :param features: Features whose bboxes intersect the bbox
+    :type features: list(CloudCoverFeature)
+    :param bbox: A bbox in a form (min_x, min_y, max_x, max_y)
+    :type bbox: tuple(float)
+    :param bbox_intersection_areas: Areas of intersections of feature bboxes with the bbox
+    :type bbox_intersection_areas: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    min_x, min_y, max_x, max_y = bbox
+    bbox_geometry = QgsGeometry.fromRect(QgsRectangle(min_x, min_y, max_x, max_y))
+
+    areas = np.array(bbox_intersection_areas, dtype=np.float64)
+    for index, feature in enumerate(features):
+        if feature.geometry is None:
+            continue
+
+        geometry = QgsGeometry()
+        geometry.fromWkb(feature.geometry)
+        if min_x <= feature.min_x and min_y <= feature.min_y and feature.max_x <= max_x and feature.max_y <= max_y:
+            areas[index] = geometry.area()
+        elif geometry.intersects(bbox_geometry):
+            areas[index] = geometry.intersection(bbox_geometry).area()
+        else:
+            areas[index] = np.nan
+    return areas
+
+
+def filter_features_by_date(features, start_date, end_date):
+    """Provides features with a date within an interval, given by dates in a form YYYY-MM-DD"""
+    return [feature for feature in features if start_date <= feature.date <= end_date]
+
+
+class CloudCoverIndex:
+    """An in-memory index of cloud cover features, which keeps only a limited number of the most recently used
+    entries"""
+
+    def __init__(self, max_size):
+        """
+        :param max_size: A maximal number of entries in the index
+        :type max_size: int
+        """
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Provides features of an entry or None if there is no such entry or if it has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] < time.time():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, features, expires_at=None):
+        """Adds an entry to the index"""
+        with self._lock:
+            self._entries[key] = features, expires_at
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self):
+        """Provides numbers of index hits and misses
+
+        :rtype: dict(str, int)
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """Removes all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CloudCoverCache(SqliteCache):
+    """A persistent on-disk cache of cloud cover features, stored in a SQLite database"""
+
+    _SCHEMA_VERSION = 1
+
+    def get_features(self, source, cell, interval):
+        """Provides cached features of a grid cell
+
+        :param source: A key of a data source
+        :type source: str
+        :param cell: Indices of a grid cell
+        :type cell: tuple(int, int)
+        :param interval: A time interval
+        :type interval: str
+        :return: A list of features together with an expiration timestamp of the entry or None if the cell isn't cached
+            or its cache entry expired
+        :rtype: tuple(list(CloudCoverFeature), float or None) or None
+        """
+        cell_key = (source, *cell, interval)
+        with self._connect() as connection:
+            cell_row = connection.execute(
+                "SELECT expires_at FROM cells WHERE source = ? AND cell_x = ? AND cell_y = ? AND interval = ?",
+                cell_key,
+            ).fetchone()
+            if cell_row is None or (cell_row[0] is not None and cell_row[0] < time.time()):
+                self._count("misses")
+                return None
+
+            feature_rows = connection.execute(
+                (
+                    "SELECT id, date, cloud_cover, min_x, min_y, max_x, max_y, geometry FROM features "
+                    "WHERE source = ? AND cell_x = ? AND cell_y = ? AND interval = ?"
+                ),
+                cell_key,
+            ).fetchall()
+
+        self._count("hits")
+        return [CloudCoverFeature(*row) for row in feature_rows], cell_row[0]
+
+    def put_features(self, source, cell, interval, features, expires_at=None):
+        """Saves features of a grid cell into the cache
+
+        :param features: A list of all features of the cell
+        :type features: list(CloudCoverFeature)
+        :param expires_at: A timestamp after which the entry won't be valid anymore. If None, it never expires.
+        :type expires_at: float or None
+        """
+        cell_key = (source, *cell, interval)
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM features WHERE source = ? AND cell_x = ? AND cell_y = ? AND interval = ?", cell_key
+            )
+            connection.executemany(
+                "INSERT INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*cell_key, *feature) for feature in features],
+            )
+            connection.execute("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?)", (*cell_key, expires_at))
+
+    def clear(self):
+        """Removes all cached entries"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cells")
+            connection.execute("DELETE FROM features")
+
+    def _create_tables(self, connection):
+        """Creates tables of grid cells and their features. Entries cached in an older schema are dropped, because they
+        would be missing feature footprints."""
+        if connection.execute("PRAGMA user_version").fetchone()[0] < self._SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS cells")
+            connection.execute("DROP TABLE IF EXISTS features")
+            connection.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cells (source TEXT, cell_x INTEGER, cell_y INTEGER, interval TEXT, "
+            "expires_at REAL, PRIMARY KEY (source, cell_x, cell_y, interval))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS features (source TEXT, cell_x INTEGER, cell_y INTEGER, interval TEXT, "
+            "id TEXT, date TEXT, cloud_cover REAL, min_x REAL, min_y REAL, max_x REAL, max_y REAL, geometry BLOB)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS features_index ON features (source, cell_x, cell_y, interval)")
@@ -1,14 +1,30 @@
 """
 Module for querying Sentinel Hub Configuration API
 """
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from ..constants import CONFIGURATION_CACHE_TTL, CONFIGURATION_PREFETCH_WORKERS
+from ..exceptions import DownloadError
+from ..utils.meta import get_cache_folder
+from ..utils.metrics import METRICS
+from ..utils.tracing import traced
 from .capabilities import WmsCapabilities
 from .common import Configuration, Layer
+from .http_cache import HttpCache
 
 
 class ConfigurationManager:
     """The main class for providing any kind of configuration info obtained from Sentinel Hub service
 
     Mainly it interacts with Sentinel Hub configuration API, which is the same as Sentinel Hub Configurator app
+
+    Lists of configurations and layers are cached on disk. A cached list is provided immediately, even if it is
+    outdated, and can afterwards be revalidated with the service by a conditional request.
     """
 
     def __init__(self, settings, client):
@@ -27,6 +43,10 @@ class ConfigurationManager:
 
         self._wms_capabilities = None
         self._data_sources_names_map = None
+        self._data_source_index = None
+        self._data_source_index_lock = threading.Lock()
+
+        self._outdated_urls = set()
 
     @property
     def configuration_url(self):
@@ -40,16 +60,27 @@ class ConfigurationManager:
             self._wms_capabilities = WmsCapabilities(self.settings, self.client)
         return self._wms_capabilities
 
-    def get_configurations(self, reload=False):
-        """Provides a list of data configurations for the current user"""
-        if reload or self._configurations is None:
+    def get_configurations(self, reload=False, revalidate=False):
+        """Provides a list of data configurations for the current user
+
+        :param reload: If True, the list is obtained again, either from the cache or from the service
+        :type reload: bool
+        :param revalidate: If True, the list is revalidated with the service
+        :type revalidate: bool
+        """
+        if reload or revalidate or self._configurations is None:
             url = f"{self.configuration_url}/wms/instances"
-            result_list = self.client.download(url, session_settings=self.settings).json()
+            result_list, is_modified = self._download_json(url, revalidate=revalidate)
 
-            self._configurations = [Configuration.load(result) for result in result_list]
-            self._configurations.sort(key=lambda conf: conf.name.lower())
+            if is_modified or self._configurations is None:
+                previous_layers = {conf.id: conf.layers for conf in self._configurations or []}
+                configurations = [Configuration.load(result) for result in result_list]
+                configurations.sort(key=lambda conf: conf.name.lower())
+                for configuration in configurations:
+                    configuration.layers = previous_layers.get(configuration.id)
 
-            self._instance_to_index_map = {conf.id: index for index, conf in enumerate(self._configurations)}
+                self._instance_to_index_map = {conf.id: index for index, conf in enumerate(configurations)}
+                self._configurations = configurations
 
         return self._configurations
 
@@ -57,24 +88,61 @@ class ConfigurationManager:
         """For an instance ID it provides a position of its configuration in the list of configurations"""
         return self._instance_to_index_map.get(instance_id, -1)
 
-    def get_layers(self, instance_id, reload=False):
-        """Provides a list of layers defined for a given instance ID (configuration) and the current user"""
+    def get_layers(self, instance_id, reload=False, revalidate=False):
+        """Provides a list of layers defined for a given instance ID (configuration) and the current user
+
+        For the meaning of `reload` and `revalidate` parameters check `get_configurations`.
+        """
         conf_index = self.get_configuration_index(instance_id)
         configuration = self._configurations[conf_index]
 
-        if reload or configuration.layers is None:
+        if reload or revalidate or configuration.layers is None:
             url = f"{self.configuration_url}/wms/instances/{instance_id}/layers"
-            result_list = self.client.download(url, session_settings=self.settings).json()
+            result_list, is_modified = self._download_json(url, revalidate=revalidate)
 
-            configuration.layers = [Layer.load(result) for result in result_list]
-            configuration.layers.sort(key=lambda layer: layer.name.lower())
+            if is_modified or configuration.layers is None:
+                layers = [Layer.load(result) for result in result_list]
+                layers.sort(key=lambda layer: layer.name.lower())
 
-            self._layer_to_index_maps[configuration.id] = {
-                layer.id: index for index, layer in enumerate(configuration.layers)
-            }
+                if self._data_source_index is not None:
+                    self._fill_data_sources(layers)
+
+                self._layer_to_index_maps[configuration.id] = {layer.id: index for index, layer in enumerate(layers)}
+                configuration.layers = layers
 
         return configuration.layers
 
+    def prefetch_layers(self, is_cancelled=None):
+        """Loads layers of all configurations at once with a bounded pool of workers. Layers of each configuration are
+        available as soon as they are loaded, therefore later switching between configurations doesn't have to wait.
+
+        :param is_cancelled: A function which returns True if prefetching should be stopped
+        :type is_cancelled: callable or None
+        :return: A number of configurations for which layers have been loaded
+        :rtype: int
+        """
+        instance_ids = [conf.id for conf in self.get_configurations() if conf.layers is None]
+
+        def prefetch_instance_layers(instance_id):
+            if is_cancelled is not None and is_cancelled():
+                return False
+            try:
+                self.get_layers(instance_id)
+            except DownloadError:
+                # Layers of this configuration will be loaded again once they are needed
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=CONFIGURATION_PREFETCH_WORKERS) as executor:
+            return sum(executor.map(prefetch_instance_layers, instance_ids))
+
+    def needs_revalidation(self, instance_id=None):
+        """Checks if the list of configurations or, if an instance ID is given, the list of its layers has been
+        provided from an outdated cache entry"""
+        if instance_id is None:
+            return f"{self.configuration_url}/wms/instances" in self._outdated_urls
+        return f"{self.configuration_url}/wms/instances/{instance_id}/layers" in self._outdated_urls
+
     def get_layer_index(self, instance_id, layer_id):
         """Provides a position of a layer in the list of all layers for a given configuration"""
         return self._layer_to_index_maps[instance_id].get(layer_id, 0)
@@ -86,8 +154,8 @@ class ConfigurationManager:
         :type instance_id: str
         :param layer_id: A layer ID
         :type layer_id: str
-        :param load_url: If True it will make an additional request to find out which at which service URL a layer can
-            be accessed
+        :param load_url: If True it will make sure that info about a data source and its service URL is loaded. Info
+            about all data sources is loaded at once, therefore this is done only the first time
         :type load_url: bool
         :return: A layer
         :rtype: Layer
@@ -98,25 +166,130 @@ class ConfigurationManager:
         data_source = layer.data_source
 
         if load_url and data_source.service_url is None:
+            try:
+                self.get_data_source_index()
+            except DownloadError:
+                # The index isn't needed for a single layer, its data source can still be queried on its own
+                pass
+            else:
+                self._fill_data_sources(
+                    [layer for configuration in self._configurations or [] for layer in configuration.layers or []]
+                )
+
+        if load_url and data_source.service_url is None:
+            # A data source which isn't listed among datasets or in a failed index is queried on its own
             url = f"{self.configuration_url}/datasets/{data_source.type}/sources/{data_source.id}"
             result = self.client.download(url, session_settings=self.settings).json()
-
-            data_source.name = result["description"]
-            data_source_settings = result["settings"]
-            if "indexServiceUrl" in data_source_settings:
-                data_source.service_url = data_source_settings["indexServiceUrl"].rsplit("/", 1)[0]
-            else:
-                # This happens in case of DEM
-                data_source.service_url = self.settings.base_url
+            data_source.name, data_source.service_url = self._parse_data_source(result)
 
         return layer
 
     def get_datasource_names(self):
-        """The method that could obtain data source names in case data sources will be ever displayed
+        """Provides names of all data sources available to the current user
 
-        A query should be made to configuration/v1/datasets endpoint
+        :return: A dictionary mapping pairs of data source type and ID to data source names
+        :rtype: dict(tuple(str, int), str)
         """
-        raise NotImplementedError
+        if self._data_sources_names_map is None:
+            self._data_sources_names_map = {
+                data_source_key: name for data_source_key, (name, _) in self.get_data_source_index().items()
+            }
+        return self._data_sources_names_map
+
+    def get_data_source_index(self):
+        """Provides an index of all data sources, which is obtained only once with one request per dataset
+
+        :return: A dictionary mapping pairs of data source type and ID to pairs of data source name and service URL
+        :rtype: dict(tuple(str, int), tuple(str, str))
+        """
+        with self._data_source_index_lock:
+            if self._data_source_index is not None:
+                return self._data_source_index
+
+            datasets = self._download_current_json(f"{self.configuration_url}/datasets")
+
+            def load_dataset_sources(dataset):
+                data_source_type = dataset["@id"].rsplit("/", 1)[-1]
+                url = f"{self.configuration_url}/datasets/{data_source_type}/sources"
+                return [
+                    ((data_source_type, int(result["@id"].rsplit("/", 1)[-1])), self._parse_data_source(result))
+                    for result in self._download_current_json(url)
+                ]
+
+            with ThreadPoolExecutor(max_workers=CONFIGURATION_PREFETCH_WORKERS) as executor:
+                dataset_sources = list(executor.map(load_dataset_sources, datasets))
+
+            self._data_source_index = dict(item for sources in dataset_sources for item in sources)
+            return self._data_source_index
+
+    def _fill_data_sources(self, layers):
+        """Fills info about data sources of given layers from the data source index"""
+        for layer in layers:
+            data_source = layer.data_source
+            data_source_info = self._data_source_index.get((data_source.type, data_source.id))
+            if data_source.service_url is None and data_source_info is not None:
+                data_source.name, data_source.service_url = data_source_info
+
+    def _parse_data_source(self, result):
+        """Parses a name and a service URL from a data source payload of Configuration API"""
+        data_source_settings = result["settings"]
+        if "indexServiceUrl" in data_source_settings:
+            service_url = data_source_settings["indexServiceUrl"].rsplit("/", 1)[0]
+        else:
+            # This happens in case of DEM
+            service_url = self.settings.base_url
+        return result["description"], service_url
+
+    def _download_current_json(self, url):
+        """Provides a JSON response of Configuration API from the cache, which is revalidated first if it is
+        outdated"""
+        result, _ = self._download_json(url)
+        if url in self._outdated_urls:
+            result, _ = self._download_json(url, revalidate=True)
+        return result
+
+    def _download_json(self, url, revalidate=False):
+        """Provides a JSON response of Configuration API, either from the cache or from the service
+
+        :param url: A URL of Configuration API
+        :type url: str
+        :param revalidate: If False, a cached response is used without contacting the service, even if it is
+            outdated. If True, a cached response is revalidated with a conditional request.
+        :type revalidate: bool
+        :return: A parsed response and a flag telling if it might differ from the previously provided response
+        :rtype: tuple(object, bool)
+        """
+        cache = _get_configuration_cache()
+        cache_key = self._get_cache_key(url)
+        entry = cache.get(cache_key)
+
+        if entry is not None and not revalidate:
+            if cache.is_fresh(entry):
+                self._outdated_urls.discard(url)
+            else:
+                self._outdated_urls.add(url)
+            return _parse_json(entry.content), True
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.client.download(url, session_settings=self.settings, headers=headers)
+        self._outdated_urls.discard(url)
+
+        if response.status_code == 304 and entry is not None:
+            cache.mark_revalidated(cache_key)
+            return _parse_json(entry.content), False
+
+        cache.put(cache_key, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return _parse_json(response.content), True
+
+    def _get_cache_key(self, url):
+        """Provides a key of a cached response. Responses depend on credentials, which are hashed into the key."""
+        key_parts = self.settings.client_id, self.settings.client_secret, url
+        return hashlib.sha256("\0".join(key_parts).encode()).hexdigest()
 
     def get_available_crs(self):
         """Provides a list of available CRS"""
@@ -125,3 +298,17 @@ class ConfigurationManager:
     def get_crs_index(self, crs_id):
         """Provides a position of a CRS in the list of available CRS"""
         return self.wms_capabilities.get_crs_index(crs_id)
+
+
+@traced(category="parse")
+def _parse_json(content):
+    """Parses a JSON response of Configuration API"""
+    return json.loads(content)
+
+
+@lru_cache(maxsize=1)
+def _get_configuration_cache():
+    """Provides a persistent cache of Configuration API responses"""
+    cache = HttpCache(os.path.join(get_cache_folder(), "configuration.sqlite"), ttl=CONFIGURATION_CACHE_TTL)
+    METRICS.register_cache("configuration", cache)
+    return cache
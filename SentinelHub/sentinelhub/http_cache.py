@@ -0,0 +1,84 @@
+"""
+Module implementing a persistent cache of HTTP responses
+
+Cached responses are revalidated with the service by conditional requests using their ETag and Last-Modified
+validators. Until an entry is older than the time-to-live of the cache it is considered fresh and can be used without
+any revalidation.
+"""
+import sqlite3
+import time
+from collections import namedtuple
+
+from .sqlite_cache import SqliteCache
+
+HttpCacheEntry = namedtuple("HttpCacheEntry", ["content", "etag", "last_modified", "stored_at"])
+
+
+class HttpCache(SqliteCache):
+    """A persistent on-disk cache of HTTP response contents, stored in a SQLite database"""
+
+    STATS_COUNTERS = ("hits", "misses", "revalidations")
+
+    def __init__(self, path, ttl):
+        """
+        :param path: A path to the database file
+        :type path: str
+        :param ttl: A number of seconds for which a cached entry is fresh
+        :type ttl: float
+        """
+        self.ttl = ttl
+        super().__init__(path)
+
+    def get(self, key):
+        """Provides a cached entry, regardless of whether it is fresh or not
+
+        :param key: A key of a cached response
+        :type key: str
+        :return: A cache entry or None if there is no entry for the key
+        :rtype: HttpCacheEntry or None
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT content, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        self._count("hits" if row else "misses")
+        return HttpCacheEntry(bytes(row[0]), *row[1:]) if row else None
+
+    def put(self, key, content, etag=None, last_modified=None):
+        """Saves a response content together with its validators. The entry will be fresh for the next `ttl` seconds.
+
+        :param content: A response content
+        :type content: bytes
+        :param etag: A value of ETag response header
+        :type etag: str or None
+        :param last_modified: A value of Last-Modified response header
+        :type last_modified: str or None
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(content), etag, last_modified, time.time()),
+            )
+
+    def mark_revalidated(self, key):
+        """Marks an entry as fresh again after the service confirmed it hasn't been modified"""
+        with self._connect() as connection:
+            connection.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+        self._count("revalidations")
+
+    def is_fresh(self, entry):
+        """Checks if an entry can still be used without revalidation"""
+        return entry.stored_at + self.ttl > time.time()
+
+    def clear(self):
+        """Removes all cached entries"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM responses")
+
+    def _create_tables(self, connection):
+        """Creates a table of cached responses"""
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content BLOB, etag TEXT, "
+            "last_modified TEXT, stored_at REAL)"
+        )
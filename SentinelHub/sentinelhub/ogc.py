@@ -6,7 +6,7 @@ from urllib.parse import quote_plus, urlencode
 
 from qgis.core import QgsDataSourceUri
 
-from ..constants import ServiceType
+from ..constants import WFS_MAX_FEATURES, ServiceType
 
 DEFAULT_START_TIME = "1985-01-01"
 
@@ -74,19 +74,21 @@ def get_wfs_uri(settings, layer):
     return _build_uri(base_url, url_params, uri_params, use_builder=True)
 
 
-def get_wfs_url(settings, layer, bbox_str, time_range, maxcc=None):
-    """Generate URL for WFS request from parameters"""
+def get_wfs_url(settings, layer, bbox_str, time_range, maxcc=None, crs=None, feature_offset=0):
+    """Generate URL for WFS request from parameters. Features are paginated, `feature_offset` specifies how many
+    features should be skipped."""
     base_url = _get_service_endpoint(settings, ServiceType.WFS)
     params = {
         "service": "WFS",
         "version": "2.0.0",
         "request": "GetFeature",
-        "maxfeatures": "100",
+        "maxfeatures": str(WFS_MAX_FEATURES),
+        "feature_offset": str(feature_offset),
         "outputformat": "application/json",
         "typenames": layer.data_source.get_wfs_id(),
         "bbox": bbox_str,
         "time": time_range,
-        "srsname": settings.crs,
+        "srsname": crs if crs else settings.crs,
         "maxcc": settings.maxcc if maxcc is None else maxcc,
     }
     return _build_url(base_url, params)
@@ -1,26 +1,40 @@
 """
 Module for handling Sentinel Hub session
 """
+import hashlib
+import json
+import threading
 import time
 
 from oauthlib.oauth2 import BackendApplicationClient
 from oauthlib.oauth2.rfc6749.errors import OAuth2Error
-from qgis.core import QgsMessageLog
+from qgis.core import Qgis, QgsApplication, QgsMessageLog
 from requests_oauthlib import OAuth2Session
 
+from ..constants import SESSION_IDLE_TIMEOUT, SESSION_REFRESH_RETRY_DELAY
 from ..exceptions import SessionError
+from ..utils.metrics import METRICS
 
 
 class Session:
     """Sentinel Hub authentication class
 
     The class will do OAuth2 authentication with Sentinel Hub service and store the token. It will make sure that the
-    token is never expired by automatically refreshing it if expiry time is close.
+    token is never expired by refreshing it in a background thread before expiry time is close. Only if a token has
+    already expired, e.g. because the session wasn't used for a while, it is fetched in the calling thread. Concurrent
+    callers then wait for a single shared refresh.
+
+    Tokens are also persisted in the encrypted QGIS authentication database so that a still valid token can be reused
+    after QGIS restarts without contacting the identity provider. A token is stored together with a hash of the client
+    secret and it is only reused for the same secret. Note that the plugin never unlocks the database itself, because
+    that would prompt a user for a master password. Therefore, tokens are persisted and reused only if a user has
+    already entered the master password in the current QGIS session, otherwise a new token is fetched after a restart.
 
     Note: This is a modified copy of a class from sentinelhub-py
     """
 
     SECONDS_BEFORE_EXPIRY = 60
+    _PERSISTED_TOKEN_PARAMETERS = ("access_token", "token_type", "expires_at")
 
     def __init__(self, base_url, client_id, client_secret):
         """
@@ -34,9 +48,21 @@ class Session:
         self.oauth_url = self.select_oauth_url(base_url)
         self.client_id = client_id
         self.client_secret = client_secret
+        self.persistence_key = _get_persistence_key(base_url, client_id)
+        self.secret_hash = _get_secret_hash(client_secret)
+
+        self.last_used = time.time()
+        self.last_refresh_duration = None
 
         self._token = None
-        _ = self.token
+        self._token_lock = threading.Lock()
+        self._refresh_timer = None
+        self._timer_lock = threading.Lock()
+        self._is_closed = False
+
+        self._token = self._load_persisted_token()
+        if self._token:
+            self._schedule_refresh(self._token["expires_at"] - self.SECONDS_BEFORE_EXPIRY - time.time())
 
     @staticmethod
     def select_oauth_url(base_url):
@@ -51,11 +77,18 @@ class Session:
         :return: A token in a form of dictionary of parameters
         :rtype: dict
         """
-        if self._token and self._token["expires_at"] > time.time() + self.SECONDS_BEFORE_EXPIRY:
-            return self._token
+        self.last_used = time.time()
 
-        self._token = self._fetch_token()
-        return self._token
+        token = self._token
+        if token and token["expires_at"] > time.time():
+            if token["expires_at"] <= time.time() + self.SECONDS_BEFORE_EXPIRY and not self._is_refresh_scheduled():
+                self._schedule_refresh(0)
+            return token
+
+        with self._token_lock:
+            if not self._token or self._token["expires_at"] <= time.time():
+                self._refresh_token()
+            return self._token
 
     @property
     def session_headers(self):
@@ -66,6 +99,112 @@ class Session:
         """
         return {"Authorization": f"Bearer {self.token['access_token']}"}
 
+    @property
+    def is_idle(self):
+        """Checks if the session hasn't been used for a while"""
+        return self.last_used < time.time() - SESSION_IDLE_TIMEOUT
+
+    def discard_token(self, session_headers):
+        """Discards a token which was rejected by the service, e.g. a persisted token that has been revoked since
+
+        :param session_headers: Session headers with which a request was rejected
+        :type session_headers: dict
+        :return: True if the token was discarded and a new one will be fetched, False if it has already been replaced
+        :rtype: bool
+        """
+        with self._token_lock:
+            if not self._token or session_headers.get("Authorization") != f"Bearer {self._token['access_token']}":
+                return False
+
+            self._token = None
+            _remove_persisted_token(self.persistence_key)
+            return True
+
+    def close(self):
+        """Stops background refreshing of the token"""
+        with self._timer_lock:
+            self._is_closed = True
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _refresh_token(self):
+        """Fetches a new token and schedules its background refresh. It has to be called while holding the token
+        lock."""
+        start_time = time.perf_counter()
+        self._token = self._fetch_token()
+        self.last_refresh_duration = time.perf_counter() - start_time
+        self._persist_token()
+
+        QgsMessageLog.logMessage(f"Authentication token refreshed in {self.last_refresh_duration:.2f}s")
+        self._schedule_refresh(self._token["expires_at"] - self.SECONDS_BEFORE_EXPIRY - time.time())
+
+    def _refresh_in_background(self):
+        """Refreshes the token in a background thread, unless the session is idle or another thread is already
+        refreshing it"""
+        # A non-blocking acquire can't be written as a with statement
+        if self.is_idle or not self._token_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return
+
+        try:
+            self._refresh_token()
+        except Exception as exception:  # pylint: disable=broad-except
+            QgsMessageLog.logMessage(f"Failed to refresh authentication token: {exception}", level=Qgis.Warning)
+            self._schedule_refresh(SESSION_REFRESH_RETRY_DELAY)
+        finally:
+            self._token_lock.release()
+
+    def _schedule_refresh(self, delay):
+        """Schedules a background refresh of the token, replacing any previously scheduled one"""
+        with self._timer_lock:
+            if self._is_closed:
+                return
+
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+
+            self._refresh_timer = threading.Timer(max(delay, 0), self._refresh_in_background)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+
+    def _is_refresh_scheduled(self):
+        """Checks if a background refresh is waiting to be executed"""
+        timer = self._refresh_timer
+        return timer is not None and timer.is_alive() and timer is not threading.current_thread()
+
+    def _load_persisted_token(self):
+        """Loads a persisted token if it was obtained with the same client secret and it is still valid for a while. It
+        is skipped if the database isn't unlocked."""
+        auth_manager = QgsApplication.authManager()
+        if not auth_manager.masterPasswordIsSet():
+            return None
+
+        try:
+            token = json.loads(auth_manager.authSetting(self.persistence_key, "", True) or "null")
+        except (TypeError, ValueError):
+            return None
+
+        if not isinstance(token, dict) or token.pop("secret_hash", None) != self.secret_hash:
+            return None
+        if token.get("expires_at", 0) <= time.time() + self.SECONDS_BEFORE_EXPIRY:
+            return None
+        return token
+
+    def _persist_token(self):
+        """Persists the current token into the QGIS authentication database. It is skipped if the database isn't
+        unlocked, because that would prompt a user for a master password."""
+        auth_manager = QgsApplication.authManager()
+        if not auth_manager.masterPasswordIsSet():
+            return
+
+        token = {
+            parameter: self._token[parameter]
+            for parameter in self._PERSISTED_TOKEN_PARAMETERS
+            if parameter in self._token
+        }
+        token["secret_hash"] = self.secret_hash
+        auth_manager.storeAuthSetting(self.persistence_key, json.dumps(token), True)
+
     def _fetch_token(self):
         """Collects a new token from Sentinel Hub service"""
         oauth_client = BackendApplicationClient(client_id=self.client_id)
@@ -73,9 +212,26 @@ class Session:
         QgsMessageLog.logMessage("Creating a new authentication session with Sentinel Hub service")
 
         try:
-            with OAuth2Session(client=oauth_client) as oauth_session:
+            with METRICS.measure_request(self.oauth_url), OAuth2Session(client=oauth_client) as oauth_session:
                 return oauth_session.fetch_token(
                     token_url=self.oauth_url, client_id=self.client_id, client_secret=self.client_secret
                 )
         except OAuth2Error as exception:
             raise SessionError from exception
+
+
+def _get_persistence_key(base_url, client_id):
+    """Provides a key under which a token is persisted in the QGIS authentication database"""
+    return f"sentinelhub/token/{hashlib.sha256(f'{base_url}|{client_id}'.encode()).hexdigest()}"
+
+
+def _get_secret_hash(client_secret):
+    """Provides a hash of a client secret, which is persisted with a token instead of the secret itself"""
+    return hashlib.sha256(client_secret.encode()).hexdigest()
+
+
+def _remove_persisted_token(persistence_key):
+    """Removes a persisted token from the QGIS authentication database"""
+    auth_manager = QgsApplication.authManager()
+    if auth_manager.masterPasswordIsSet():
+        auth_manager.removeAuthSetting(persistence_key)
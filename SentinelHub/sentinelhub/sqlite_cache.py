@@ -0,0 +1,54 @@
+"""
+Module with a base class of persistent caches stored in SQLite databases
+"""
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+
+class SqliteCache:
+    """A base class of persistent on-disk caches, stored in a SQLite database
+
+    Each operation opens its own database connection, therefore a cache can be used from multiple threads. Subclasses
+    create their tables in `_create_tables` and list names of their statistics counters in `STATS_COUNTERS`.
+    """
+
+    STATS_COUNTERS = ("hits", "misses")
+
+    def __init__(self, path):
+        """
+        :param path: A path to the database file
+        :type path: str
+        """
+        self.path = path
+
+        for counter_name in self.STATS_COUNTERS:
+            setattr(self, counter_name, 0)
+        self._stats_lock = threading.Lock()
+
+        with self._connect() as connection:
+            self._create_tables(connection)
+
+    def get_stats(self):
+        """Provides values of all statistics counters of the cache
+
+        :rtype: dict(str, int)
+        """
+        with self._stats_lock:
+            return {counter_name: getattr(self, counter_name) for counter_name in self.STATS_COUNTERS}
+
+    def _create_tables(self, connection):
+        """Creates database tables of the cache if they don't exist yet"""
+        raise NotImplementedError
+
+    def _count(self, counter_name):
+        """Increases one of the statistics counters"""
+        with self._stats_lock:
+            setattr(self, counter_name, getattr(self, counter_name) + 1)
+
+    @contextmanager
+    def _connect(self):
+        """Opens a connection, which commits a transaction and closes once a `with` block is exited"""
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            with connection:
+                yield connection
@@ -1,26 +1,192 @@
 """
 Utilities for interacting with Sentinel Hub WCS service
 """
+import math
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from ..constants import CrsType, ExtentType
-from ..utils.geo import bbox_to_string
+from osgeo import gdal
+
+from ..constants import WCS_DOWNLOAD_WORKERS, WCS_MAX_IMAGE_SIZE, CrsType, ExtentType, ImageFormat
+from ..exceptions import BBoxTransformError, DownloadCancelledError, DownloadError
+from ..utils.geo import bbox_to_string, get_image_size, split_bbox
 from ..utils.naming import get_filename
 from .ogc import get_wcs_url
 
 
-def download_wcs_image(settings, layer, bbox, client):
-    """Downloads and saves an image from Sentinel Hub WCS service"""
-    crs = settings.crs if settings.download_extent_type is ExtentType.CURRENT else CrsType.WGS84
+def download_wcs_image(settings, layer, bbox, client, progress_callback=None, is_cancelled=None):
+    """Downloads and saves an image from Sentinel Hub WCS service
+
+    The image is streamed directly to a file, therefore memory consumption doesn't depend on the size of the image.
+    For the meaning of `progress_callback` and `is_cancelled` parameters check `Client.download_to_file`.
+
+    If a TIFF image would be larger than the service allows, the bbox is split into a grid of tiles which are
+    downloaded in parallel and afterwards merged into a single GeoTIFF.
+    """
+    crs = _get_download_crs(settings)
     bbox_str = bbox_to_string(bbox, crs)
-    url = get_wcs_url(settings, layer, bbox_str, crs)
 
-    filename = get_filename(settings, layer, bbox_str)
+    filename = get_wcs_filename(settings, layer, bbox)
     path = os.path.join(settings.download_folder, filename)
 
-    response = client.download(url)
+    columns, rows = _get_tile_grid_size(settings, bbox, crs)
+    if columns * rows > 1:
+        _download_tiled_image(
+            settings, layer, bbox, crs, (columns, rows), path, client, progress_callback, is_cancelled
+        )
+        return filename
 
-    with open(path, "wb") as fp:
-        fp.write(response.content)
+    url = get_wcs_url(settings, layer, bbox_str, crs)
+    client.download_to_file(url, path, progress_callback=progress_callback, is_cancelled=is_cancelled)
 
     return filename
+
+
+def get_wcs_filename(settings, layer, bbox):
+    """Provides a name of a file into which an image with given parameters would be downloaded"""
+    return get_filename(settings, layer, bbox_to_string(bbox, _get_download_crs(settings)))
+
+
+def _get_download_crs(settings):
+    """Provides a CRS in which a download bbox is defined"""
+    return settings.crs if settings.download_extent_type is ExtentType.CURRENT else CrsType.WGS84
+
+
+def _get_tile_grid_size(settings, bbox, crs):
+    """Decides into how many columns and rows a bbox has to be split so that each tile fits service limits
+
+    Only TIFF images are split because they are the only ones that can be merged back together by their
+    georeference.
+    """
+    if settings.image_format != ImageFormat.TIFF.url_param:
+        return 1, 1
+
+    try:
+        width, height = get_image_size(bbox, crs, float(settings.resx), float(settings.resy))
+    except BBoxTransformError:
+        return 1, 1
+
+    return math.ceil(width / WCS_MAX_IMAGE_SIZE), math.ceil(height / WCS_MAX_IMAGE_SIZE)
+
+
+def _download_tiled_image(settings, layer, bbox, crs, grid_size, path, client, progress_callback, is_cancelled):
+    """Downloads tiles of a grid and merges them into a single GeoTIFF"""
+    tile_folder = tempfile.mkdtemp(prefix=".tiles_", dir=settings.download_folder)
+    try:
+        tile_grid = split_bbox(bbox, *grid_size)
+        tile_bboxes = [tile_bbox for _, _, tile_bbox in tile_grid]
+        tile_paths = [os.path.join(tile_folder, f"tile_{column}_{row}.tiff") for column, row, _ in tile_grid]
+
+        _download_tiles(settings, layer, crs, tile_bboxes, tile_paths, client, progress_callback, is_cancelled)
+        _merge_tiles(tile_paths, path)
+    finally:
+        shutil.rmtree(tile_folder, ignore_errors=True)
+
+
+def _download_tiles(settings, layer, crs, tile_bboxes, tile_paths, client, progress_callback, is_cancelled):
+    """Downloads tiles on a bounded pool of workers. Once any tile fails, downloads of the other tiles are stopped."""
+    # Tiles are merged into a single image, which would otherwise get a logo on each tile
+    tile_settings = settings.copy(auto_save=False)
+    tile_settings.show_logo = "false"
+
+    progress = _TileProgress(len(tile_bboxes), progress_callback)
+    failure_event = threading.Event()
+
+    def is_stopped():
+        return failure_event.is_set() or (is_cancelled is not None and is_cancelled())
+
+    def download_tile(tile_index, tile_bbox, tile_path):
+        url = get_wcs_url(tile_settings, layer, bbox_to_string(tile_bbox, crs), crs)
+        try:
+            client.download_to_file(
+                url,
+                tile_path,
+                progress_callback=lambda downloaded, total: progress.update(tile_index, downloaded, total),
+                is_cancelled=is_stopped,
+            )
+        except Exception:
+            failure_event.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=WCS_DOWNLOAD_WORKERS) as executor:
+        futures = [
+            executor.submit(download_tile, tile_index, tile_bbox, tile_path)
+            for tile_index, (tile_bbox, tile_path) in enumerate(zip(tile_bboxes, tile_paths))
+        ]
+
+    _raise_tile_exception([future.exception() for future in futures])
+
+
+def _raise_tile_exception(exceptions):
+    """Raises an exception that caused tile downloads to stop. Cancellations are only a consequence of a failure of
+    another tile, unless a user cancelled the download."""
+    exceptions = [exception for exception in exceptions if exception is not None]
+    for exception in exceptions:
+        if not isinstance(exception, DownloadCancelledError):
+            raise exception
+    if exceptions:
+        raise exceptions[0]
+
+
+def _merge_tiles(tile_paths, path):
+    """Merges georeferenced tiles into a single GeoTIFF. GDAL copies data block by block, therefore the entire image
+    is never loaded into memory.
+
+    The image is first written into a temporary file, which replaces the final file only once merging succeeds. This
+    way a failed or interrupted merge never leaves a truncated image behind.
+    """
+    vrt_path = f"{os.path.splitext(tile_paths[0])[0]}.vrt"
+    vrt_dataset = gdal.BuildVRT(vrt_path, tile_paths)
+    if vrt_dataset is None:
+        raise DownloadError("Failed to merge downloaded tiles into a single image")
+
+    temporary_path = f"{path}.part"
+    try:
+        output_dataset = gdal.Translate(
+            temporary_path,
+            vrt_dataset,
+            format="GTiff",
+            creationOptions=["TILED=YES", "BIGTIFF=IF_SAFER", "COMPRESS=DEFLATE"],
+        )
+        vrt_dataset = None  # Closes the dataset
+        if output_dataset is None:
+            raise DownloadError("Failed to merge downloaded tiles into a single image")
+        output_dataset = None  # Flushes and closes the dataset
+
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+class _TileProgress:
+    """Joins download progress of multiple tiles into a single progress of the entire image
+
+    Until all tiles report their size, the total size of the image is extrapolated from the tiles with known size.
+    """
+
+    def __init__(self, tile_count, progress_callback):
+        self.tile_count = tile_count
+        self.progress_callback = progress_callback
+
+        self._downloaded = [0] * tile_count
+        self._totals = [None] * tile_count
+        self._lock = threading.Lock()
+
+    def update(self, tile_index, downloaded_bytes, total_bytes):
+        """Updates progress of a single tile and reports the joined progress"""
+        if self.progress_callback is None:
+            return
+
+        with self._lock:
+            self._downloaded[tile_index] = downloaded_bytes
+            self._totals[tile_index] = total_bytes
+
+            downloaded = sum(self._downloaded)
+            known_totals = [total for total in self._totals if total is not None]
+            total = sum(known_totals) * self.tile_count // len(known_totals) if known_totals else None
+
+            self.progress_callback(downloaded, max(total, downloaded) if total is not None else None)
@@ -1,34 +1,202 @@
 """
 Utilities for interacting with Sentinel Hub WFS service
 """
+import datetime as dt
 import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from ..constants import COVERAGE_REQUEST_TIMEOUT, CrsType
-from ..exceptions import DownloadError
-from ..utils.geo import bbox_to_string
+from ..constants import (
+    COVERAGE_CACHE_SETTLE_DAYS,
+    COVERAGE_CACHE_TTL,
+    COVERAGE_CELL_SIZE,
+    COVERAGE_DOWNLOAD_WORKERS,
+    COVERAGE_INDEX_SIZE,
+    COVERAGE_MAX_CELL_REQUESTS,
+    COVERAGE_REQUEST_TIMEOUT,
+    WFS_MAX_FEATURES,
+    CrsType,
+)
+from ..exceptions import DownloadCancelledError, DownloadError
+from ..utils.meta import get_cache_folder
+from ..utils.metrics import METRICS
+from ..utils.time import get_year_time_interval
+from ..utils.tracing import TRACER
+from .cloud_cover import (
+    CloudCoverCache,
+    CloudCoverIndex,
+    filter_features_by_date,
+    get_cell_bbox,
+    get_cloud_cover_map,
+    get_grid_cells,
+    parse_cloud_cover_features,
+)
 from .ogc import get_wfs_url
 
+_CLOUD_COVER_INDEX = CloudCoverIndex(max_size=COVERAGE_INDEX_SIZE)
+METRICS.register_cache("cloud_cover_index", _CLOUD_COVER_INDEX)
 
-def get_cloud_cover(settings, layer, bbox, time_interval, client):
-    """Finds all available dates and their cloud coverage"""
-    bbox_str = bbox_to_string(bbox, CrsType.POP_WEB)
 
-    wfs_url = get_wfs_url(settings, layer, bbox_str, time_interval, maxcc=100)
+def get_cloud_cover(settings, layer, bbox, time_interval, client, partial_result_callback=None, is_cancelled=None):
+    """Finds all available dates and their cloud coverage
+
+    WFS features are obtained per cell of a fixed spatial grid and for entire years at once. They are kept in an
+    in-memory index and cached on disk. Therefore, once an area has been browsed, panning and zooming within it or
+    changing months of the same year doesn't require any new requests.
+
+    If too many cells would have to be requested from the service, features are instead requested for the bbox and the
+    time interval only. Such features are not cached.
+
+    If requests of some cells fail, the result is obtained from the other cells.
+
+    :param bbox: A bbox in Popular Web Mercator CRS
+    :type bbox: QgsRectangle
+    :param partial_result_callback: A function which is called with a partial cloud cover map every time another page
+        of features is obtained
+    :type partial_result_callback: callable or None
+    :param is_cancelled: A function which returns True if obtaining features should be stopped. Features of cells that
+        are interrupted are neither indexed nor cached.
+    :type is_cancelled: callable or None
+    :raises: DownloadCancelledError
+    """
+    bbox_coords = bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()
+    start_date, end_date = time_interval.split("/")[:2]
+    source = f"{layer.data_source.service_url}/{layer.data_source.get_wfs_id()}"
+
+    features = {}
+    features_lock = threading.Lock()
+
+    def collect_features(new_features):
+        new_features = filter_features_by_date(new_features, start_date, end_date)
+        with features_lock:
+            features.update((feature.id, feature) for feature in new_features)
+            if partial_result_callback is not None and new_features:
+                partial_result_callback(_get_traced_cloud_cover_map(features.values(), bbox_coords))
+
+    missing_cell_years = []
+    for cell in get_grid_cells(bbox_coords, COVERAGE_CELL_SIZE):
+        for year in range(int(start_date[:4]), int(end_date[:4]) + 1):
+            cell_features = _get_local_cell_features(source, cell, year)
+            if cell_features is None:
+                missing_cell_years.append((cell, year))
+            else:
+                collect_features(cell_features)
 
     try:
-        return _cached_cloud_cover(wfs_url, client)
+        if len(missing_cell_years) > COVERAGE_MAX_CELL_REQUESTS:
+            bbox_str = ",".join(map(str, bbox_coords))
+            for page_features in _iter_feature_pages(settings, layer, bbox_str, time_interval, client, is_cancelled):
+                collect_features(page_features)
+        else:
+            _download_cells_features(
+                settings, layer, source, missing_cell_years, client, collect_features, is_cancelled
+            )
     except DownloadError:
-        return {}
+        pass
+
+    return _get_traced_cloud_cover_map(features.values(), bbox_coords)
+
+
+def _get_traced_cloud_cover_map(features, bbox_coords):
+    """Provides a cloud cover map and traces how long it took"""
+    with TRACER.span("get_cloud_cover_map", category="compute"):
+        return get_cloud_cover_map(features, bbox_coords)
+
+
+def _get_local_cell_features(source, cell, year):
+    """Provides features of a single grid cell for an entire year either from the in-memory index or from the disk
+    cache. If they are in neither, it returns None."""
+    index_key = source, cell, year
+
+    features = _CLOUD_COVER_INDEX.get(index_key)
+    if features is not None:
+        return features
+
+    cache_entry = _get_cloud_cover_cache().get_features(source, cell, get_year_time_interval(year))
+    if cache_entry is None:
+        return None
+
+    features, expires_at = cache_entry
+    _CLOUD_COVER_INDEX.put(index_key, features, expires_at=expires_at)
+    return features
+
+
+def _download_cells_features(settings, layer, source, cell_years, client, features_callback, is_cancelled):
+    """Downloads features of grid cells in parallel. Cells that fail don't stop downloads of other cells, but at the end
+    one of their errors is raised.
+
+    :raises: DownloadError, DownloadCancelledError
+    """
+    parent_span = TRACER.get_current_span()
+    if parent_span is not None:
+        TRACER.start_link(parent_span)
+
+    def download_cell_features(cell_year):
+        with TRACER.continue_span(parent_span):
+            _download_cell_features(settings, layer, source, *cell_year, client, features_callback, is_cancelled)
+
+    with ThreadPoolExecutor(max_workers=COVERAGE_DOWNLOAD_WORKERS) as executor:
+        futures = [executor.submit(download_cell_features, cell_year) for cell_year in cell_years]
+
+    exceptions = [future.exception() for future in futures if future.exception() is not None]
+    for exception in exceptions:
+        if isinstance(exception, DownloadCancelledError):
+            raise exception
+    if exceptions:
+        raise exceptions[0]
+
+
+def _download_cell_features(settings, layer, source, cell, year, client, features_callback, is_cancelled=None):
+    """Downloads features of a single grid cell for an entire year from Sentinel Hub WFS service and caches them.
+    Features are passed to the callback as soon as they are obtained."""
+    time_interval = get_year_time_interval(year)
+    bbox_str = ",".join(map(str, get_cell_bbox(cell, COVERAGE_CELL_SIZE)))
+
+    features = []
+    for page_features in _iter_feature_pages(settings, layer, bbox_str, time_interval, client, is_cancelled):
+        features.extend(page_features)
+        features_callback(page_features)
+
+    expires_at = _get_cache_expiry(time_interval)
+    _get_cloud_cover_cache().put_features(source, cell, time_interval, features, expires_at=expires_at)
+    _CLOUD_COVER_INDEX.put((source, cell, year), features, expires_at=expires_at)
+
+
+def _iter_feature_pages(settings, layer, bbox_str, time_interval, client, is_cancelled=None):
+    """Iterates over pages of all features in a bbox from Sentinel Hub WFS service. Before each page is requested it
+    checks if it should stop."""
+    feature_offset = 0
+    while True:
+        if is_cancelled is not None and is_cancelled():
+            raise DownloadCancelledError()
+
+        wfs_url = get_wfs_url(
+            settings, layer, bbox_str, time_interval, maxcc=100, crs=CrsType.POP_WEB, feature_offset=feature_offset
+        )
+        content = client.download(wfs_url, timeout=COVERAGE_REQUEST_TIMEOUT).content
+        with TRACER.span("parse_cloud_cover_features", category="parse"):
+            page_features = parse_cloud_cover_features(content)
+        yield page_features
+
+        if len(page_features) < WFS_MAX_FEATURES:
+            return
+        feature_offset += len(page_features)
 
 
-@functools.lru_cache(maxsize=10**4)
-def _cached_cloud_cover(wfs_url, client):
-    """Caches WFS calls to prevent too many repeating calls"""
-    results = client.download(wfs_url, timeout=COVERAGE_REQUEST_TIMEOUT).json()
+def _get_cache_expiry(time_interval):
+    """Cached features of time intervals that ended a while ago never expire. Features of more recent intervals can
+    still change as new acquisitions are ingested, therefore they expire after some time."""
+    end_date = dt.date.fromisoformat(time_interval.split("/")[1])
+    if end_date + dt.timedelta(days=COVERAGE_CACHE_SETTLE_DAYS) < dt.date.today():
+        return None
+    return time.time() + COVERAGE_CACHE_TTL
 
-    cloud_cover_map = {}
-    for feature in results["features"]:
-        date_str = str(feature["properties"]["date"])
-        cloud_cover_map[date_str] = float(feature["properties"].get("cloudCoverPercentage", 0))
 
-    return cloud_cover_map
+@functools.lru_cache(maxsize=1)
+def _get_cloud_cover_cache():
+    """Provides a persistent cache of cloud cover features, which is shared by all calls"""
+    cache = CloudCoverCache(os.path.join(get_cache_folder(), "cloud_cover.sqlite"))
+    METRICS.register_cache("cloud_cover", cache)
+    return cache
@@ -1,15 +1,18 @@
 """
 Module containing parameters and settings for Sentinel Hub services
 """
-import copy
+from PyQt5.QtCore import QSettings, QTimer
 
-from PyQt5.QtCore import QSettings
-
-from .constants import CrsType, ExtentType, ImageFormat, ImagePriority, ServiceType, TimeType
+from .constants import SETTINGS_FLUSH_DELAY, CrsType, ExtentType, ImageFormat, ImagePriority, ServiceType, TimeType
 
 
 class Settings:
-    """A class in charge of all settings. It also handles loading and saving of settings to QGIS settings store"""
+    """A class in charge of all settings. It also handles loading and saving of settings to QGIS settings store
+
+    Changes of auto-saved settings are not written to the store immediately. They are buffered and written together
+    shortly after the first change, or once `flush` is called, so that a burst of changes results in a single write of
+    each parameter.
+    """
 
     # pylint: disable=too-many-instance-attributes
 
@@ -43,6 +46,9 @@ class Settings:
 
     download_folder = ""
 
+    prefetch_layers = "false"
+    profile_actions = "false"
+
     _STORE_NAMESPACE = "SentinelHub"
     _AUTO_SAVE_STORE_PARAMETERS = {
         "instance_id",
@@ -60,6 +66,8 @@ class Settings:
         "lng_min",
         "lng_max",
         "download_folder",
+        "prefetch_layers",
+        "profile_actions",
     }
     _auto_save = False
     _CREDENTIAL_STORE_PARAMETERS = {"base_url", "client_id", "client_secret"}
@@ -68,18 +76,49 @@ class Settings:
     def __init__(self):
         self.qsettings = QSettings()
         self.load_local_settings()
+
+        self.requested_writes = 0
+        self.performed_writes = 0
+        self._pending_values = {}
+        self._flush_timer = None
         self._auto_save = True
 
     def __setattr__(self, key, value):
-        """Whenever one of the attributes from _AUTO_SAVE_STORE_PARAMETERS is set it is automatically saved to
+        """Whenever one of the attributes from _AUTO_SAVE_STORE_PARAMETERS is set it is scheduled to be saved to
         QGIS store
         """
         if self._auto_save and key in self._AUTO_SAVE_STORE_PARAMETERS:
-            store_path = self._get_store_path(key)
-            self.qsettings.setValue(store_path, value)
+            self.requested_writes += 1
+            self._pending_values[key] = value
+            self._schedule_flush()
 
         super().__setattr__(key, value)
 
+    @property
+    def saved_writes(self):
+        """A number of writes to QGIS store that have been avoided by buffering changes"""
+        return self.requested_writes - self.performed_writes - len(self._pending_values)
+
+    def flush(self):
+        """Writes all buffered changes to QGIS store"""
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+
+        pending_values, self._pending_values = self._pending_values, {}
+        for parameter, value in pending_values.items():
+            self.qsettings.setValue(self._get_store_path(parameter), value)
+        self.performed_writes += len(pending_values)
+
+    def _schedule_flush(self):
+        """Starts a timer which will flush buffered changes, unless it is already running"""
+        if self._flush_timer is None:
+            self._flush_timer = QTimer()
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.timeout.connect(self.flush)
+
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(SETTINGS_FLUSH_DELAY)
+
     def load_local_settings(self):
         """Loads settings from QGIS local store"""
 
@@ -97,13 +136,42 @@ class Settings:
             store_path = self._get_store_path(parameter)
             self.qsettings.setValue(store_path, getattr(self, parameter))
 
+    def update_credentials(self, settings):
+        """Takes a base URL and credentials from another Settings object instance
+
+        :param settings: Settings from which the credentials are taken
+        :type settings: Settings
+        """
+        for parameter in self._CREDENTIAL_STORE_PARAMETERS:
+            setattr(self, parameter, getattr(settings, parameter))
+
     def _get_store_path(self, parameter_name):
         """Provides a location of the parameter in the local store"""
         return f"{self._STORE_NAMESPACE}/{parameter_name}"
 
-    def copy(self):
-        """Provides a copy of a Settings object instance"""
-        return copy.copy(self)
+    def copy(self, auto_save=True):
+        """Provides a copy of a Settings object instance
+
+        :param auto_save: If False, changes of the copy won't be saved to QGIS store
+        :type auto_save: bool
+        """
+        if auto_save:
+            # The copy will save its own changes, therefore changes of this instance have to be saved before
+            self.flush()
+
+        return self._create_copy(self, auto_save)
+
+    @classmethod
+    def _create_copy(cls, settings, auto_save):
+        """Creates a shallow copy of a Settings object instance, which doesn't share buffered changes with it"""
+        settings_copy = cls.__new__(cls)
+        settings_copy.__dict__.update(vars(settings))
+        settings_copy._pending_values = {}
+        settings_copy._flush_timer = None
+        settings_copy._auto_save = auto_save
+        return settings_copy
 
     def clear(self):
+        """Discards buffered changes and removes all settings from QGIS store"""
+        self._pending_values = {}
         self.qsettings.clear()
@@ -0,0 +1,63 @@
+"""
+Fixtures for measuring benchmarks and comparing them with stored baselines
+
+Baselines depend on the machine on which they were measured, therefore they are stored locally and not versioned.
+"""
+import json
+import os
+import time
+
+import pytest
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+MEASUREMENT_RUNS = 7
+
+
+@pytest.fixture(name="baselines", scope="session")
+def baselines_fixture(request):
+    """Provides stored baselines and saves new ones at the end of a session if requested"""
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as fp:
+            baselines = json.load(fp)
+
+    new_baselines = {}
+    yield baselines, new_baselines
+
+    if request.config.getoption("--benchmark-save") and new_baselines:
+        with open(BASELINES_PATH, "w") as fp:
+            json.dump({**baselines, **new_baselines}, fp, indent=2, sort_keys=True)
+
+
+@pytest.fixture(name="measure")
+def measure_fixture(request, baselines, record_property):
+    """Provides a function which measures the fastest of a few runs of a given function and fails if it is
+    considerably slower than its baseline"""
+    stored_baselines, new_baselines = baselines
+    if request.config.getoption("--benchmark-save"):
+        # Results are being saved as new baselines, therefore they aren't compared with the old ones
+        stored_baselines = {}
+    tolerance = request.config.getoption("--benchmark-tolerance")
+
+    def measure(function, *args, **kwargs):
+        durations = []
+        for _ in range(MEASUREMENT_RUNS):
+            start_time = time.perf_counter()
+            result = function(*args, **kwargs)
+            durations.append(time.perf_counter() - start_time)
+
+        name = request.node.name
+        duration = min(durations)
+        new_baselines[name] = duration
+        record_property("seconds", duration)
+
+        baseline = stored_baselines.get(name)
+        if baseline is None:
+            print(f"\n{name}: {1000 * duration:.2f} ms, no baseline")
+            return result
+
+        print(f"\n{name}: {1000 * duration:.2f} ms, baseline {1000 * baseline:.2f} ms")
+        assert duration <= tolerance * baseline, f"{name} is {duration / baseline:.2f}-times slower than its baseline"
+        return result
+
+    return measure
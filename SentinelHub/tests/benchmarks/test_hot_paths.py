@@ -0,0 +1,151 @@
+"""
+Micro-benchmarks of helpers that run on every UI interaction or for every batch item
+
+Inputs are synthetic and larger than what the plugin usually gets, so that slowdowns aren't hidden in noise.
+"""
+import io
+import json
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from ...constants import ServiceType  # noqa: E402
+from ...sentinelhub.capabilities import parse_capabilities_crs  # noqa: E402
+from ...sentinelhub.cloud_cover import get_cloud_cover_map, parse_cloud_cover_features  # noqa: E402
+from ...sentinelhub.common import Layer  # noqa: E402
+from ...sentinelhub.ogc import get_service_uri, get_wcs_url, get_wfs_url  # noqa: E402
+from ...settings import Settings  # noqa: E402
+from ...utils.naming import get_filename, get_qgis_layer_name  # noqa: E402
+from ...utils.time import parse_date  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+FEATURE_COUNT = 10000
+CRS_COUNT = 500
+LAYER_COUNT = 5000
+ITEM_COUNT = 1000
+
+
+def _get_layer_payload(index):
+    return {
+        "id": f"LAYER-{index}",
+        "title": f"Layer {index}",
+        "datasourceDefaults": {"type": "S2L2A"},
+        "datasetSource": {"@id": "https://services.sentinel-hub.com/configuration/v1/datasets/S2L2A/sources/2"},
+    }
+
+
+def _get_wfs_response(feature_count):
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[[[index, 0], [index + 10, 0], [index + 10, 10], [index, 10], [index, 0]]]],
+            },
+            "properties": {
+                "id": f"tile-{index}",
+                "date": f"2023-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+                "time": "10:00:00",
+                "cloudCoverPercentage": index % 100,
+            },
+        }
+        for index in range(feature_count)
+    ]
+    return json.dumps({"type": "FeatureCollection", "features": features})
+
+
+def _get_capabilities_xml(crs_count, layer_count):
+    crs_elements = "".join(f"<CRS>EPSG:{32600 + index}</CRS>" for index in range(crs_count))
+    layer_elements = "".join(
+        f"<Layer><Name>LAYER-{index}</Name>{crs_elements}</Layer>" for index in range(min(layer_count, 10))
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><WMS_Capabilities xmlns="http://www.opengis.net/wms"><Capability>'
+        f"<Layer>{crs_elements}{layer_elements}</Layer></Capability></WMS_Capabilities>"
+    ).encode()
+
+
+@pytest.fixture(name="settings", scope="module")
+def settings_fixture():
+    settings = Settings().copy(auto_save=False)
+    settings.base_url = "https://services.sentinel-hub.com"
+    settings.instance_id = "instance"
+    settings.layer_id = "LAYER-0"
+    settings.start_time = "2023-03-01"
+    settings.end_time = "2023-03-31"
+    return settings
+
+
+@pytest.fixture(name="layers", scope="module")
+def layers_fixture():
+    return [Layer.load(_get_layer_payload(index)) for index in range(LAYER_COUNT)]
+
+
+@pytest.fixture(name="bboxes", scope="module")
+def bboxes_fixture():
+    return [f"{index},{index},{index + 0.5},{index + 0.5}" for index in range(ITEM_COUNT)]
+
+
+def test_parse_cloud_cover_features(measure) -> None:
+    content = _get_wfs_response(FEATURE_COUNT)
+    features = measure(parse_cloud_cover_features, content)
+    assert len(features) == FEATURE_COUNT
+
+
+def test_get_cloud_cover_map(measure) -> None:
+    features = parse_cloud_cover_features(_get_wfs_response(FEATURE_COUNT))
+    cloud_cover_map = measure(get_cloud_cover_map, features, (0, 0, FEATURE_COUNT / 2, 5))
+    assert cloud_cover_map
+
+
+def test_parse_capabilities_crs(measure) -> None:
+    content = _get_capabilities_xml(CRS_COUNT, LAYER_COUNT)
+    crs_ids = measure(lambda: parse_capabilities_crs(io.BytesIO(content)))
+    assert len(crs_ids) == CRS_COUNT
+
+
+def test_load_layers(measure) -> None:
+    payloads = [_get_layer_payload(index) for index in range(LAYER_COUNT)]
+    layers = measure(
+        lambda: sorted((Layer.load(payload) for payload in payloads), key=lambda layer: layer.name.lower())
+    )
+    assert len(layers) == LAYER_COUNT
+
+
+def test_get_qgis_layer_name(measure, settings, layers) -> None:
+    names = measure(lambda: [get_qgis_layer_name(settings, layer) for layer in layers])
+    assert len(set(names)) == LAYER_COUNT
+
+
+def test_get_filename(measure, settings, layers, bboxes) -> None:
+    filenames = measure(lambda: [get_filename(settings, layers[0], bbox) for bbox in bboxes])
+    assert len(set(filenames)) == ITEM_COUNT
+
+
+def test_get_wcs_url(measure, settings, layers, bboxes) -> None:
+    urls = measure(lambda: [get_wcs_url(settings, layers[0], bbox) for bbox in bboxes])
+    assert len(set(urls)) == ITEM_COUNT
+
+
+def test_get_wfs_url(measure, settings, layers, bboxes) -> None:
+    urls = measure(
+        lambda: [get_wfs_url(settings, layers[0], bbox, "2023-01-01/2023-12-31/P1D", maxcc=100) for bbox in bboxes]
+    )
+    assert len(set(urls)) == ITEM_COUNT
+
+
+@pytest.mark.parametrize("service_type", [ServiceType.WMS, ServiceType.WFS])
+def test_get_service_uri(measure, settings, layers, service_type) -> None:
+    service_settings = settings.copy(auto_save=False)
+    service_settings.service_type = service_type
+    uris = measure(lambda: [get_service_uri(service_settings, layer) for layer in layers[:ITEM_COUNT]])
+    assert len(uris) == ITEM_COUNT
+
+
+def test_parse_date(measure) -> None:
+    dates = [f"2023-{index % 12 + 1:02d}-{index % 28 + 1:02d}T10:00:00" for index in range(ITEM_COUNT)]
+    parsed_dates = measure(lambda: [parse_date(date) for date in dates])
+    assert None not in parsed_dates
@@ -0,0 +1,79 @@
+"""
+Benchmarks of how much time the plugin adds to QGIS startup
+
+Each measurement runs in a fresh Python process, in which QGIS modules are imported beforehand, because QGIS has them
+loaded by the time it loads plugins.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+pytestmark = pytest.mark.benchmark
+
+STARTUP_RUNS = 5
+
+# Modules that must not be imported before the plugin dock is opened for the first time
+LAZY_MODULES = {
+    "requests",
+    "oauthlib",
+    "requests_oauthlib",
+    "dateutil",
+    "SentinelHub.dockwidget",
+    "SentinelHub.sentinelhub.client",
+    "SentinelHub.sentinelhub.configuration",
+    "SentinelHub.sentinelhub.wcs",
+    "SentinelHub.sentinelhub.wfs",
+}
+
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+from unittest.mock import MagicMock
+
+from qgis.core import QgsApplication
+import qgis.utils
+
+app = QgsApplication([], True)
+preloaded_modules = set(sys.modules)
+
+start_time = time.perf_counter()
+from SentinelHub.main import SentinelHubPlugin
+
+iface = MagicMock()
+iface.mainWindow.return_value = None
+plugin = SentinelHubPlugin(iface)
+plugin.initGui()
+duration = time.perf_counter() - start_time
+
+print(json.dumps({"seconds": duration, "modules": sorted(set(sys.modules) - preloaded_modules)}))
+"""
+
+
+def _measure_plugin_startup():
+    """Measures loading and initialization of the plugin in a fresh Python process"""
+    plugin_parent_folder = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = {**os.environ, "QT_QPA_PLATFORM": "offscreen"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [plugin_parent_folder, env.get("PYTHONPATH")]))
+
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_plugin_startup_time(record_property) -> None:
+    measurements = [_measure_plugin_startup() for _ in range(STARTUP_RUNS)]
+
+    startup_time = statistics.median(measurement["seconds"] for measurement in measurements)
+    record_property("startup_seconds", startup_time)
+    print(f"\nThe plugin adds {1000 * startup_time:.1f} ms to QGIS startup")
+
+    loaded_modules = set(measurements[0]["modules"])
+    assert not loaded_modules & LAZY_MODULES
@@ -0,0 +1,144 @@
+"""
+End-to-end benchmarks of the plugin network paths against a local fake Sentinel Hub service
+
+They measure login latency, latency of a calendar refresh with cold and warm caches and WCS download throughput at
+different concurrency levels. Results are printed and recorded as test properties, which end up in a JUnit XML report.
+"""
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from PyQt5.QtCore import QStandardPaths  # noqa: E402
+from qgis.core import QgsRectangle  # noqa: E402
+
+from ...sentinelhub import configuration, wfs  # noqa: E402
+from ...sentinelhub.client import Client  # noqa: E402
+from ...sentinelhub.configuration import ConfigurationManager  # noqa: E402
+from ...sentinelhub.ogc import get_wcs_url  # noqa: E402
+from ...settings import Settings  # noqa: E402
+from ...utils.time import get_month_time_interval  # noqa: E402
+from ..fake_service import FakeSentinelHubService  # noqa: E402
+
+pytestmark = pytest.mark.benchmark
+
+SERVICE_LATENCY = 0.02
+MEASUREMENT_RUNS = 5
+CALENDAR_BBOX = 0, 0, 150000, 150000
+CONCURRENCY_LEVELS = [1, 4, 8]
+DOWNLOADS_PER_LEVEL = 16
+
+
+@pytest.fixture(name="service", scope="module")
+def service_fixture():
+    with FakeSentinelHubService(latency=SERVICE_LATENCY) as service:
+        yield service
+
+
+@pytest.fixture(name="settings")
+def settings_fixture(service, qgis_app, monkeypatch, tmp_path):  # pylint: disable=unused-argument
+    # The fake service doesn't use HTTPS
+    monkeypatch.setenv("OAUTHLIB_INSECURE_TRANSPORT", "1")
+    # Caches are kept apart from caches of a real plugin installation
+    QStandardPaths.setTestModeEnabled(True)
+
+    settings = Settings().copy(auto_save=False)
+    settings.base_url = service.base_url
+    settings.client_id = "client-id"
+    settings.client_secret = "client-secret"
+    settings.instance_id = "instance-0"
+    settings.layer_id = "LAYER-0"
+    settings.download_folder = str(tmp_path)
+
+    yield settings
+
+    Client.clear_sessions()
+    QStandardPaths.setTestModeEnabled(False)
+
+
+def _clear_caches():
+    """Removes all cached responses so that the next measurement starts cold"""
+    Client.clear_sessions()
+    configuration._get_configuration_cache().clear()
+    wfs._get_cloud_cover_cache().clear()
+    wfs._CLOUD_COVER_INDEX.clear()
+
+
+def _load_layer(settings, client):
+    """Loads the layer from settings in the same way as the plugin does before it uses the layer"""
+    manager = ConfigurationManager(settings, client)
+    manager.get_configurations()
+    manager.get_layers(settings.instance_id)
+    return manager.get_layer(settings.instance_id, settings.layer_id, load_url=True)
+
+
+def _report(record_property, name, value, unit):
+    record_property(name, value)
+    print(f"\n{name}: {value:.3f} {unit}")
+
+
+def test_login_latency(settings, service, record_property) -> None:
+    durations = []
+    for _ in range(MEASUREMENT_RUNS):
+        _clear_caches()
+        service.reset_counts()
+
+        start_time = time.perf_counter()
+        configurations = ConfigurationManager(settings, Client()).get_configurations(reload=True)
+        durations.append(time.perf_counter() - start_time)
+
+        assert len(configurations) == service.configuration_count
+        assert service.request_counts == {"oauth": 1, "configurations": 1}
+
+    _report(record_property, "login_seconds", statistics.median(durations), "s")
+
+
+def test_calendar_refresh_latency(settings, service, record_property) -> None:
+    bbox = QgsRectangle(*CALENDAR_BBOX)
+    time_interval = get_month_time_interval(2023, 3)
+
+    cold_durations, warm_durations = [], []
+    for _ in range(MEASUREMENT_RUNS):
+        _clear_caches()
+        client = Client()
+        layer = _load_layer(settings, client)
+
+        for durations in (cold_durations, warm_durations):
+            start_time = time.perf_counter()
+            cloud_cover_map = wfs.get_cloud_cover(settings, layer, bbox, time_interval, client)
+            durations.append(time.perf_counter() - start_time)
+
+            assert len(cloud_cover_map) == 31
+
+    _report(record_property, "calendar_cold_seconds", statistics.median(cold_durations), "s")
+    _report(record_property, "calendar_warm_seconds", statistics.median(warm_durations), "s")
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY_LEVELS)
+@pytest.mark.parametrize("throttle_rate", [0.0, 0.1])
+def test_download_throughput(settings, service, record_property, tmp_path, concurrency, throttle_rate) -> None:
+    _clear_caches()
+    client = Client(pool_size=concurrency)
+    layer = _load_layer(settings, client)
+    urls = [get_wcs_url(settings, layer, f"0,0,{index + 1},{index + 1}") for index in range(DOWNLOADS_PER_LEVEL)]
+    paths = [os.path.join(tmp_path, f"image_{index}.png") for index in range(DOWNLOADS_PER_LEVEL)]
+
+    service.throttle_rate = throttle_rate
+    try:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(client.download_to_file, urls, paths))
+        duration = time.perf_counter() - start_time
+    finally:
+        service.throttle_rate = 0.0
+
+    assert all(os.path.getsize(path) == service.coverage_size for path in paths)
+
+    megabytes = DOWNLOADS_PER_LEVEL * service.coverage_size / 1024**2
+    name = f"download_mb_per_second_concurrency_{concurrency}_throttle_{throttle_rate}"
+    _report(record_property, name, megabytes / duration, "MB/s")
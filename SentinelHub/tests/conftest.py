@@ -2,14 +2,42 @@
 Module with global fixtures
 """
 
+from types import SimpleNamespace
 
 import pytest
 
-from .testing_utilities import get_input_folder
+from .testing_utilities import FakeTaskManager, get_input_folder
 
 INPUT_FOLDER = get_input_folder(__file__)
 
 
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False, help="Run benchmarks")
+    parser.addoption(
+        "--benchmark-save", action="store_true", default=False, help="Save benchmark results as new baselines"
+    )
+    parser.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=1.5,
+        help="A factor by which a benchmark can be slower than its baseline before it fails",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: a benchmark which only runs with --benchmark option")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+
+    skip_benchmark = pytest.mark.skip(reason="Benchmarks only run with --benchmark option")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
 @pytest.fixture(name="input_folder")
 def input_folder_fixture() -> str:
     return INPUT_FOLDER
@@ -47,3 +75,13 @@ def qsettings() -> None:
     yield settings
 
     settings.clear()
+
+
+@pytest.fixture(name="task_manager")
+def task_manager_fixture(monkeypatch) -> FakeTaskManager:
+    """Replaces QGIS task manager with one that only collects tasks submitted by the plugin"""
+    from ..utils import tasks  # noqa: E402
+
+    task_manager = FakeTaskManager()
+    monkeypatch.setattr(tasks, "QgsApplication", SimpleNamespace(taskManager=lambda: task_manager))
+    return task_manager
@@ -0,0 +1,263 @@
+"""
+A local stand-in for Sentinel Hub service, which can be used by tests and benchmarks instead of the live service
+
+It implements only as much of the OAuth, Configuration API, WMS, WFS and WCS endpoints as the plugin needs. Latency,
+payload sizes and failures of responses can be configured.
+"""
+import datetime as dt
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DATA_SOURCE_TYPE = "S2L2A"
+DATA_SOURCE_ID = 2
+CRS_IDS = ["EPSG:3857", "EPSG:4326", "EPSG:32633"]
+
+
+class FakeSentinelHubService:
+    """A fake Sentinel Hub service running in a background thread of the current process
+
+    Responses of all endpoints are deterministic, except for injected failures, which are drawn from a random
+    generator with a fixed seed.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        configuration_count: int = 3,
+        layer_count: int = 10,
+        features_per_day: int = 2,
+        coverage_size: int = 1024 * 1024,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 42,
+    ):
+        """
+        :param latency: A number of seconds each response is delayed by
+        :param configuration_count: A number of configurations of a user
+        :param layer_count: A number of layers of each configuration
+        :param features_per_day: A number of WFS features per grid cell for each day
+        :param coverage_size: A number of bytes of each WCS image
+        :param error_rate: A probability that a request fails with status 500
+        :param throttle_rate: A probability that a request is rejected with status 429
+        :param seed: A seed of the random generator that decides which requests fail
+        """
+        self.latency = latency
+        self.configuration_count = configuration_count
+        self.layer_count = layer_count
+        self.features_per_day = features_per_day
+        self.coverage_size = coverage_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+        self.request_counts: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """A base URL of the running service"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSentinelHubService":
+        """Starts the service on a free local port"""
+        handler_class = type("Handler", (_RequestHandler,), {"service": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the service"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> "FakeSentinelHubService":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def reset_counts(self) -> None:
+        """Forgets numbers of received requests"""
+        with self._lock:
+            self.request_counts.clear()
+
+    def handle(self, method: str, url: str) -> Tuple[int, Dict[str, str], bytes]:
+        """Produces a status, headers and a body of a response to a request"""
+        path, params = _parse_url(url)
+        endpoint, payload_function = self._route(method, path, params)
+
+        with self._lock:
+            self.request_counts[endpoint] += 1
+            draw = self._random.random()
+
+        time.sleep(self.latency)
+
+        if endpoint == "unknown":
+            return 404, {}, b"Not found"
+        if draw < self.throttle_rate:
+            return 429, {"Retry-After": "0"}, b"Too many requests"
+        if draw < self.throttle_rate + self.error_rate:
+            return 500, {}, b"Internal server error"
+
+        content_type, body = payload_function()
+        return 200, {"Content-Type": content_type}, body
+
+    def _route(self, method, path, params):
+        """Decides which endpoint a request targets and how its payload is made"""
+        routes = [
+            ("POST", r"/oauth/token", "oauth", lambda _: self._get_token()),
+            ("GET", r"/configuration/v1/wms/instances", "configurations", lambda _: self._get_configurations()),
+            ("GET", r"/configuration/v1/wms/instances/([^/]+)/layers", "layers", self._get_layers),
+            ("GET", r"/configuration/v1/datasets", "datasets", lambda _: self._get_datasets()),
+            ("GET", r"/configuration/v1/datasets/([^/]+)/sources", "data_sources", self._get_data_sources),
+            ("GET", r"/configuration/v1/datasets/([^/]+)/sources/(\d+)", "data_source", self._get_data_source),
+            ("GET", r"/ogc/wms/([^/]+)", "wms", lambda _: self._get_capabilities()),
+            ("GET", r"/ogc/wfs/([^/]+)", "wfs", lambda _: self._get_features(params)),
+            ("GET", r"/ogc/wcs/([^/]+)", "wcs", lambda _: self._get_coverage()),
+        ]
+        for route_method, pattern, endpoint, payload_function in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                return endpoint, lambda: payload_function(match.groups())
+        return "unknown", None
+
+    def _get_token(self):
+        return _json_payload({"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600})
+
+    def _get_configurations(self):
+        return _json_payload(
+            [{"id": f"instance-{index}", "name": f"Configuration {index}"} for index in range(self.configuration_count)]
+        )
+
+    def _get_layers(self, groups):
+        instance_id = groups[0]
+        return _json_payload(
+            [
+                {
+                    "id": f"LAYER-{index}",
+                    "title": f"Layer {index} of {instance_id}",
+                    "datasourceDefaults": {"type": DATA_SOURCE_TYPE},
+                    "datasetSource": {"@id": f"{self.base_url}/datasets/{DATA_SOURCE_TYPE}/sources/{DATA_SOURCE_ID}"},
+                }
+                for index in range(self.layer_count)
+            ]
+        )
+
+    def _get_datasets(self):
+        return _json_payload([{"@id": f"{self.base_url}/configuration/v1/datasets/{DATA_SOURCE_TYPE}"}])
+
+    def _get_data_sources(self, _):
+        return _json_payload([self._get_data_source_payload()])
+
+    def _get_data_source(self, _):
+        return _json_payload(self._get_data_source_payload())
+
+    def _get_data_source_payload(self):
+        return {
+            "@id": f"{self.base_url}/configuration/v1/datasets/{DATA_SOURCE_TYPE}/sources/{DATA_SOURCE_ID}",
+            "description": "Sentinel-2 L2A",
+            "settings": {"indexServiceUrl": f"{self.base_url}/index/v3/collections/{DATA_SOURCE_TYPE}/searchIndex"},
+        }
+
+    def _get_capabilities(self):
+        crs_elements = "".join(f"<CRS>{crs_id}</CRS>" for crs_id in CRS_IDS)
+        layer_elements = "".join(f"<Layer><Name>LAYER-{index}</Name></Layer>" for index in range(self.layer_count))
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?><WMS_Capabilities xmlns="http://www.opengis.net/wms"><Capability>'
+            f"<Layer>{crs_elements}{layer_elements}</Layer></Capability></WMS_Capabilities>"
+        )
+        return "text/xml", xml.encode()
+
+    def _get_features(self, params):
+        """Provides a page of features, which are spread over each day of the requested time interval"""
+        start_date, end_date = (dt.date.fromisoformat(date[:10]) for date in params["time"][0].split("/")[:2])
+        x_min, y_min, x_max, y_max = map(float, params["bbox"][0].split(","))
+        offset = int(params.get("feature_offset", ["0"])[0])
+        max_features = int(params.get("maxfeatures", ["100"])[0])
+
+        features = []
+        day_count = (end_date - start_date).days + 1
+        for feature_index in range(offset, min(offset + max_features, day_count * self.features_per_day)):
+            day_index, tile_index = divmod(feature_index, self.features_per_day)
+            date = (start_date + dt.timedelta(days=day_index)).isoformat()
+            tile_x_min = x_min + (x_max - x_min) * tile_index / self.features_per_day
+            tile_x_max = x_min + (x_max - x_min) * (tile_index + 1) / self.features_per_day
+            features.append(_get_feature(date, tile_x_min, y_min, tile_x_max, y_max))
+
+        return _json_payload({"type": "FeatureCollection", "features": features})
+
+    def _get_coverage(self):
+        return "image/png", b"\0" * self.coverage_size
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Passes requests to the fake service"""
+
+    service: FakeSentinelHubService
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._respond("GET")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self._respond("POST")
+
+    def _respond(self, method):
+        status, headers, body = self.service.handle(method, self.path)
+
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        if status == 200 and method == "GET" and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        """Requests are not logged"""
+
+
+def _parse_url(url: str) -> Tuple[str, Dict[str, List[str]]]:
+    """Splits a URL path from its query parameters"""
+    url_parts = urlsplit(url)
+    return url_parts.path.rstrip("/"), parse_qs(url_parts.query)
+
+
+def _get_feature(date: str, x_min: float, y_min: float, x_max: float, y_max: float) -> dict:
+    """Creates a GeoJSON feature in the format of Sentinel Hub WFS"""
+    coordinates = [[[[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max], [x_min, y_min]]]]
+    return {
+        "type": "Feature",
+        "geometry": {"type": "MultiPolygon", "coordinates": coordinates},
+        "properties": {
+            "id": f"{date}-{x_min}-{y_min}",
+            "date": date,
+            "time": "10:00:00",
+            "cloudCoverPercentage": 10.0 * (int(date[-2:]) % 10),
+        },
+    }
+
+
+def _json_payload(payload) -> Tuple[str, bytes]:
+    return "application/json", json.dumps(payload).encode()
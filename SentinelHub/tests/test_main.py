@@ -0,0 +1,126 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from .. import main  # noqa: E402
+from ..constants import MessageType  # noqa: E402
+from ..main import SentinelHubPlugin  # noqa: E402
+from ..sentinelhub import wfs  # noqa: E402
+from ..settings import Settings  # noqa: E402
+from .testing_utilities import run_task  # noqa: E402
+
+
+@pytest.fixture(name="plugin")
+def plugin_fixture(task_manager, monkeypatch):
+    """A plugin with a mocked dock widget, which shows a calendar of March 2023 for a chosen layer"""
+    plugin = SentinelHubPlugin(MagicMock())
+    plugin.settings = Settings().copy(auto_save=False)
+    plugin.settings.instance_id = "instance"
+    plugin.settings.layer_id = "LAYER"
+    plugin.manager = MagicMock()
+
+    plugin.dockwidget = MagicMock()
+    plugin.dockwidget.calendarWidget.isVisible.return_value = True
+    plugin.dockwidget.calendarWidget.yearShown.return_value = 2023
+    plugin.dockwidget.calendarWidget.monthShown.return_value = 3
+    plugin._calendar_refresh_timer = MagicMock()
+
+    monkeypatch.setattr(main, "get_bbox", lambda _: (0, 0, 1, 1))
+    monkeypatch.setattr(main, "is_bbox_too_large", lambda *_: False)
+    monkeypatch.setattr(wfs, "get_cloud_cover", lambda settings, layer, bbox, *_, **__: {"2023-03-01": bbox})
+    return plugin
+
+
+def test_calendar_refresh_is_debounced(plugin, task_manager) -> None:
+    for _ in range(3):
+        plugin.schedule_calendar_refresh()
+
+    assert plugin._calendar_refresh_timer.start.call_count == 3
+    assert not task_manager.tasks
+
+    plugin.update_available_calendar_dates()
+
+    plugin._calendar_refresh_timer.stop.assert_called_once()
+    assert len(task_manager.tasks) == 1
+
+
+def test_extent_change_cancels_running_calendar_refresh(plugin, task_manager, monkeypatch) -> None:
+    applied_maps = []
+    monkeypatch.setattr(plugin, "_apply_calendar_dates", lambda *args: applied_maps.append(args[-1]))
+
+    plugin.update_available_calendar_dates()
+    plugin.schedule_calendar_refresh()
+
+    (task,) = task_manager.tasks
+    assert task.isCanceled()
+
+    run_task(task)
+    assert not applied_maps
+
+
+def test_only_latest_calendar_refresh_is_applied(plugin, task_manager, monkeypatch) -> None:
+    bboxes = iter([(0, 0, 1, 1), (1, 1, 2, 2)])
+    monkeypatch.setattr(main, "get_bbox", lambda _: next(bboxes))
+    applied_maps = []
+    monkeypatch.setattr(plugin, "_apply_calendar_dates", lambda *args: applied_maps.append(args[-1]))
+
+    plugin.update_available_calendar_dates()
+    plugin.update_available_calendar_dates()
+
+    old_task, new_task = task_manager.tasks
+    assert old_task.isCanceled()
+
+    run_task(new_task)
+    run_task(old_task)
+
+    assert applied_maps == [{"2023-03-01": (1, 1, 2, 2)}]
+
+
+def test_hidden_calendar_is_refreshed_once_shown(plugin, task_manager) -> None:
+    plugin.dockwidget.calendarWidget.isVisible.return_value = False
+
+    plugin.refresh_outdated_calendar()
+    plugin.schedule_calendar_refresh()
+    plugin.schedule_calendar_refresh()
+    plugin.refresh_outdated_calendar()
+
+    plugin._calendar_refresh_timer.start.assert_not_called()
+    assert not task_manager.tasks
+
+    plugin.dockwidget.calendarWidget.isVisible.return_value = True
+    plugin.refresh_outdated_calendar()
+    plugin.refresh_outdated_calendar()
+
+    assert len(task_manager.tasks) == 1
+
+
+@pytest.mark.parametrize(
+    "export_method_name, file_name, expected_message",
+    [
+        ("export_diagnostics", "diagnostics.json", "Diagnostics exported"),
+        ("export_trace", "trace.json", "Trace exported"),
+    ],
+)
+def test_export(plugin, monkeypatch, tmp_path, export_method_name, file_name, expected_message) -> None:
+    messages = []
+    monkeypatch.setattr(main, "show_message", lambda *args: messages.append(args))
+    export = getattr(plugin, export_method_name)
+
+    path = os.path.join(tmp_path, file_name)
+    monkeypatch.setattr(main, "QFileDialog", SimpleNamespace(getSaveFileName=lambda *_: (path, "JSON (*.json)")))
+    export()
+
+    assert os.path.exists(path)
+    assert messages[-1] == (f"{expected_message} to file {path}", MessageType.SUCCESS)
+
+    path = os.path.join(tmp_path, "missing-folder", file_name)
+    export()
+
+    assert not os.path.exists(path)
+    assert messages[-1][0].startswith("Failed to export")
+    assert messages[-1][1] is MessageType.CRITICAL
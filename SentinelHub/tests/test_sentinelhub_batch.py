@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from qgis.core import QgsRectangle  # noqa: E402
+
+from ..constants import BATCH_JOURNAL_FILENAME, ExtentType  # noqa: E402
+from ..exceptions import DownloadCancelledError, DownloadError  # noqa: E402
+from ..sentinelhub import batch  # noqa: E402
+from ..sentinelhub.batch import BatchItem, BatchItemStatus, BatchJob  # noqa: E402
+from ..sentinelhub.common import Layer  # noqa: E402
+from ..sentinelhub.wcs import get_wcs_filename  # noqa: E402
+from ..settings import Settings  # noqa: E402
+
+DATES = ["2023-03-01", "2023-03-02"]
+EXTENTS = [(QgsRectangle(0, 0, 1, 1), ExtentType.CUSTOM), (QgsRectangle(1, 1, 2, 2), ExtentType.CUSTOM)]
+
+
+def _get_layer(layer_id, data_source_type="S2L2A"):
+    return Layer.load(
+        {
+            "id": layer_id,
+            "title": layer_id,
+            "datasourceDefaults": {"type": data_source_type},
+            "datasetSource": {"@id": "https://services.sentinel-hub.com/configuration/v1/datasets/S2L2A/sources/2"},
+        }
+    )
+
+
+LAYERS = {layer_id: _get_layer(layer_id) for layer_id in ["LAYER-A", "LAYER-B"]}
+
+
+class FakeManager:
+    def get_layers(self, instance_id):
+        return list(LAYERS.values())
+
+    def get_layer(self, instance_id, layer_id, load_url=False):
+        return LAYERS[layer_id]
+
+
+class FakeDownloader:
+    """Replaces WCS downloads, it records downloaded items and can fail or cancel downloads of chosen items"""
+
+    def __init__(self, exceptions=None, cancel_after=None):
+        self.exceptions = exceptions or {}
+        self.cancel_after = cancel_after
+        self.downloaded = []
+        self._lock = threading.Lock()
+
+    def __call__(self, settings, layer, bbox, client, is_cancelled=None):
+        key = layer.id, settings.start_time or None, bbox.xMinimum()
+        if key in self.exceptions:
+            raise self.exceptions[key]
+
+        with self._lock:
+            if self.cancel_after is not None and len(self.downloaded) >= self.cancel_after:
+                raise DownloadCancelledError()
+            self.downloaded.append(key)
+
+
+@pytest.fixture(name="settings")
+def settings_fixture(tmp_path):
+    settings = Settings().copy(auto_save=False)
+    settings.instance_id = "instance"
+    settings.download_folder = str(tmp_path)
+    return settings
+
+
+@pytest.fixture(name="downloader")
+def downloader_fixture(monkeypatch):
+    downloader = FakeDownloader()
+    monkeypatch.setattr(batch, "download_wcs_image", downloader)
+    return downloader
+
+
+def _read_journal(settings):
+    with open(os.path.join(settings.download_folder, BATCH_JOURNAL_FILENAME)) as fp:
+        return json.load(fp)
+
+
+def test_from_product() -> None:
+    layers = [*LAYERS.values(), _get_layer("DEM", data_source_type="DEM")]
+    job = BatchJob.from_product(Settings().copy(auto_save=False), layers, DATES, EXTENTS, client=None)
+
+    assert len(job.items) == 2 * 2 * 2 + 2
+    assert len({item.key for item in job.items}) == len(job.items)
+    assert {item.date for item in job.items if item.layer.id == "DEM"} == {None}
+
+
+def test_item_journal_round_trip() -> None:
+    item = BatchItem(
+        LAYERS["LAYER-A"], "2023-03-01", QgsRectangle(1, 2, 3, 4), ExtentType.CURRENT, BatchItemStatus.FAILED, "Error"
+    )
+
+    loaded_item = BatchItem.load(json.loads(json.dumps(item.to_json())), LAYERS["LAYER-A"])
+
+    assert loaded_item.to_json() == item.to_json()
+    assert loaded_item.key == item.key
+
+
+def test_run(settings, downloader) -> None:
+    job = BatchJob.from_product(settings, list(LAYERS.values()), DATES, EXTENTS, client=None)
+
+    assert job.run() == []
+    assert len(downloader.downloaded) == 8
+    assert all(item.status is BatchItemStatus.DONE for item in job.items)
+    assert not os.path.exists(job.journal_path)
+
+
+def test_failures(settings, downloader) -> None:
+    downloader.exceptions = {
+        ("LAYER-A", "2023-03-01", 0): DownloadError("Service unavailable"),
+        ("LAYER-B", "2023-03-02", 1): RuntimeError("GDAL failed"),
+        ("LAYER-B", "2023-03-01", 1): KeyError("layer"),
+    }
+    job = BatchJob.from_product(settings, list(LAYERS.values()), DATES, EXTENTS, client=None)
+
+    failed_items = job.run()
+
+    assert sorted(item.error for item in failed_items) == ["'layer'", "GDAL failed", "Service unavailable"]
+    assert len(downloader.downloaded) == 5
+
+    journal_statuses = [item["status"] for item in _read_journal(settings)["items"]]
+    assert journal_statuses.count(BatchItemStatus.FAILED.value) == 3
+    assert journal_statuses.count(BatchItemStatus.DONE.value) == 5
+
+
+def test_resume(settings, downloader) -> None:
+    downloader.cancel_after = 3
+    job = BatchJob.from_product(settings, list(LAYERS.values()), DATES, EXTENTS, client=None)
+    job.run()
+
+    journal = _read_journal(settings)
+    assert journal["settings"]["instance_id"] == "instance"
+    assert [item["status"] for item in journal["items"]].count(BatchItemStatus.DONE.value) == 3
+
+    downloader.cancel_after = None
+    resumed_job = BatchJob.resume(settings, FakeManager(), client=None)
+
+    assert [item.key for item in resumed_job.items] == [item.key for item in job.items]
+    assert resumed_job.run() == []
+    assert len(downloader.downloaded) == 8
+    assert len(set(downloader.downloaded)) == 8
+    assert not os.path.exists(resumed_job.journal_path)
+
+
+def test_resume_retries_failed_items(settings, downloader) -> None:
+    failing_key = "LAYER-A", "2023-03-01", 0
+    downloader.exceptions = {failing_key: DownloadError("Service unavailable")}
+    BatchJob.from_product(settings, list(LAYERS.values()), DATES, EXTENTS, client=None).run()
+
+    downloader.exceptions = {}
+    resumed_job = BatchJob.resume(settings, FakeManager(), client=None)
+
+    assert resumed_job.run() == []
+    assert downloader.downloaded.count(failing_key) == 1
+
+
+def test_resume_without_journal(settings) -> None:
+    assert BatchJob.resume(settings, FakeManager(), client=None) is None
+
+
+def test_existing_files_are_skipped(settings, downloader) -> None:
+    job = BatchJob.from_product(settings, list(LAYERS.values()), DATES, EXTENTS, client=None)
+    existing_item = job.items[0]
+    item_settings = job._get_item_settings(existing_item)
+    filename = get_wcs_filename(item_settings, existing_item.layer, existing_item.bbox)
+    open(os.path.join(settings.download_folder, filename), "wb").close()
+
+    assert job.run() == []
+
+    assert existing_item.status is BatchItemStatus.SKIPPED
+    assert len(downloader.downloaded) == 7
+    assert ("LAYER-A", "2023-03-01", 0) not in downloader.downloaded
+    assert not os.path.exists(job.journal_path)
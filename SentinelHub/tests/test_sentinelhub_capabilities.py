@@ -0,0 +1,24 @@
+import io
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from ..sentinelhub.capabilities import parse_capabilities_crs  # noqa: E402
+
+CAPABILITIES_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<WMS_Capabilities xmlns="http://www.opengis.net/wms" version="1.3.0">
+  <Service><Name>WMS</Name></Service>
+  <Capability>
+    <Layer>
+      <Title>Sentinel Hub WMS service</Title>
+      <CRS>EPSG:3857</CRS>
+      <CRS>EPSG:4326</CRS>
+      <Layer>
+        <Name>TRUE-COLOR</Name>
+        <CRS>EPSG:32633</CRS>
+"""
+
+
+def test_parse_capabilities_crs() -> None:
+    assert parse_capabilities_crs(io.BytesIO(CAPABILITIES_XML)) == ["EPSG:3857", "EPSG:4326"]
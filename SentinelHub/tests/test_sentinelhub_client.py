@@ -0,0 +1,96 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+import requests
+
+pytest.importorskip("qgis.core")
+
+from ..exceptions import DownloadError  # noqa: E402 pylint: disable=wrong-import-position
+from ..sentinelhub.client import Client  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def _get_blocking_client(release_event, response):
+    client = Client()
+    client._download = mock.Mock(side_effect=lambda *_: release_event.wait() and response)
+    return client
+
+
+def test_download_coalesces_identical_requests() -> None:
+    release_event = threading.Event()
+    response = mock.Mock()
+    client = _get_blocking_client(release_event, response)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(client.download, "https://example.com/a") for _ in range(3)]
+        other_future = executor.submit(client.download, "https://example.com/b")
+        while client.coalesced_requests < 2:
+            time.sleep(0.01)
+        release_event.set()
+
+    assert [future.result() for future in futures] == [response] * 3
+    assert other_future.result() is response
+    assert client._download.call_count == 2
+    assert client.coalesced_requests == 2
+
+    client.download("https://example.com/a")
+    assert client._download.call_count == 3
+
+
+def test_download_forgets_failed_requests() -> None:
+    client = Client()
+    client._download = mock.Mock(side_effect=DownloadError("failed"))
+
+    with pytest.raises(DownloadError):
+        client.download("https://example.com/a")
+    assert not client._requests_in_flight
+
+
+@pytest.fixture(name="transports")
+def transports_fixture(monkeypatch):
+    """Replaces sending of requests and records which transport sent each request"""
+    transports = []
+
+    def get(transport, url, **_):
+        transports.append(transport)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.raw = io.BytesIO(b"{}")
+        return response
+
+    monkeypatch.setattr(requests.Session, "get", get)
+    return transports
+
+
+def test_transports_are_shared_per_deployment(transports) -> None:
+    client = Client(pool_size=3)
+
+    client.download("https://services.sentinel-hub.com/ogc/wms/a")
+    client.download("https://services.sentinel-hub.com/configuration/v1/wms/instances")
+    client.download("https://creodias.sentinel-hub.com/ogc/wms/a")
+
+    assert transports[0] is transports[1]
+    assert transports[2] is not transports[0]
+    assert len(client._transports) == 2
+
+    adapter = transports[0].get_adapter("https://services.sentinel-hub.com")
+    assert adapter._pool_maxsize == 3
+
+
+def test_close_removes_transports(transports) -> None:
+    client = Client()
+    client.download("https://services.sentinel-hub.com/ogc/wms/a")
+    transport = transports[0]
+    transport.close = mock.Mock()
+
+    client.close()
+
+    transport.close.assert_called_once()
+    assert not client._transports
+
+    client.download("https://services.sentinel-hub.com/ogc/wms/a")
+    assert transports[1] is not transport
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from ..sentinelhub.cloud_cover import (  # noqa: E402
+    CloudCoverCache,
+    CloudCoverFeature,
+    CloudCoverIndex,
+    _get_polygons_wkb,
+    filter_features_by_date,
+    get_cell_bbox,
+    get_cloud_cover_map,
+    get_grid_cells,
+    parse_cloud_cover_features,
+)
+
+FEATURES = [
+    CloudCoverFeature("a", "2023-03-01", 10.0, 0, 0, 10, 10),
+    CloudCoverFeature("b", "2023-03-02", 50.0, 20, 20, 30, 30),
+]
+
+
+@pytest.mark.parametrize(
+    "bbox, cell_size, expected_cells",
+    [
+        ((1, 1, 2, 2), 10, [(0, 0)]),
+        ((-1, 1, 12, 2), 10, [(-1, 0), (0, 0), (1, 0)]),
+        ((5, 5, 15, 15), 10, [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    ],
+)
+def test_get_grid_cells(bbox, cell_size, expected_cells) -> None:
+    assert get_grid_cells(bbox, cell_size) == expected_cells
+
+
+def test_get_cell_bbox() -> None:
+    assert get_cell_bbox((-1, 2), 10) == (-10, 20, 0, 30)
+
+
+def test_parse_cloud_cover_features() -> None:
+    payload = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "MultiPolygon",
+                    "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::3857"}},
+                    "coordinates": [[[[0, 1], [4, 1], [4, 5], [0, 1]]]],
+                },
+                "properties": {"id": "tile", "date": "2023-03-01", "time": "10:00:00", "cloudCoverPercentage": 12.5},
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [0, 0]]]},
+                "properties": {"date": "2023-03-02", "time": "10:00:00"},
+            },
+            {
+                "type": "Feature",
+                "geometry": None,
+                "properties": {"id": "empty", "date": "2023-03-03", "time": "10:00:00", "cloudCoverPercentage": 0},
+            },
+        ],
+    }
+    assert parse_cloud_cover_features(json.dumps(payload)) == [
+        CloudCoverFeature(
+            "tile", "2023-03-01", 12.5, 0, 1, 4, 5, _get_polygons_wkb("Polygon", [[[0, 1], [4, 1], [4, 5], [0, 1]]])
+        ),
+        CloudCoverFeature(
+            "2023-03-02|10:00:00|0,0,1,1",
+            "2023-03-02",
+            0.0,
+            0,
+            0,
+            1,
+            1,
+            _get_polygons_wkb("MultiPolygon", [[[[0, 0], [1, 1], [0, 0]]]]),
+        ),
+    ]
+
+
+def test_get_polygons_wkb() -> None:
+    polygon = [[[0, 0], [2, 0], [2, 2], [0, 0]]]
+    assert _get_polygons_wkb("Polygon", polygon) == _get_polygons_wkb("MultiPolygon", [polygon])
+    assert len(_get_polygons_wkb("Polygon", polygon)) == 9 + 9 + 4 + 4 * 16
+    assert _get_polygons_wkb("Point", [0, 0]) is None
+
+
+@pytest.mark.parametrize(
+    "bbox, expected_map",
+    [
+        ((5, 5, 25, 25), {"2023-03-01": 10.0, "2023-03-02": 50.0}),
+        ((1, 1, 2, 2), {"2023-03-01": 10.0}),
+        ((11, 11, 12, 12), {}),
+        ((10, 0, 20, 10), {"2023-03-01": 10.0}),
+    ],
+)
+def test_get_cloud_cover_map(bbox, expected_map) -> None:
+    assert get_cloud_cover_map(FEATURES, bbox) == expected_map
+
+
+def test_get_cloud_cover_map_weighting() -> None:
+    features = [
+        *FEATURES,
+        CloudCoverFeature("c", "2023-03-01", 70.0, 5, 0, 15, 10),
+        CloudCoverFeature("d", "2023-03-02", 20.0, 30, 20, 40, 30),
+    ]
+    assert get_cloud_cover_map(features, (0, 0, 15, 10)) == {"2023-03-01": pytest.approx(40.0)}
+    assert get_cloud_cover_map(features, (30, 20, 40, 30)) == {"2023-03-02": pytest.approx(20.0)}
+    assert get_cloud_cover_map([], (0, 0, 1, 1)) == {}
+
+
+def _get_triangle_feature(feature_id, date, cloud_cover, points):
+    """A feature with a triangular footprint, which covers only half of its bbox"""
+    x_coords, y_coords = zip(*points)
+    return CloudCoverFeature(
+        feature_id,
+        date,
+        cloud_cover,
+        min(x_coords),
+        min(y_coords),
+        max(x_coords),
+        max(y_coords),
+        _get_polygons_wkb("Polygon", [[*points, points[0]]]),
+    )
+
+
+def test_get_cloud_cover_map_footprints() -> None:
+    features = [
+        _get_triangle_feature("a", "2023-03-01", 10.0, [(0, 0), (10, 0), (0, 10)]),
+        _get_triangle_feature("b", "2023-03-02", 50.0, [(0, 0), (10, 0), (10, 10)]),
+        _get_triangle_feature("c", "2023-03-02", 20.0, [(0, 0), (10, 10), (0, 10)]),
+    ]
+
+    assert get_cloud_cover_map(features, (8, 8, 10, 10)) == {"2023-03-02": pytest.approx(35.0)}
+    assert get_cloud_cover_map(features, (9.5, 1, 10, 2)) == {"2023-03-02": pytest.approx(50.0)}
+    assert get_cloud_cover_map(features, (0, 0, 10, 10)) == {
+        "2023-03-01": pytest.approx(10.0),
+        "2023-03-02": pytest.approx(35.0),
+    }
+    assert get_cloud_cover_map(features, (2, 0, 10, 4)) == {
+        "2023-03-01": pytest.approx(10.0),
+        "2023-03-02": pytest.approx((50.0 * 30 + 20.0 * 2) / 32),
+    }
+
+
+def test_cloud_cover_cache(tmp_path) -> None:
+    cache = CloudCoverCache(os.path.join(tmp_path, "cache.sqlite"))
+    assert cache.get_features("source", (0, 0), "interval") is None
+
+    features = [*FEATURES, _get_triangle_feature("c", "2023-03-03", 0.0, [(0, 0), (10, 0), (0, 10)])]
+    cache.put_features("source", (0, 0), "interval", features)
+    assert cache.get_features("source", (0, 0), "interval") == (features, None)
+    assert cache.get_features("source", (0, 1), "interval") is None
+
+    cache.put_features("source", (0, 1), "interval", [], expires_at=0)
+    assert cache.get_features("source", (0, 1), "interval") is None
+
+    cache.clear()
+    assert cache.get_features("source", (0, 0), "interval") is None
+
+
+def test_cloud_cover_index() -> None:
+    index = CloudCoverIndex(max_size=2)
+    index.put("a", FEATURES[:1])
+    index.put("b", FEATURES[1:])
+    assert index.get("a") == FEATURES[:1]
+
+    index.put("c", [])
+    assert index.get("b") is None
+    assert index.get("a") == FEATURES[:1]
+
+    index.put("d", FEATURES, expires_at=0)
+    assert index.get("d") is None
+
+
+def test_filter_features_by_date() -> None:
+    assert filter_features_by_date(FEATURES, "2023-03-02", "2023-03-31") == FEATURES[1:]
+
+
+def test_cloud_cover_cache_drops_old_schema(tmp_path) -> None:
+    path = os.path.join(tmp_path, "cache.sqlite")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE cells (source TEXT, cell_x INTEGER, cell_y INTEGER, interval TEXT, expires_at REAL)"
+        )
+        connection.execute("INSERT INTO cells VALUES ('source', 0, 0, 'interval', NULL)")
+    connection.close()
+
+    cache = CloudCoverCache(path)
+    assert cache.get_features("source", (0, 0), "interval") is None
+
+    cache.put_features("source", (0, 0), "interval", FEATURES)
+    assert CloudCoverCache(path).get_features("source", (0, 0), "interval") == (FEATURES, None)
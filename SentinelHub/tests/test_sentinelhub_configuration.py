@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from ..exceptions import DownloadError  # noqa: E402
+from ..sentinelhub import configuration  # noqa: E402
+from ..sentinelhub.configuration import ConfigurationManager  # noqa: E402
+from ..sentinelhub.http_cache import HttpCache  # noqa: E402
+from ..settings import Settings  # noqa: E402
+
+BASE_URL = "https://services.sentinel-hub.com"
+CONFIGURATION_URL = f"{BASE_URL}/configuration/v1"
+DATA_SOURCE = {
+    "@id": f"{CONFIGURATION_URL}/datasets/S2L2A/sources/2",
+    "description": "Sentinel-2 L2A",
+    "settings": {"indexServiceUrl": f"{BASE_URL}/index"},
+}
+LAYER = {
+    "id": "LAYER",
+    "title": "Layer",
+    "datasourceDefaults": {"type": "S2L2A"},
+    "datasetSource": {"@id": DATA_SOURCE["@id"]},
+}
+INSTANCE_IDS = ["instance", "other", "another", "unavailable"]
+RESPONSES = {
+    f"{CONFIGURATION_URL}/wms/instances": [
+        {"id": instance_id, "name": instance_id.capitalize()} for instance_id in INSTANCE_IDS
+    ],
+    **{f"{CONFIGURATION_URL}/wms/instances/{instance_id}/layers": [LAYER] for instance_id in INSTANCE_IDS},
+    f"{CONFIGURATION_URL}/datasets": [{"@id": f"{CONFIGURATION_URL}/datasets/S2L2A"}],
+    f"{CONFIGURATION_URL}/datasets/S2L2A/sources": [DATA_SOURCE],
+    DATA_SOURCE["@id"]: DATA_SOURCE,
+}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.content = json.dumps(payload).encode()
+        self.status_code = 200
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeConfigurationClient:
+    """Responds with fixed Configuration API payloads, requests of chosen URLs fail"""
+
+    def __init__(self, failing_urls=()):
+        self.failing_urls = set(failing_urls)
+        self.urls = []
+
+    def download(self, url, session_settings=None, headers=None):
+        self.urls.append(url)
+        if url in self.failing_urls:
+            raise DownloadError("Service unavailable")
+        return FakeResponse(RESPONSES[url])
+
+
+@pytest.fixture(name="manager_factory")
+def manager_factory_fixture(monkeypatch, tmp_path):
+    cache = HttpCache(os.path.join(tmp_path, "configuration.sqlite"), ttl=100)
+    monkeypatch.setattr(configuration, "_get_configuration_cache", lambda: cache)
+
+    def create_manager(client):
+        settings = Settings().copy(auto_save=False)
+        settings.base_url = BASE_URL
+        manager = ConfigurationManager(settings, client)
+        manager.get_configurations()
+        manager.get_layers("instance")
+        return manager
+
+    return create_manager
+
+
+def test_get_layer_with_data_source_index(manager_factory) -> None:
+    client = FakeConfigurationClient()
+
+    layer = manager_factory(client).get_layer("instance", "LAYER", load_url=True)
+
+    assert (layer.data_source.name, layer.data_source.service_url) == ("Sentinel-2 L2A", BASE_URL)
+    assert DATA_SOURCE["@id"] not in client.urls
+
+
+def test_get_layer_without_data_source_index(manager_factory) -> None:
+    client = FakeConfigurationClient(failing_urls=[f"{CONFIGURATION_URL}/datasets/S2L2A/sources"])
+
+    layer = manager_factory(client).get_layer("instance", "LAYER", load_url=True)
+
+    assert (layer.data_source.name, layer.data_source.service_url) == ("Sentinel-2 L2A", BASE_URL)
+    assert client.urls[-1] == DATA_SOURCE["@id"]
+
+
+def _get_loaded_instance_ids(manager):
+    return [configuration.id for configuration in manager.get_configurations() if configuration.layers is not None]
+
+
+def test_prefetch_layers(manager_factory) -> None:
+    client = FakeConfigurationClient(failing_urls=[f"{CONFIGURATION_URL}/wms/instances/unavailable/layers"])
+    manager = manager_factory(client)
+    loaded_layers = manager.get_layers("instance")
+    client.urls.clear()
+
+    assert manager.prefetch_layers() == 2
+
+    assert _get_loaded_instance_ids(manager) == ["another", "instance", "other"]
+    assert manager.get_layers("instance") is loaded_layers
+    assert sorted(client.urls) == [
+        f"{CONFIGURATION_URL}/wms/instances/{instance_id}/layers" for instance_id in ["another", "other", "unavailable"]
+    ]
+
+
+def test_prefetch_layers_is_cancelled(manager_factory) -> None:
+    client = FakeConfigurationClient()
+    manager = manager_factory(client)
+    client.urls.clear()
+
+    assert manager.prefetch_layers(is_cancelled=lambda: True) == 0
+
+    assert _get_loaded_instance_ids(manager) == ["instance"]
+    assert client.urls == []
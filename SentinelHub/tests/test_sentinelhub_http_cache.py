@@ -0,0 +1,23 @@
+import os
+
+from ..sentinelhub.http_cache import HttpCache
+
+
+def test_http_cache(tmp_path) -> None:
+    cache = HttpCache(os.path.join(tmp_path, "cache.sqlite"), ttl=100)
+    assert cache.get("key") is None
+
+    cache.put("key", b'["content"]', etag='"abc"')
+    entry = cache.get("key")
+    assert (entry.content, entry.etag, entry.last_modified) == (b'["content"]', '"abc"', None)
+    assert cache.is_fresh(entry)
+
+    cache.ttl = 0
+    assert not cache.is_fresh(entry)
+
+    cache.mark_revalidated("key")
+    assert cache.get("key").stored_at >= entry.stored_at
+    assert cache.get_stats() == {"hits": 2, "misses": 1, "revalidations": 1}
+
+    cache.clear()
+    assert cache.get("key") is None
@@ -0,0 +1,413 @@
+import io
+import json
+import threading
+
+import pytest
+import requests
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from oauthlib.oauth2.rfc6749.errors import OAuth2Error  # noqa: E402
+
+from ..constants import SESSION_IDLE_TIMEOUT, SESSION_REFRESH_RETRY_DELAY  # noqa: E402
+from ..exceptions import DownloadError, SessionError  # noqa: E402
+from ..sentinelhub import client as client_module  # noqa: E402
+from ..sentinelhub import session as session_module  # noqa: E402
+from ..sentinelhub.client import Client  # noqa: E402
+from ..sentinelhub.session import Session  # noqa: E402
+from ..settings import Settings  # noqa: E402
+
+BASE_URL = "https://services.sentinel-hub.com"
+TOKEN_LIFETIME = 3600
+REFRESH_DELAY = TOKEN_LIFETIME - Session.SECONDS_BEFORE_EXPIRY
+
+
+class FakeClock:
+    """Replaces the time module of session and client modules"""
+
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+class FakeTimer:
+    """Instead of running in a thread, the test decides when a timer fires"""
+
+    def __init__(self, interval, function):
+        self.interval = interval
+        self.function = function
+        self.daemon = False
+        self.is_started = False
+        self.is_cancelled = False
+        self.is_fired = False
+
+    def start(self):
+        self.is_started = True
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def is_alive(self):
+        return self.is_started and not self.is_cancelled and not self.is_fired
+
+    def fire(self):
+        self.is_fired = True
+        self.function()
+
+
+class FakeTokenEndpoint:
+    """Replaces OAuth2Session, each fetched token is valid for TOKEN_LIFETIME seconds"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.requests = []
+        self.exception = None
+
+    def __call__(self, client):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def fetch_token(self, token_url, client_id, client_secret):
+        self.requests.append((token_url, client_id, client_secret))
+        if self.exception is not None:
+            raise self.exception
+
+        return {
+            "access_token": f"token-{len(self.requests)}",
+            "token_type": "Bearer",
+            "expires_in": TOKEN_LIFETIME,
+            "expires_at": self.clock.now + TOKEN_LIFETIME,
+        }
+
+
+class FakeAuthManager:
+    """Replaces the QGIS authentication database"""
+
+    def __init__(self):
+        self.is_unlocked = False
+        self.settings = {}
+
+    def masterPasswordIsSet(self):  # noqa: N802 pylint: disable=invalid-name
+        return self.is_unlocked
+
+    def authSetting(self, key, default_value, decrypt):  # noqa: N802 pylint: disable=invalid-name
+        assert decrypt
+        return self.settings.get(key, default_value)
+
+    def storeAuthSetting(self, key, value, encrypt):  # noqa: N802 pylint: disable=invalid-name
+        assert encrypt
+        self.settings[key] = value
+        return True
+
+    def removeAuthSetting(self, key):  # noqa: N802 pylint: disable=invalid-name
+        self.settings.pop(key, None)
+        return True
+
+
+class FakeTransport:
+    """Replaces a pooled HTTP transport, it rejects requests with revoked tokens"""
+
+    def __init__(self, revoked_tokens=()):
+        self.revoked_tokens = set(revoked_tokens)
+        self.authorizations = []
+
+    def get(self, url, headers, **_):
+        self.authorizations.append(headers["Authorization"])
+
+        response = requests.Response()
+        response.url = url
+        response.status_code = 401 if headers["Authorization"].split()[-1] in self.revoked_tokens else 200
+        response.raw = io.BytesIO(b"{}")
+        return response
+
+
+@pytest.fixture(name="clock")
+def clock_fixture(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_module, "time", clock)
+    monkeypatch.setattr(client_module, "time", clock)
+    return clock
+
+
+@pytest.fixture(name="timers")
+def timers_fixture(monkeypatch):
+    timers = []
+
+    def create_timer(interval, function):
+        timers.append(FakeTimer(interval, function))
+        return timers[-1]
+
+    monkeypatch.setattr(threading, "Timer", create_timer)
+    return timers
+
+
+@pytest.fixture(name="token_endpoint")
+def token_endpoint_fixture(monkeypatch, clock):
+    token_endpoint = FakeTokenEndpoint(clock)
+    monkeypatch.setattr(session_module, "OAuth2Session", token_endpoint)
+    return token_endpoint
+
+
+@pytest.fixture(name="auth_manager", autouse=True)
+def auth_manager_fixture(monkeypatch):
+    auth_manager = FakeAuthManager()
+    monkeypatch.setattr(session_module.QgsApplication, "authManager", staticmethod(lambda: auth_manager))
+    return auth_manager
+
+
+@pytest.fixture(name="session_cache", autouse=True)
+def session_cache_fixture():
+    Client.clear_sessions()
+    yield Client._CACHED_SESSIONS
+    Client.clear_sessions()
+
+
+def _get_settings(client_id="client", client_secret="secret"):
+    settings = Settings().copy(auto_save=False)
+    settings.base_url = BASE_URL
+    settings.client_id = client_id
+    settings.client_secret = client_secret
+    return settings
+
+
+def test_token_is_refreshed_before_expiry(clock, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    assert not token_endpoint.requests
+
+    assert session.token["access_token"] == "token-1"
+    assert [timer.interval for timer in timers] == [REFRESH_DELAY]
+
+    clock.now += REFRESH_DELAY
+    assert session.token["access_token"] == "token-1"
+    timers[-1].fire()
+
+    assert len(token_endpoint.requests) == 2
+    assert [timer.interval for timer in timers] == [REFRESH_DELAY, REFRESH_DELAY]
+    assert session.token["access_token"] == "token-2"
+    assert len(token_endpoint.requests) == 2
+
+
+def test_token_close_to_expiry_schedules_refresh(clock, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+    timers[-1].cancel()
+
+    clock.now += REFRESH_DELAY + 1
+    assert session.token["access_token"] == "token-1"
+    assert timers[-1].interval == 0 and timers[-1].is_alive()
+
+    timers[-1].fire()
+    assert session.token["access_token"] == "token-2"
+
+
+def test_expired_token_is_fetched_in_calling_thread(clock, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+
+    clock.now += TOKEN_LIFETIME
+    assert session.token["access_token"] == "token-2"
+    assert len(timers) == 2
+
+
+def test_idle_session_is_not_refreshed(clock, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+
+    clock.now += SESSION_IDLE_TIMEOUT + 1
+    timers[-1].fire()
+
+    assert len(token_endpoint.requests) == 1
+    assert len(timers) == 1
+
+
+def test_failed_refresh_is_retried(clock, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+
+    token_endpoint.exception = OAuth2Error("Service unavailable")
+    clock.now += REFRESH_DELAY
+    session.token  # pylint: disable=pointless-statement
+    timers[-1].fire()
+
+    assert timers[-1].interval == SESSION_REFRESH_RETRY_DELAY
+    assert session.token["access_token"] == "token-1"
+
+    token_endpoint.exception = None
+    timers[-1].fire()
+    assert session.token["access_token"] == "token-3"
+
+
+def test_failed_fetch_raises_session_error(token_endpoint) -> None:
+    token_endpoint.exception = OAuth2Error("Invalid client")
+
+    with pytest.raises(SessionError):
+        Session(BASE_URL, "client", "secret").token  # pylint: disable=expression-not-assigned
+
+
+def test_close_cancels_refresh(timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+
+    session.close()
+
+    assert timers[-1].is_cancelled
+    session._schedule_refresh(0)
+    assert len(timers) == 1
+
+
+def test_evicted_sessions_are_closed(monkeypatch, session_cache, timers, token_endpoint) -> None:
+    monkeypatch.setattr(client_module, "SESSION_CACHE_SIZE", 2)
+    sessions = [Client._get_session(_get_settings(client_id=f"client-{index}")) for index in range(2)]
+    for session in sessions:
+        session.token  # pylint: disable=pointless-statement
+
+    Client._get_session(_get_settings(client_id="client-0"))
+    Client._get_session(_get_settings(client_id="client-2"))
+
+    assert list(session_cache.values())[0] is sessions[0]
+    assert len(session_cache) == 2
+    assert [timer.is_cancelled for timer in timers] == [False, True]
+
+
+def test_idle_sessions_are_evicted(clock, session_cache, timers, token_endpoint) -> None:
+    idle_session = Client._get_session(_get_settings(client_id="idle"))
+    idle_session.token  # pylint: disable=pointless-statement
+
+    clock.now += SESSION_IDLE_TIMEOUT + 1
+    session = Client._get_session(_get_settings())
+
+    assert list(session_cache.values()) == [session]
+    assert timers[-1].is_cancelled
+
+
+def test_clear_sessions_closes_sessions(session_cache, timers, token_endpoint) -> None:
+    for client_id in ["client-0", "client-1"]:
+        Client._get_session(_get_settings(client_id=client_id)).token  # pylint: disable=expression-not-assigned
+
+    Client.clear_sessions()
+
+    assert not session_cache
+    assert len(timers) == 2
+    assert all(timer.is_cancelled for timer in timers)
+
+
+def test_download_retries_with_new_token_after_401(timers, token_endpoint) -> None:
+    client = Client()
+    transport = FakeTransport(revoked_tokens=["token-1"])
+    client._get_transport = lambda url: transport
+
+    response = client.download(f"{BASE_URL}/configuration", session_settings=_get_settings())
+
+    assert response.status_code == 200
+    assert transport.authorizations == ["Bearer token-1", "Bearer token-2"]
+    assert len(token_endpoint.requests) == 2
+
+
+def test_download_retries_401_only_once(timers, token_endpoint) -> None:
+    client = Client()
+    transport = FakeTransport(revoked_tokens=["token-1", "token-2"])
+    client._get_transport = lambda url: transport
+
+    with pytest.raises(DownloadError):
+        client.download(f"{BASE_URL}/configuration", session_settings=_get_settings())
+
+    assert transport.authorizations == ["Bearer token-1", "Bearer token-2"]
+
+
+def test_discard_replaced_token(timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    old_headers = session.session_headers
+
+    assert session.discard_token(old_headers)
+    new_headers = session.session_headers
+
+    assert not session.discard_token(old_headers)
+    assert session.session_headers == new_headers
+    assert len(token_endpoint.requests) == 2
+
+
+def test_persistence_key() -> None:
+    key = session_module._get_persistence_key(BASE_URL, "client")
+
+    assert key.startswith("sentinelhub/token/")
+    assert "client" not in key
+    assert key == session_module._get_persistence_key(BASE_URL, "client")
+    assert key != session_module._get_persistence_key(BASE_URL, "other-client")
+    assert key != session_module._get_persistence_key("https://creodias.sentinel-hub.com", "client")
+
+
+def test_token_is_persisted_and_loaded(clock, auth_manager, timers, token_endpoint) -> None:
+    auth_manager.is_unlocked = True
+    Session(BASE_URL, "client", "secret").token  # pylint: disable=expression-not-assigned
+
+    persisted_token = json.loads(auth_manager.settings[session_module._get_persistence_key(BASE_URL, "client")])
+    assert set(persisted_token) == {"access_token", "token_type", "expires_at", "secret_hash"}
+    assert "secret" not in persisted_token.values()
+
+    clock.now += 100
+    session = Session(BASE_URL, "client", "secret")
+
+    assert session.token["access_token"] == "token-1"
+    assert "secret_hash" not in session.token
+    assert len(token_endpoint.requests) == 1
+    assert timers[-1].interval == REFRESH_DELAY - 100
+
+
+def test_token_of_another_secret_is_not_loaded(auth_manager, timers, token_endpoint) -> None:
+    auth_manager.is_unlocked = True
+    Session(BASE_URL, "client", "secret").token  # pylint: disable=expression-not-assigned
+
+    token_endpoint.exception = OAuth2Error("Invalid client")
+    session = Session(BASE_URL, "client", "wrong-secret")
+
+    with pytest.raises(SessionError):
+        session.token  # pylint: disable=pointless-statement
+    assert Session(BASE_URL, "client", "secret").token["access_token"] == "token-1"
+
+
+def test_token_close_to_expiry_is_not_loaded(clock, auth_manager, timers, token_endpoint) -> None:
+    auth_manager.is_unlocked = True
+    Session(BASE_URL, "client", "secret").token  # pylint: disable=expression-not-assigned
+
+    clock.now += REFRESH_DELAY
+    assert Session(BASE_URL, "client", "secret").token["access_token"] == "token-2"
+
+
+def test_invalid_persisted_token_is_ignored(auth_manager, timers, token_endpoint) -> None:
+    auth_manager.is_unlocked = True
+    auth_manager.settings[session_module._get_persistence_key(BASE_URL, "client")] = "not a token"
+
+    assert Session(BASE_URL, "client", "secret").token["access_token"] == "token-1"
+
+
+def test_locked_database_is_not_used(auth_manager, timers, token_endpoint) -> None:
+    session = Session(BASE_URL, "client", "secret")
+    session.token  # pylint: disable=pointless-statement
+    assert not auth_manager.settings
+
+    auth_manager.is_unlocked = True
+    session.discard_token(session.session_headers)
+    session.token  # pylint: disable=pointless-statement
+    assert auth_manager.settings
+
+    auth_manager.is_unlocked = False
+    assert Session(BASE_URL, "client", "secret").token["access_token"] == "token-3"
+
+
+def test_discarded_token_is_removed(auth_manager, timers, token_endpoint) -> None:
+    auth_manager.is_unlocked = True
+    session = Session(BASE_URL, "client", "secret")
+
+    assert session.discard_token(session.session_headers)
+    assert not auth_manager.settings
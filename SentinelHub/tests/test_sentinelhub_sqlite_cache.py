@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from ..sentinelhub.sqlite_cache import SqliteCache
+
+
+class FakeCache(SqliteCache):
+    STATS_COUNTERS = ("hits", "misses", "writes")
+
+    def _create_tables(self, connection):
+        connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY)")
+
+    def put(self, key):
+        with self._connect() as connection:
+            connection.execute("INSERT INTO entries VALUES (?)", (key,))
+        self._count("writes")
+
+    def get_keys(self):
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute("SELECT key FROM entries")]
+
+
+def test_sqlite_cache(tmp_path) -> None:
+    path = os.path.join(tmp_path, "cache.sqlite")
+    cache = FakeCache(path)
+    assert cache.get_stats() == {"hits": 0, "misses": 0, "writes": 0}
+
+    cache.put("a")
+    with pytest.raises(ValueError):
+        with cache._connect() as connection:
+            connection.execute("INSERT INTO entries VALUES ('b')")
+            raise ValueError
+
+    assert FakeCache(path).get_keys() == ["a"]
+    assert cache.get_stats() == {"hits": 0, "misses": 0, "writes": 1}
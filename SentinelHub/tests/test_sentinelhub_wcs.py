@@ -0,0 +1,133 @@
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("qgis.core")
+gdal = pytest.importorskip("osgeo.gdal")
+
+# pylint: disable=wrong-import-position
+from qgis.core import QgsRectangle  # noqa: E402
+
+from ..constants import CrsType, ExtentType, ImageFormat  # noqa: E402
+from ..exceptions import DownloadCancelledError, DownloadError  # noqa: E402
+from ..sentinelhub import wcs  # noqa: E402
+from ..sentinelhub.common import Layer  # noqa: E402
+from ..settings import Settings  # noqa: E402
+
+TILE_PIXELS = 4
+
+
+class FakeTileClient:
+    """Instead of downloading, it writes a small GeoTIFF covering the requested bbox"""
+
+    def __init__(self, failing_bbox=None):
+        self.failing_bbox = failing_bbox
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def download_to_file(self, url, path, progress_callback=None, is_cancelled=None):
+        with self._lock:
+            self.urls.append(url)
+
+        bbox_str = parse_qs(urlsplit(url).query)["bbox"][0]
+        if bbox_str == self.failing_bbox:
+            raise DownloadError("Tile failed")
+        if is_cancelled is not None and is_cancelled():
+            raise DownloadCancelledError()
+
+        x_min, y_min, x_max, y_max = map(float, bbox_str.split(","))
+        dataset = gdal.GetDriverByName("GTiff").Create(path, TILE_PIXELS, TILE_PIXELS, 1, gdal.GDT_Byte)
+        dataset.SetGeoTransform((x_min, (x_max - x_min) / TILE_PIXELS, 0, y_max, 0, -(y_max - y_min) / TILE_PIXELS))
+        dataset.GetRasterBand(1).Fill(1)
+        dataset = None
+
+        if progress_callback is not None:
+            progress_callback(os.path.getsize(path), os.path.getsize(path))
+
+
+@pytest.fixture(name="settings")
+def settings_fixture(tmp_path):
+    settings = Settings().copy(auto_save=False)
+    settings.base_url = "https://services.sentinel-hub.com"
+    settings.instance_id = "instance"
+    settings.layer_id = "LAYER"
+    settings.start_time = "2023-03-01"
+    settings.end_time = "2023-03-31"
+    settings.crs = CrsType.POP_WEB
+    settings.download_extent_type = ExtentType.CURRENT
+    settings.image_format = ImageFormat.TIFF.url_param
+    settings.show_logo = "true"
+    settings.download_folder = str(tmp_path)
+    return settings
+
+
+@pytest.fixture(name="layer")
+def layer_fixture():
+    return Layer.load(
+        {
+            "id": "LAYER",
+            "title": "Layer",
+            "datasourceDefaults": {"type": "S2L2A"},
+            "datasetSource": {"@id": "https://services.sentinel-hub.com/configuration/v1/datasets/S2L2A/sources/2"},
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "image_format, image_size, expected_grid_size",
+    [
+        (ImageFormat.TIFF, (100, 100), (1, 1)),
+        (ImageFormat.TIFF, (5000, 2000), (3, 1)),
+        (ImageFormat.TIFF, (2500, 7500), (2, 4)),
+        (ImageFormat.PNG, (5000, 5000), (1, 1)),
+    ],
+)
+def test_get_tile_grid_size(settings, monkeypatch, image_format, image_size, expected_grid_size) -> None:
+    monkeypatch.setattr(wcs, "WCS_MAX_IMAGE_SIZE", 2000)
+    monkeypatch.setattr(wcs, "get_image_size", lambda *_: image_size)
+    settings.image_format = image_format.url_param
+
+    assert wcs._get_tile_grid_size(settings, QgsRectangle(0, 0, 1, 1), CrsType.POP_WEB) == expected_grid_size
+
+
+def test_download_tiled_image(settings, layer, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(wcs, "_get_tile_grid_size", lambda *_: (2, 3))
+    client = FakeTileClient()
+    progress = []
+
+    filename = wcs.download_wcs_image(
+        settings, layer, QgsRectangle(0, 0, 200, 300), client, progress_callback=lambda *args: progress.append(args)
+    )
+
+    assert len(client.urls) == 6
+    assert all(parse_qs(urlsplit(url).query)["showLogo"] == ["false"] for url in client.urls)
+    assert os.listdir(tmp_path) == [filename]
+    assert progress and progress[-1][0] == progress[-1][1]
+
+    dataset = gdal.Open(os.path.join(tmp_path, filename))
+    assert (dataset.RasterXSize, dataset.RasterYSize) == (2 * TILE_PIXELS, 3 * TILE_PIXELS)
+    assert dataset.GetGeoTransform()[0] == 0
+    assert dataset.GetGeoTransform()[3] == 300
+
+
+def test_download_tiled_image_failure(settings, layer, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(wcs, "_get_tile_grid_size", lambda *_: (2, 2))
+    monkeypatch.setattr(wcs, "WCS_DOWNLOAD_WORKERS", 1)
+    client = FakeTileClient(failing_bbox="0.0,0.0,100.0,100.0")
+
+    with pytest.raises(DownloadError):
+        wcs.download_wcs_image(settings, layer, QgsRectangle(0, 0, 200, 200), client)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_merge_leaves_no_file(settings, layer, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(wcs, "_get_tile_grid_size", lambda *_: (2, 1))
+    monkeypatch.setattr(wcs.gdal, "Translate", lambda path, *_, **__: open(path, "wb").close())
+
+    with pytest.raises(DownloadError):
+        wcs.download_wcs_image(settings, layer, QgsRectangle(0, 0, 200, 100), FakeTileClient())
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from qgis.core import QgsRectangle  # noqa: E402
+
+from ..constants import COVERAGE_CELL_SIZE  # noqa: E402
+from ..exceptions import DownloadCancelledError, DownloadError  # noqa: E402
+from ..sentinelhub import wfs  # noqa: E402
+from ..sentinelhub.cloud_cover import CloudCoverCache, CloudCoverIndex  # noqa: E402
+from ..sentinelhub.common import Layer  # noqa: E402
+from ..settings import Settings  # noqa: E402
+
+TIME_INTERVAL = "2023-03-01/2023-03-31/P1D"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeWfsClient:
+    """Responds to each WFS request with a single feature covering the requested bbox. Its date is derived from the
+    position of the bbox, so that each grid cell has a different date."""
+
+    def __init__(self, failing_bboxes=()):
+        self.failing_bboxes = set(failing_bboxes)
+        self.bboxes = []
+        self._lock = threading.Lock()
+
+    def download(self, url, timeout=None):
+        bbox_str = parse_qs(urlsplit(url).query)["bbox"][0]
+        with self._lock:
+            self.bboxes.append(bbox_str)
+        if bbox_str in self.failing_bboxes:
+            raise DownloadError("Service unavailable")
+
+        x_min, y_min, x_max, y_max = map(float, bbox_str.split(","))
+        day = 1 + int(x_min // COVERAGE_CELL_SIZE) * 3 + int(y_min // COVERAGE_CELL_SIZE)
+        feature = {
+            "type": "Feature",
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[[[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max], [x_min, y_min]]]],
+            },
+            "properties": {"id": bbox_str, "date": f"2023-03-{day:02d}", "time": "10:00:00", "cloudCoverPercentage": 0},
+        }
+        return FakeResponse(json.dumps({"type": "FeatureCollection", "features": [feature]}).encode())
+
+
+def _get_cell_bbox_str(column, row):
+    return ",".join(map(str, wfs.get_cell_bbox((column, row), COVERAGE_CELL_SIZE)))
+
+
+@pytest.fixture(name="settings")
+def settings_fixture():
+    settings = Settings().copy(auto_save=False)
+    settings.base_url = "https://services.sentinel-hub.com"
+    settings.instance_id = "instance"
+    return settings
+
+
+@pytest.fixture(name="layer")
+def layer_fixture():
+    layer = Layer.load(
+        {
+            "id": "LAYER",
+            "title": "Layer",
+            "datasourceDefaults": {"type": "S2L2A"},
+            "datasetSource": {"@id": "https://services.sentinel-hub.com/configuration/v1/datasets/S2L2A/sources/2"},
+        }
+    )
+    layer.data_source.service_url = "https://services.sentinel-hub.com"
+    return layer
+
+
+@pytest.fixture(autouse=True)
+def caches_fixture(monkeypatch, tmp_path):
+    cache = CloudCoverCache(os.path.join(tmp_path, "cloud_cover.sqlite"))
+    monkeypatch.setattr(wfs, "_get_cloud_cover_cache", lambda: cache)
+    monkeypatch.setattr(wfs, "_CLOUD_COVER_INDEX", CloudCoverIndex(max_size=100))
+
+
+def test_get_cloud_cover_per_cell(settings, layer) -> None:
+    bbox = QgsRectangle(0, 0, 150000, 150000)
+    client = FakeWfsClient()
+
+    cloud_cover_map = wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, client)
+
+    assert sorted(cloud_cover_map) == ["2023-03-01", "2023-03-02", "2023-03-04", "2023-03-05"]
+    assert len(client.bboxes) == 4
+
+    assert wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, client) == cloud_cover_map
+    assert len(client.bboxes) == 4
+
+
+def test_get_cloud_cover_with_failed_cell(settings, layer) -> None:
+    bbox = QgsRectangle(0, 0, 150000, 150000)
+    failing_bbox = _get_cell_bbox_str(1, 1)
+
+    cloud_cover_map = wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, FakeWfsClient([failing_bbox]))
+    assert sorted(cloud_cover_map) == ["2023-03-01", "2023-03-02", "2023-03-04"]
+
+    client = FakeWfsClient()
+    cloud_cover_map = wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, client)
+    assert client.bboxes == [failing_bbox]
+    assert sorted(cloud_cover_map) == ["2023-03-01", "2023-03-02", "2023-03-04", "2023-03-05"]
+
+
+def test_get_cloud_cover_of_large_area(settings, layer) -> None:
+    bbox = QgsRectangle(0, 0, 250000, 250000)
+    client = FakeWfsClient()
+
+    cloud_cover_map = wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, client)
+
+    assert [tuple(map(float, bbox_str.split(","))) for bbox_str in client.bboxes] == [(0, 0, 250000, 250000)]
+    assert list(cloud_cover_map) == ["2023-03-01"]
+
+    wfs.get_cloud_cover(settings, layer, bbox, TIME_INTERVAL, client)
+    assert len(client.bboxes) == 2
+
+
+def test_get_cloud_cover_cancelled(settings, layer) -> None:
+    client = FakeWfsClient()
+
+    with pytest.raises(DownloadCancelledError):
+        wfs.get_cloud_cover(
+            settings, layer, QgsRectangle(0, 0, 150000, 150000), TIME_INTERVAL, client, is_cancelled=lambda: True
+        )
+
+    assert client.bboxes == []
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from ..settings import Settings  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def test_settings_write_behind() -> None:
+    settings = Settings().copy(auto_save=True)
+    settings.qsettings.setValue = lambda *_: setattr(settings, "written", True)
+
+    for layer_id in ["a", "b", "c"]:
+        settings.layer_id = layer_id
+    assert settings.requested_writes == 3
+    assert settings.performed_writes == 0
+
+    settings.flush()
+    assert settings.performed_writes == 1
+    assert settings.saved_writes == 2
+    assert settings.written
+
+
+def test_settings_copy() -> None:
+    settings = Settings().copy(auto_save=True)
+    settings.qsettings.setValue = lambda *_: None
+    settings.layer_id = "a"
+
+    settings_copy = settings.copy(auto_save=False)
+    settings_copy.layer_id = "b"
+
+    assert (settings.layer_id, settings_copy.layer_id) == ("a", "b")
+    assert settings.requested_writes == settings_copy.requested_writes == 1
+    assert settings._pending_values == {"layer_id": "a"}
+    assert settings_copy._pending_values == {}
+
+    settings.copy(auto_save=True).layer_id = "c"
+    assert settings.layer_id == "a"
+    assert settings.performed_writes == 1
+    assert settings._pending_values == {}
+
+
+def test_update_credentials() -> None:
+    settings = Settings().copy(auto_save=False)
+    login_settings = settings.copy(auto_save=False)
+    login_settings.base_url, login_settings.client_id, login_settings.client_secret = "url", "id", "secret"
+    settings.layer_id = "changed-during-login"
+
+    settings.update_credentials(login_settings)
+
+    assert (settings.base_url, settings.client_id, settings.client_secret) == ("url", "id", "secret")
+    assert settings.layer_id == "changed-during-login"
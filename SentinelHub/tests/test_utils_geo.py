@@ -8,7 +8,14 @@ pytest.importorskip("qgis.core")
 from qgis.core import QgsRectangle  # noqa: E402
 
 from ..settings import Settings  # noqa: E402
-from ..utils.geo import bbox_to_string, get_custom_bbox, is_bbox_too_large, is_supported_crs  # noqa: E402
+from ..utils.geo import (  # noqa: E402
+    bbox_to_string,
+    get_custom_bbox,
+    is_bbox_too_large,
+    is_supported_crs,
+    split_bbox,
+    transform_bboxes,
+)
 
 
 @pytest.mark.parametrize(
@@ -57,3 +64,21 @@ def test_is_bbox_too_large() -> None:
 )
 def test_is_supported_crs(crs: str) -> None:
     assert is_supported_crs(crs)
+
+
+def test_split_bbox() -> None:
+    grid = split_bbox(QgsRectangle(0, 0, 4, 2), 2, 2)
+
+    assert [(column, row) for column, row, _ in grid] == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert grid[0][2] == QgsRectangle(0, 0, 2, 1)
+    assert grid[3][2] == QgsRectangle(2, 1, 4, 2)
+
+
+def test_transform_bboxes() -> None:
+    bboxes = [QgsRectangle(0, 0, 1, 1), QgsRectangle(-1, -1, 0, 0)]
+    assert transform_bboxes(bboxes, "EPSG:4326", "EPSG:4326") == bboxes
+
+    transformed_bboxes = transform_bboxes(bboxes, "EPSG:4326", "EPSG:3857")
+    assert len(transformed_bboxes) == 2
+    assert transformed_bboxes[0].xMinimum() == pytest.approx(0)
+    assert transformed_bboxes[0].xMaximum() == pytest.approx(111319.49, rel=1e-5)
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from ..constants import EndpointClass  # noqa: E402
+from ..exceptions import DownloadCancelledError, DownloadError  # noqa: E402
+from ..utils.metrics import MetricsRegistry, get_endpoint_class  # noqa: E402
+
+
+class FakeCache:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+@pytest.mark.parametrize(
+    "url, expected_class",
+    [
+        ("https://services.sentinel-hub.com/oauth/token", EndpointClass.OAUTH),
+        (
+            "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token",
+            EndpointClass.OAUTH,
+        ),
+        ("https://services.sentinel-hub.com/configuration/v1/wms/instances", EndpointClass.CONFIGURATION),
+        (
+            "https://services.sentinel-hub.com/ogc/wms/id?service=WMS&request=GetCapabilities",
+            EndpointClass.CAPABILITIES,
+        ),
+        ("https://services.sentinel-hub.com/ogc/wfs/id?request=GetFeature", EndpointClass.WFS),
+        ("https://services.sentinel-hub.com/ogc/wcs/id?request=GetCoverage", EndpointClass.WCS),
+        ("https://services.sentinel-hub.com/api/v1/process", EndpointClass.OTHER),
+    ],
+)
+def test_get_endpoint_class(url, expected_class) -> None:
+    assert get_endpoint_class(url) == expected_class
+
+
+def test_metrics_registry() -> None:
+    metrics = MetricsRegistry()
+    url = "https://services.sentinel-hub.com/ogc/wcs/id"
+
+    with metrics.measure_request(url) as observation:
+        observation.transferred_bytes += 100
+        observation.retries += 2
+    with pytest.raises(DownloadError), metrics.measure_request(url):
+        raise DownloadError("failed")
+    with pytest.raises(DownloadCancelledError), metrics.measure_request(url):
+        raise DownloadCancelledError()
+    metrics.count_coalesced_request(url)
+
+    wcs_metrics = metrics.get_metrics()["endpoints"][EndpointClass.WCS]
+    assert wcs_metrics["requests"] == 3
+    assert wcs_metrics["errors"] == 1
+    assert wcs_metrics["retries"] == 2
+    assert wcs_metrics["coalesced"] == 1
+    assert wcs_metrics["bytes"] == 100
+    assert wcs_metrics["p95_seconds"] == 0.05
+    assert wcs_metrics["histogram"]["le_0.05"] == 3
+
+
+def test_metrics_registry_caches() -> None:
+    metrics = MetricsRegistry()
+    cache = FakeCache()
+    metrics.register_cache("cache", cache)
+    cache.hits, cache.misses = 3, 1
+    assert metrics.get_metrics()["caches"]["cache"] == {"hits": 3, "misses": 1, "hit_ratio": 0.75}
+
+    metrics.reset()
+    assert metrics.get_metrics()["caches"]["cache"] == {"hits": 0, "misses": 0, "hit_ratio": None}
+
+    cache.misses += 1
+    assert json.loads(metrics.to_json())["caches"]["cache"]["hit_ratio"] == 0
+    assert "caches,cache,misses,1" in metrics.to_csv().splitlines()
+    assert "cache" in metrics.format_summary()
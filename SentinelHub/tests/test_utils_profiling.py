@@ -0,0 +1,104 @@
+import os
+import pstats
+import threading
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from ..utils.profiling import ActionProfiler  # noqa: E402
+
+
+def _busy_function():
+    return sum(index**2 for index in range(1000))
+
+
+def test_profile(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path))
+
+    with profiler.profile("download_caption"):
+        _busy_function()
+
+    (filename,) = os.listdir(tmp_path)
+    assert filename.endswith("-download_caption.prof")
+
+    stats = pstats.Stats(os.path.join(tmp_path, filename))
+    assert any(function_name == "_busy_function" for _, _, function_name in stats.stats)
+
+
+def test_profile_is_written_on_exception(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path))
+
+    with pytest.raises(ValueError):
+        with profiler.profile("failing_action"):
+            raise ValueError
+
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_nested_profiles(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path))
+
+    with profiler.profile("outer_action"):
+        with profiler.profile("inner_action"):
+            _busy_function()
+
+    (filename,) = os.listdir(tmp_path)
+    assert filename.endswith("-outer_action.prof")
+
+
+def test_concurrent_profiles(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path))
+    other_thread_done = threading.Event()
+
+    def other_action():
+        with profiler.profile("other_action"):
+            _busy_function()
+        other_thread_done.set()
+
+    with profiler.profile("main_action"):
+        thread = threading.Thread(target=other_action)
+        thread.start()
+        thread.join()
+
+    assert other_thread_done.is_set()
+    (filename,) = os.listdir(tmp_path)
+    assert filename.endswith("-main_action.prof")
+
+
+def test_max_files(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path), max_files=2)
+
+    for index in range(4):
+        with profiler.profile(f"action_{index}"):
+            pass
+
+    filenames = sorted(os.listdir(tmp_path))
+    assert [filename.rsplit("-", 1)[1] for filename in filenames] == ["action_2.prof", "action_3.prof"]
+
+
+def test_profile_task_part(tmp_path) -> None:
+    profiler = ActionProfiler(folder=str(tmp_path))
+    task_actions = []
+
+    def task(action_name):
+        with profiler.profile(action_name, part="task", timeout=5):
+            task_actions.append(profiler.get_current_action())
+            _busy_function()
+
+    with profiler.profile("download_caption"):
+        assert profiler.get_current_action() == "download_caption"
+        thread = threading.Thread(target=task, args=(profiler.get_current_action(),))
+        thread.start()
+
+    thread.join()
+    assert profiler.get_current_action() is None
+    assert task_actions == ["download_caption"]
+
+    filenames = sorted(os.listdir(tmp_path))
+    assert [filename.split("-", 3)[-1] for filename in filenames] == [
+        "download_caption.prof",
+        "download_caption-task.prof",
+    ]
+    stats = pstats.Stats(os.path.join(tmp_path, filenames[1]))
+    assert any(function_name == "_busy_function" for _, _, function_name in stats.stats)
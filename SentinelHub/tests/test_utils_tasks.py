@@ -0,0 +1,113 @@
+import pytest
+
+pytest.importorskip("qgis.core")
+
+# pylint: disable=wrong-import-position
+from .. import exceptions  # noqa: E402
+from ..constants import MessageType  # noqa: E402
+from ..exceptions import PluginException  # noqa: E402
+from ..utils.tasks import TaskRunner  # noqa: E402
+from .testing_utilities import run_task  # noqa: E402
+
+
+@pytest.fixture(name="messages")
+def messages_fixture(monkeypatch):
+    messages = []
+    monkeypatch.setattr(exceptions, "show_message", lambda *args: messages.append(args))
+    return messages
+
+
+def test_run_task(task_manager) -> None:
+    runner = TaskRunner()
+    results = []
+
+    task = runner.run("Task", lambda _: 42, results.append)
+    assert task_manager.tasks == [task]
+
+    run_task(task)
+
+    assert results == [42]
+    assert not runner._running_tasks
+
+
+def test_newer_task_cancels_older_one(task_manager) -> None:
+    runner = TaskRunner()
+    results = []
+
+    old_task = runner.run("Task", lambda _: "old", results.append, key="key")
+    independent_task = runner.run("Task", lambda _: "independent", results.append)
+    new_task = runner.run("Task", lambda _: "new", results.append, key="key")
+
+    assert old_task.isCanceled() and old_task.is_stale
+    assert not new_task.isCanceled() and not independent_task.isCanceled()
+
+    for task in [new_task, old_task, independent_task]:
+        run_task(task)
+
+    assert results == ["new", "independent"]
+    assert not runner._running_tasks
+    assert not runner._latest_tasks
+
+
+def test_stale_results_are_dropped(task_manager) -> None:
+    runner = TaskRunner()
+    results = []
+
+    task = runner.run("Task", lambda task: task.report_partial_result(1) or 2, results.append, key="key")
+    task.partialResult.connect(results.append)
+    runner.cancel("key")
+    run_task(task)
+
+    on_partial_result_task = runner.run("Task", lambda _: None, results.append, on_partial_result=results.append)
+    runner.cancel_all()
+    on_partial_result_task.report_partial_result(3)
+    run_task(on_partial_result_task)
+
+    assert results == [1]
+
+
+def test_partial_results(task_manager) -> None:
+    runner = TaskRunner()
+    partial_results, results = [], []
+
+    def function(task):
+        for index in range(3):
+            task.report_partial_result(index)
+        return "done"
+
+    run_task(runner.run("Task", function, results.append, on_partial_result=partial_results.append))
+
+    assert partial_results == [0, 1, 2]
+    assert results == ["done"]
+
+
+def _fail(exception):
+    def function(_):
+        raise exception
+
+    return function
+
+
+def test_suppressed_exceptions(task_manager, messages) -> None:
+    runner = TaskRunner()
+    results = []
+
+    run_task(runner.run("Task", _fail(KeyError("layer")), results.append, suppressed_exceptions=(KeyError,)))
+
+    assert results == []
+    assert messages == []
+
+
+def test_exceptions_are_handled_as_action_exceptions(task_manager, messages) -> None:
+    runner = TaskRunner()
+
+    run_task(runner.run("Task", _fail(PluginException("Failed", MessageType.CRITICAL)), lambda _: None))
+    assert messages == [("Failed", MessageType.CRITICAL)]
+
+    with pytest.raises(ValueError):
+        run_task(runner.run("Task", _fail(ValueError("Unexpected")), lambda _: None))
+
+    with pytest.raises(ZeroDivisionError):
+        run_task(runner.run("Task", lambda _: None, lambda _: 1 / 0))
+
+    assert not runner._running_tasks
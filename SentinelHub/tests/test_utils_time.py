@@ -2,7 +2,7 @@ from typing import Optional
 
 import pytest
 
-from ..utils.time import get_month_time_interval, parse_date
+from ..utils.time import get_month_time_interval, get_year_time_interval, parse_date
 
 
 @pytest.mark.parametrize(
@@ -38,3 +38,7 @@ def test_parse_date(input_date: str, parsed_date: Optional[str]) -> None:
 )
 def test_get_month_time_interval(year: int, month: int, output: str) -> None:
     assert get_month_time_interval(year, month) == output
+
+
+def test_get_year_time_interval() -> None:
+    assert get_year_time_interval(2020) == "2020-01-01/2020-12-31/P1D"
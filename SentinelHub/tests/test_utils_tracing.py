@@ -0,0 +1,112 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from ..utils.tracing import Tracer, traced  # noqa: E402
+
+
+def _get_complete_events(tracer):
+    return {event["name"]: event for event in tracer.get_events() if event["ph"] == "X"}
+
+
+def test_nested_spans() -> None:
+    tracer = Tracer()
+
+    with tracer.span("action", category="action") as action_span:
+        assert tracer.get_current_span() is action_span
+        with tracer.span("request", category="request", url="https://example.com") as request_span:
+            assert request_span.parent_id == action_span.id
+
+    assert tracer.get_current_span() is None
+
+    events = _get_complete_events(tracer)
+    assert events["request"]["args"] == {
+        "url": "https://example.com",
+        "span_id": request_span.id,
+        "parent_id": action_span.id,
+    }
+    assert events["action"]["args"]["parent_id"] is None
+    assert events["action"]["ts"] <= events["request"]["ts"]
+    assert events["action"]["dur"] >= events["request"]["dur"]
+
+
+def test_span_is_recorded_on_exception() -> None:
+    tracer = Tracer()
+
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError
+
+    assert list(_get_complete_events(tracer)) == ["failing"]
+    assert tracer.get_current_span() is None
+
+
+def test_continue_span_in_another_thread() -> None:
+    tracer = Tracer()
+    child_spans = []
+
+    def work(parent_span):
+        with tracer.continue_span(parent_span), tracer.span("task", category="task") as span:
+            child_spans.append(span)
+
+    with tracer.span("action", category="action") as action_span:
+        tracer.start_link(action_span)
+        thread = threading.Thread(target=work, args=(action_span,))
+        thread.start()
+        thread.join()
+
+    continued_events = [event for event in tracer.get_events() if event["ph"] == "X" and event["args"].get("continued")]
+    assert len(continued_events) == 1
+    assert continued_events[0]["args"]["parent_id"] == action_span.id
+    assert child_spans[0].parent_id == continued_events[0]["args"]["span_id"]
+
+    flow_events = [event for event in tracer.get_events() if event["ph"] in ("s", "f")]
+    assert [event["ph"] for event in flow_events] == ["s", "f"]
+    assert {event["id"] for event in flow_events} == {action_span.id}
+    assert flow_events[0]["tid"] != flow_events[1]["tid"]
+
+
+def test_continue_without_span() -> None:
+    tracer = Tracer()
+
+    with tracer.continue_span(None), tracer.span("task") as span:
+        assert span.parent_id is None
+
+    assert len(tracer.get_events()) == 1
+
+
+def test_max_events() -> None:
+    tracer = Tracer(max_events=3)
+
+    for index in range(5):
+        with tracer.span(f"span-{index}"):
+            pass
+
+    assert [event["name"] for event in tracer.get_events()] == ["span-2", "span-3", "span-4"]
+
+    tracer.clear()
+    assert tracer.get_events() == []
+
+
+def test_traced() -> None:
+    @traced(category="parse")
+    def parse(value):
+        return int(value)
+
+    assert parse("3") == 3
+    assert parse.__name__ == "parse"
+
+
+def test_to_chrome_trace() -> None:
+    tracer = Tracer()
+    with tracer.span("action"):
+        pass
+
+    trace = json.loads(tracer.to_chrome_trace())
+
+    assert trace["displayTimeUnit"] == "ms"
+    (event,) = trace["traceEvents"]
+    assert {"name", "cat", "ph", "ts", "dur", "pid", "tid", "args"} <= set(event)
@@ -6,3 +6,19 @@ import os
 
 def get_input_folder(current_file: str) -> str:
     return os.path.join(os.path.dirname(os.path.realpath(current_file)), "TestInputs")
+
+
+class FakeTaskManager:
+    """Collects submitted tasks instead of running them, a test runs them by calling `run_task`"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def addTask(self, task):  # noqa: N802 pylint: disable=invalid-name
+        self.tasks.append(task)
+        return True
+
+
+def run_task(task) -> None:
+    """Runs the background function and then the main thread part of a task, like QGIS task manager would"""
+    task.finished(task.run())
@@ -1,8 +1,13 @@
 """
 Geographical utilities
+
+CRS objects and coordinate transforms are cached for the entire process. Transforms depend on the transform context of
+the current QGIS project, therefore `clear_transform_cache` has to be called whenever the context changes.
 """
 import math
-from typing import Tuple
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
 
 from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsCsException, QgsProject, QgsRectangle
 from qgis.utils import iface
@@ -10,24 +15,40 @@ from qgis.utils import iface
 from ..constants import CrsType
 from ..exceptions import BBoxTransformError
 from ..settings import Settings
+from .metrics import METRICS, LruCacheStats
+from .tracing import traced
+
+_TRANSFORM_CACHE: Dict[Tuple[str, str], QgsCoordinateTransform] = {}
+_TRANSFORM_CACHE_LOCK = threading.Lock()
 
 
 def get_bbox(crs: str) -> QgsRectangle:
     """Get a bounding box of the current window"""
     bbox = iface.mapCanvas().extent()
-    target_crs = QgsCoordinateReferenceSystem(crs)
+    current_crs = iface.mapCanvas().mapSettings().destinationCrs().authid()
+    return transform_bboxes([bbox], current_crs, crs)[0]
+
 
-    current_crs_authority = iface.mapCanvas().mapSettings().destinationCrs().authid()
-    current_crs = QgsCoordinateReferenceSystem(current_crs_authority)
+@traced(category="crs")
+def transform_bboxes(bboxes: Iterable[QgsRectangle], source_crs: str, target_crs: str) -> List[QgsRectangle]:
+    """Transforms many bboxes from one CRS into another with the same cached transform
+
+    :raises: BBoxTransformError
+    """
+    if _get_crs(source_crs) == _get_crs(target_crs):
+        return list(bboxes)
+
+    transform = _get_transform(source_crs, target_crs)
+    try:
+        return [transform.transform(bbox) for bbox in bboxes]
+    except QgsCsException as exception:
+        raise BBoxTransformError(target_crs) from exception
 
-    if current_crs != target_crs:
-        xform = QgsCoordinateTransform(current_crs, target_crs, QgsProject.instance())
-        try:
-            bbox = xform.transform(bbox)
-        except QgsCsException as exception:
-            raise BBoxTransformError(crs) from exception
 
-    return bbox
+def clear_transform_cache() -> None:
+    """Removes all cached coordinate transforms. It has to be called when the project transform context changes."""
+    with _TRANSFORM_CACHE_LOCK:
+        _TRANSFORM_CACHE.clear()
 
 
 def get_custom_bbox(settings: Settings) -> QgsRectangle:
@@ -41,8 +62,7 @@ def get_custom_bbox(settings: Settings) -> QgsRectangle:
 
 def bbox_to_string(bbox: QgsRectangle, crs: str) -> str:
     """Transforms a QgsRectangle into string a string of comma-separated values"""
-    target_crs = QgsCoordinateReferenceSystem(crs)
-    if target_crs.authid() == CrsType.WGS84:
+    if _get_crs(crs).authid() == CrsType.WGS84:
         precision = 6
         bbox_list = [bbox.yMinimum(), bbox.xMinimum(), bbox.yMaximum(), bbox.xMaximum()]
     else:
@@ -62,29 +82,65 @@ def is_bbox_too_large(bbox: QgsRectangle, crs: str, size_limit: float) -> bool:
     return max(width, height) > size_limit
 
 
+def get_image_size(bbox: QgsRectangle, crs: str, resx: float, resy: float) -> Tuple[int, int]:
+    """Estimates a width and height in pixels of an image covering a bbox at a given resolution in meters"""
+    width, height = _get_bbox_size(bbox, crs)
+    return math.ceil(width / resx), math.ceil(height / resy)
+
+
+def split_bbox(bbox: QgsRectangle, columns: int, rows: int) -> List[Tuple[int, int, QgsRectangle]]:
+    """Splits a bbox into a regular grid of equally sized smaller bboxes
+
+    :return: A list of tuples, each containing a column index, a row index and a bbox of a grid cell
+    """
+    cell_width = bbox.width() / columns
+    cell_height = bbox.height() / rows
+
+    grid = []
+    for column in range(columns):
+        for row in range(rows):
+            x_min = bbox.xMinimum() + column * cell_width
+            y_min = bbox.yMinimum() + row * cell_height
+            grid.append((column, row, QgsRectangle(x_min, y_min, x_min + cell_width, y_min + cell_height)))
+    return grid
+
+
 def is_current_map_crs(crs_id: str) -> bool:
     """Checks if the current underlying CRS on the map is given CRS"""
     return iface.mapCanvas().mapSettings().destinationCrs().authid() == crs_id
 
 
+@lru_cache(maxsize=None)
 def is_supported_crs(crs_id: str) -> bool:
     """Determines if QGIS recognizes the CRS from a given id string"""
-    return bool(QgsCoordinateReferenceSystem(crs_id).authid())
+    return bool(_get_crs(crs_id).authid())
 
 
-def _get_bbox_size(bbox: QgsRectangle, crs: str) -> Tuple[float, float]:
-    """Returns an approximate width and height of QgsRectangle in meters"""
-    bbox_crs = QgsCoordinateReferenceSystem(crs)
+@lru_cache(maxsize=None)
+def _get_crs(crs_id: str) -> QgsCoordinateReferenceSystem:
+    """Provides a cached CRS object. CRS objects are implicitly shared and never modified, therefore they can be
+    shared between threads."""
+    return QgsCoordinateReferenceSystem(crs_id)
 
-    utm_epsg = _lng_to_utm_zone((bbox.xMinimum() + bbox.xMaximum()) / 2, (bbox.yMinimum() + bbox.yMaximum()) / 2)
-    utm_crs = QgsCoordinateReferenceSystem(utm_epsg)
 
-    xform = QgsCoordinateTransform(bbox_crs, utm_crs, QgsProject.instance())
+METRICS.register_cache("crs", LruCacheStats(_get_crs))
 
-    try:
-        bbox = xform.transform(bbox)
-    except QgsCsException as exception:
-        raise BBoxTransformError(utm_epsg) from exception
+
+def _get_transform(source_crs: str, target_crs: str) -> QgsCoordinateTransform:
+    """Provides a cached coordinate transform in the transform context of the current project"""
+    key = source_crs, target_crs
+    with _TRANSFORM_CACHE_LOCK:
+        transform = _TRANSFORM_CACHE.get(key)
+        if transform is None:
+            transform = QgsCoordinateTransform(_get_crs(source_crs), _get_crs(target_crs), QgsProject.instance())
+            _TRANSFORM_CACHE[key] = transform
+    return transform
+
+
+def _get_bbox_size(bbox: QgsRectangle, crs: str) -> Tuple[float, float]:
+    """Returns an approximate width and height of QgsRectangle in meters"""
+    utm_epsg = _lng_to_utm_zone((bbox.xMinimum() + bbox.xMaximum()) / 2, (bbox.yMinimum() + bbox.yMaximum()) / 2)
+    bbox = transform_bboxes([bbox], crs, utm_epsg)[0]
 
     width = abs(bbox.xMaximum() - bbox.xMinimum())
     height = abs(bbox.yMinimum() - bbox.yMaximum())
@@ -1,29 +1,39 @@
 """
 Utilities for handling meta information and procedures
 """
+import importlib.util
 import os
 import sys
 from configparser import ConfigParser
+from functools import lru_cache
 
+from PyQt5.QtCore import QStandardPaths
 from qgis.utils import plugins_metadata_parser
 
 
 def ensure_import(package_name):
     """Ensures that a dependency package could be imported. It is either already available in the QGIS environment or
     it is available in a subfolder `external` of this plugin and should be added to PATH
+
+    The package itself is not imported, it is only located, so that it gets imported once it is actually needed.
     """
-    try:
-        __import__(package_name)
-    except ImportError as exception:
-        plugin_dir = _get_main_dir()
-        external_path = os.path.join(plugin_dir, "external")
+    if importlib.util.find_spec(package_name) is not None:
+        return
+
+    external_path = os.path.join(_get_main_dir(), "external")
+    for wheel_name in _list_external_wheels(external_path):
+        if wheel_name.startswith(package_name):
+            sys.path.append(os.path.join(external_path, wheel_name))
+            return
+    raise ImportError(f"Package {package_name} not found")
 
-        for wheel_name in os.listdir(external_path):
-            if wheel_name.startswith(package_name):
-                wheel_path = os.path.join(external_path, wheel_name)
-                sys.path.append(wheel_path)
-                return
-        raise ImportError(f"Package {package_name} not found") from exception
+
+@lru_cache(maxsize=None)
+def _list_external_wheels(external_path):
+    """Lists the folder with external packages only once"""
+    if not os.path.isdir(external_path):
+        return []
+    return os.listdir(external_path)
 
 
 def _get_plugin_name(missing="SentinelHub"):
@@ -49,6 +59,17 @@ def get_plugin_version():
     return plugins_metadata_parser[PLUGIN_NAME]["general"]["version"]
 
 
+def get_cache_folder():
+    """Provides a path to a folder in which the plugin can cache data. The folder is created if it doesn't exist yet.
+
+    :return: A path to the cache folder
+    :rtype: str
+    """
+    cache_folder = os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), PLUGIN_NAME)
+    os.makedirs(cache_folder, exist_ok=True)
+    return cache_folder
+
+
 def _get_main_dir():
     """Provides a path to the main plugin folder"""
     utils_dir = os.path.dirname(__file__)
@@ -0,0 +1,260 @@
+"""
+Metrics of communication with Sentinel Hub service and of caches
+
+Metrics of the entire process are collected by a single registry, `METRICS`, which can be used from any thread.
+Requests are measured per class of service endpoints, caches report their own statistics once they are registered.
+"""
+import bisect
+import csv
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from ..constants import LATENCY_HISTOGRAM_BUCKETS, EndpointClass
+from ..exceptions import DownloadCancelledError
+from .tracing import TRACER
+
+
+class RequestObservation:
+    """Quantities of a single request which are collected while the request is running"""
+
+    def __init__(self):
+        self.transferred_bytes = 0
+        self.retries = 0
+
+
+class EndpointMetrics:
+    """Metrics of requests to a single class of endpoints"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.transferred_bytes = 0
+        self.total_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_HISTOGRAM_BUCKETS) + 1)
+
+    def observe(self, seconds, transferred_bytes, retries, failed):
+        """Adds a finished request"""
+        self.requests += 1
+        self.errors += int(failed)
+        self.retries += retries
+        self.transferred_bytes += transferred_bytes
+        self.total_seconds += seconds
+        self.histogram[bisect.bisect_left(LATENCY_HISTOGRAM_BUCKETS, seconds)] += 1
+
+    def get_percentile(self, percentile):
+        """Estimates a latency percentile with an upper bound of the histogram bucket in which it falls
+
+        :param percentile: A number between 0 and 100
+        :type percentile: float
+        :return: A number of seconds, infinity if it falls into the last bucket or None if there are no requests
+        :rtype: float or None
+        """
+        if not self.requests:
+            return None
+
+        rank = percentile / 100 * self.requests
+        cumulative_count = 0
+        for upper_bound, count in zip((*LATENCY_HISTOGRAM_BUCKETS, float("inf")), self.histogram):
+            cumulative_count += count
+            if cumulative_count >= rank:
+                return upper_bound
+        return float("inf")
+
+    def to_dict(self):
+        """Provides metrics in a serializable form"""
+        bucket_names = [f"le_{upper_bound}" for upper_bound in LATENCY_HISTOGRAM_BUCKETS] + ["le_inf"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "bytes": self.transferred_bytes,
+            "mean_seconds": self.total_seconds / self.requests if self.requests else None,
+            "p50_seconds": self.get_percentile(50),
+            "p95_seconds": self.get_percentile(95),
+            "histogram": dict(zip(bucket_names, self.histogram)),
+        }
+
+
+class MetricsRegistry:
+    """Collects metrics of requests and statistics of registered caches"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._caches = {}
+        self._cache_baselines = {}
+
+    @contextmanager
+    def measure_request(self, url):
+        """A context manager which measures a request running inside its block. A request fails if the block raises
+        any exception except a cancellation. The request is also traced as a span.
+
+        :param url: A URL of the request, which decides the endpoint class
+        :type url: str
+        :return: An observation in which the block can collect transferred bytes and retries
+        :rtype: RequestObservation
+        """
+        endpoint_class = get_endpoint_class(url)
+        observation = RequestObservation()
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            with TRACER.span(endpoint_class, category="request", url=url):
+                yield observation
+        except DownloadCancelledError:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start_time
+            with self._lock:
+                endpoint_metrics = self._get_endpoint_metrics(endpoint_class)
+                endpoint_metrics.observe(seconds, observation.transferred_bytes, observation.retries, failed)
+
+    def count_coalesced_request(self, url):
+        """Counts a request which wasn't sent because it was coalesced with an identical request in flight"""
+        with self._lock:
+            self._get_endpoint_metrics(get_endpoint_class(url)).coalesced += 1
+
+    def register_cache(self, name, cache):
+        """Registers a cache, which has to provide a `get_stats` method returning at least numbers of hits and misses
+
+        :param name: A name under which cache statistics are reported
+        :type name: str
+        :param cache: A cache object
+        :type cache: object
+        """
+        with self._lock:
+            self._caches[name] = cache
+            self._cache_baselines.pop(name, None)
+
+    def get_metrics(self):
+        """Provides all collected metrics
+
+        :return: A dictionary with metrics of endpoint classes and statistics of caches
+        :rtype: dict
+        """
+        with self._lock:
+            endpoints = {name: metrics.to_dict() for name, metrics in sorted(self._endpoints.items())}
+            caches = dict(sorted(self._caches.items()))
+            cache_baselines = dict(self._cache_baselines)
+
+        cache_stats = {}
+        for name, cache in caches.items():
+            baseline = cache_baselines.get(name, {})
+            stats = {key: value - baseline.get(key, 0) for key, value in cache.get_stats().items()}
+            lookups = stats["hits"] + stats["misses"]
+            cache_stats[name] = {**stats, "hit_ratio": stats["hits"] / lookups if lookups else None}
+
+        return {"endpoints": endpoints, "caches": cache_stats}
+
+    def reset(self):
+        """Starts collecting metrics from scratch. Statistics of caches are reported relative to this moment."""
+        with self._lock:
+            self._endpoints.clear()
+            caches = dict(self._caches)
+
+        cache_baselines = {name: cache.get_stats() for name, cache in caches.items()}
+        with self._lock:
+            self._cache_baselines.update(cache_baselines)
+
+    def to_json(self):
+        """Exports metrics into a JSON string"""
+        return json.dumps(self.get_metrics(), indent=2)
+
+    def to_csv(self):
+        """Exports metrics into a CSV string with one value per row"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["section", "name", "metric", "value"])
+        for section, section_metrics in self.get_metrics().items():
+            for name, metrics in section_metrics.items():
+                for metric, value in _flatten(metrics):
+                    writer.writerow([section, name, metric, "" if value is None else value])
+        return output.getvalue()
+
+    def format_summary(self):
+        """Formats metrics into a human-readable text table"""
+        metrics = self.get_metrics()
+
+        lines = [
+            f"{'Endpoint':<14}{'Requests':>9}{'Errors':>8}{'Retries':>9}{'Merged':>8}{'MB':>9}{'Mean ms':>9}"
+            f"{'p95 ms':>9}"
+        ]
+        for name, endpoint in metrics["endpoints"].items():
+            mean_ms = "-" if endpoint["mean_seconds"] is None else f"{1000 * endpoint['mean_seconds']:.0f}"
+            p95_ms = "-" if endpoint["p95_seconds"] is None else f"<{1000 * endpoint['p95_seconds']:.0f}"
+            lines.append(
+                f"{name:<14}{endpoint['requests']:>9}{endpoint['errors']:>8}{endpoint['retries']:>9}"
+                f"{endpoint['coalesced']:>8}{endpoint['bytes'] / 1024**2:>9.2f}{mean_ms:>9}{p95_ms:>9}"
+            )
+
+        lines.extend(["", f"{'Cache':<20}{'Hits':>9}{'Misses':>9}{'Hit ratio':>11}"])
+        for name, cache in metrics["caches"].items():
+            hit_ratio = "-" if cache["hit_ratio"] is None else f"{100 * cache['hit_ratio']:.1f}%"
+            lines.append(f"{name:<20}{cache['hits']:>9}{cache['misses']:>9}{hit_ratio:>11}")
+
+        return "\n".join(lines)
+
+    def _get_endpoint_metrics(self, endpoint_class):
+        """Provides metrics of an endpoint class. It has to be called while holding the lock."""
+        endpoint_metrics = self._endpoints.get(endpoint_class)
+        if endpoint_metrics is None:
+            endpoint_metrics = EndpointMetrics()
+            self._endpoints[endpoint_class] = endpoint_metrics
+        return endpoint_metrics
+
+
+class LruCacheStats:
+    """Adapts a function decorated with `functools.lru_cache` so that it can be registered as a cache"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def get_stats(self):
+        """Provides numbers of cache hits and misses"""
+        cache_info = self.function.cache_info()
+        return {"hits": cache_info.hits, "misses": cache_info.misses}
+
+
+def get_endpoint_class(url):
+    """Decides to which class of Sentinel Hub service endpoints a URL belongs
+
+    :param url: A URL of a request
+    :type url: str
+    :rtype: str
+    """
+    url_parts = urlsplit(url)
+    path, query = url_parts.path.lower(), url_parts.query.lower()
+
+    if path.endswith("/token"):
+        return EndpointClass.OAUTH
+    if "/configuration/" in path:
+        return EndpointClass.CONFIGURATION
+    if "request=getcapabilities" in query:
+        return EndpointClass.CAPABILITIES
+    if "/ogc/wfs/" in path:
+        return EndpointClass.WFS
+    if "/ogc/wcs/" in path:
+        return EndpointClass.WCS
+    return EndpointClass.OTHER
+
+
+def _flatten(metrics, prefix=""):
+    """Flattens nested dictionaries of metrics into pairs of metric names and values"""
+    for name, value in metrics.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, prefix=f"{prefix}{name}.")
+        else:
+            yield f"{prefix}{name}", value
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,112 @@
+"""
+Opt-in profiling of plugin actions
+
+When profiling is enabled in settings, each action is run under a deterministic profiler. Its profile is written into
+a separate file, which can be inspected with `pstats` or tools such as SnakeViz, and a summary of the functions with
+the highest cumulative time is written into the QGIS message log. Most actions only submit a background task, which
+does the actual work in another thread. Such a task is profiled as a separate part of the same action.
+"""
+import cProfile
+import datetime as dt
+import glob
+import io
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+
+from qgis.core import QgsMessageLog
+
+from ..constants import PROFILE_MAX_FILES, PROFILE_SUMMARY_SIZE
+from .meta import get_cache_folder
+
+
+class ActionProfiler:
+    """Profiles actions and writes their profiles into a folder
+
+    Python can run only one profiler at a time, therefore an action which starts while another one is being profiled,
+    either a nested action or an action in another thread, isn't profiled separately. Only a part of an action, such
+    as its background task, waits for a while until the profiler is free.
+    """
+
+    def __init__(self, folder=None, summary_size=PROFILE_SUMMARY_SIZE, max_files=PROFILE_MAX_FILES):
+        """
+        :param folder: A folder into which profiles are written, by default it is a subfolder of the cache folder
+        :type folder: str or None
+        :param summary_size: A number of functions in a logged summary
+        :type summary_size: int
+        :param max_files: A maximal number of kept profile files, the oldest ones are removed
+        :type max_files: int
+        """
+        self.folder = folder
+        self.summary_size = summary_size
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def profile(self, name, part=None, timeout=0):
+        """A context manager which profiles its block, writes the profile and logs its summary
+
+        :param name: A name of the profiled action, which is used in the profile filename
+        :type name: str
+        :param part: A label of a part of the action, e.g. its background task. If None, the block is the action itself.
+        :type part: str or None
+        :param timeout: A number of seconds to wait for another profile to finish, otherwise the block isn't profiled
+        :type timeout: float
+        """
+        if not self._lock.acquire(timeout=timeout):
+            yield
+            return
+
+        try:
+            self._local.action_name = name
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self._save_profile(name, part, profiler)
+        finally:
+            self._local.action_name = None
+            self._lock.release()
+
+    def get_current_action(self):
+        """Provides a name of the action which is being profiled in the current thread
+
+        :return: An action name or None if nothing is being profiled in the current thread
+        :rtype: str or None
+        """
+        return getattr(self._local, "action_name", None)
+
+    def get_folder(self):
+        """Provides a folder of profile files. The folder is created if it doesn't exist yet."""
+        folder = self.folder or os.path.join(get_cache_folder(), "profiles")
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _save_profile(self, name, part, profiler):
+        """Writes a profile into a file, logs its summary and removes the oldest profile files"""
+        folder = self.get_folder()
+        timestamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        label = name if part is None else f"{name}-{part}"
+        path = os.path.join(folder, f"{timestamp}-{label}.prof")
+        profiler.dump_stats(path)
+
+        description = f"action {name}" if part is None else f"{part} of action {name}"
+        QgsMessageLog.logMessage(f"Profile of {description} written to {path}\n{self._get_summary(profiler)}")
+
+        profile_paths = sorted(glob.glob(os.path.join(folder, "*.prof")))
+        for old_path in profile_paths[: -self.max_files]:
+            os.remove(old_path)
+
+    def _get_summary(self, profiler):
+        """Provides a text table of the functions with the highest cumulative time"""
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.summary_size)
+        return stream.getvalue().strip()
+
+
+PROFILER = ActionProfiler()
@@ -0,0 +1,180 @@
+"""
+Utilities for running plugin actions in background QGIS tasks
+"""
+import contextlib
+
+from PyQt5.QtCore import pyqtSignal
+from qgis.core import QgsApplication, QgsTask
+
+from ..constants import PROFILE_TASK_WAIT_TIMEOUT
+from ..exceptions import handle_action_exception
+from .profiling import PROFILER
+from .tracing import TRACER
+
+
+class BackgroundTask(QgsTask):
+    """A QGIS task that runs a function in a background thread and passes its result to a callback in the main thread
+
+    The function receives the task object as the only parameter, which it can use to report progress, to report
+    partial results or to check if the task has been cancelled.
+
+    A task continues the trace span in which it was created, so that its work is traced as a part of the action that
+    submitted it. Similarly, a task submitted by a profiled action is profiled as a task part of that action.
+    """
+
+    partialResult = pyqtSignal(object)
+
+    def __init__(
+        self, description, function, on_success, suppressed_exceptions=(), on_finished=None, on_partial_result=None
+    ):
+        """
+        :param description: A description of the task, which is shown in QGIS task manager
+        :type description: str
+        :param function: A function to run in a background thread. It must not interact with UI.
+        :type function: callable
+        :param on_success: A function that is called in the main thread with a result of the background function
+        :type on_success: callable
+        :param suppressed_exceptions: A tuple of exceptions to suppress
+        :type suppressed_exceptions: tuple(Exception)
+        :param on_finished: A function called in the main thread once the task finishes in any way
+        :type on_finished: callable or None
+        :param on_partial_result: A function that is called in the main thread with each partial result reported by
+            the background function
+        :type on_partial_result: callable or None
+        """
+        super().__init__(description, QgsTask.CanCancel)
+        self.function = function
+        self.on_success = on_success
+        self.suppressed_exceptions = suppressed_exceptions
+        self.on_finished = on_finished
+
+        self.result = None
+        self.exception = None
+        self.is_stale = False
+
+        self.parent_span = TRACER.get_current_span()
+        if self.parent_span is not None:
+            TRACER.start_link(self.parent_span)
+        self.profiled_action = PROFILER.get_current_action()
+
+        if on_partial_result is not None:
+            self.partialResult.connect(
+                lambda partial_result: self._apply_partial_result(on_partial_result, partial_result)
+            )
+
+    def run(self):
+        """Runs in a background thread"""
+        try:
+            with TRACER.continue_span(self.parent_span), TRACER.span(self.description(), category="task"):
+                with self._profile():
+                    self.result = self.function(self)
+        except Exception as exception:  # pylint: disable=broad-except
+            self.exception = exception
+            return False
+        return True
+
+    def _profile(self):
+        """Provides a context manager which profiles the task if it was submitted by a profiled action"""
+        if self.profiled_action is None:
+            return contextlib.nullcontext()
+        return PROFILER.profile(self.profiled_action, part="task", timeout=PROFILE_TASK_WAIT_TIMEOUT)
+
+    def report_partial_result(self, partial_result):
+        """Reports a partial result from a background thread. It will be passed to the main thread."""
+        self.partialResult.emit(partial_result)
+
+    def _apply_partial_result(self, on_partial_result, partial_result):
+        """Applies a partial result in the main thread unless the task is already stale or cancelled"""
+        if self.is_stale or self.isCanceled():
+            return
+
+        try:
+            with TRACER.span(f"{self.description()}: partial result", category="ui"):
+                on_partial_result(partial_result)
+        except Exception as exception:  # pylint: disable=broad-except
+            handle_action_exception(exception, self.suppressed_exceptions)
+
+    def set_download_progress(self, downloaded_bytes, total_bytes):
+        """Sets task progress from a number of downloaded bytes. It can be used as a download progress callback."""
+        if total_bytes:
+            self.setProgress(100 * downloaded_bytes / total_bytes)
+
+    def finished(self, result):
+        """Runs in the main thread once the background function is done. Results of stale or cancelled tasks are
+        dropped."""
+        if self.on_finished is not None:
+            self.on_finished(self)
+
+        if self.is_stale or self.isCanceled():
+            return
+
+        try:
+            if not result:
+                raise self.exception
+            with TRACER.span(f"{self.description()}: result", category="ui"):
+                self.on_success(self.result)
+        except Exception as exception:  # pylint: disable=broad-except
+            handle_action_exception(exception, self.suppressed_exceptions)
+
+
+class TaskRunner:
+    """Submits background tasks to QGIS task manager
+
+    Tasks can be grouped by a key. When a new task with the same key is submitted, the previous one is cancelled and
+    its result won't be applied anymore.
+    """
+
+    def __init__(self):
+        self._running_tasks = set()
+        self._latest_tasks = {}
+
+    def run(self, description, function, on_success, key=None, suppressed_exceptions=(), on_partial_result=None):
+        """Runs a function in a background task
+
+        For parameters check `BackgroundTask`.
+
+        :param key: A key of a group of tasks in which only the latest task is relevant. If None, the task is
+            independent of all other tasks
+        :type key: str or None
+        :return: A submitted task
+        :rtype: BackgroundTask
+        """
+        if key is not None:
+            self.cancel(key)
+
+        task = BackgroundTask(
+            description,
+            function,
+            on_success,
+            suppressed_exceptions=suppressed_exceptions,
+            on_finished=self._forget,
+            on_partial_result=on_partial_result,
+        )
+        # A reference to a task has to be kept until the task finishes
+        self._running_tasks.add(task)
+        if key is not None:
+            self._latest_tasks[key] = task
+
+        QgsApplication.taskManager().addTask(task)
+        return task
+
+    def cancel(self, key):
+        """Cancels the latest task with a given key, if it is still running"""
+        task = self._latest_tasks.pop(key, None)
+        if task is not None:
+            task.is_stale = True
+            task.cancel()
+
+    def cancel_all(self):
+        """Cancels all running tasks"""
+        for task in list(self._running_tasks):
+            task.is_stale = True
+            task.cancel()
+        self._latest_tasks.clear()
+
+    def _forget(self, task):
+        """Stops tracking a finished task"""
+        self._running_tasks.discard(task)
+        for key, latest_task in list(self._latest_tasks.items()):
+            if latest_task is task:
+                del self._latest_tasks[key]
@@ -35,3 +35,12 @@ def get_month_time_interval(year: int, month: int) -> str:
     last_day = dt.date(year, month, number_of_days)
 
     return f"{first_day.isoformat()}/{last_day.isoformat()}/P1D"
+
+
+def get_year_time_interval(year: int) -> str:
+    """Provides a time interval for the given year
+
+    :param year: An integer representing a year.
+    :return: A string representing the time interval
+    """
+    return f"{dt.date(year, 1, 1).isoformat()}/{dt.date(year, 12, 31).isoformat()}/P1D"
@@ -0,0 +1,170 @@
+"""
+Tracing of plugin actions, from a UI event down to requests and expensive local steps
+
+Spans are recorded by a single process-wide tracer, `TRACER`. Each thread has its own stack of open spans, therefore a
+span opened inside another span on the same thread becomes its child. Background tasks continue the span in which they
+were submitted, which links them with the action that started them. Finished spans can be exported in Chrome
+trace-event format and inspected in chrome://tracing or in Perfetto.
+"""
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from ..constants import TRACE_MAX_EVENTS
+
+
+class Span:
+    """An open span"""
+
+    def __init__(self, span_id, name, category, parent_id):
+        self.id = span_id
+        self.name = name
+        self.category = category
+        self.parent_id = parent_id
+
+
+class Tracer:
+    """Records spans as Chrome trace events. Only a limited number of the most recent events is kept."""
+
+    def __init__(self, max_events=TRACE_MAX_EVENTS):
+        """
+        :param max_events: A maximal number of kept trace events
+        :type max_events: int
+        """
+        self._events = deque(maxlen=max_events)
+        self._span_ids = itertools.count(1)
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name, category="plugin", **args):
+        """A context manager which records a span of its block
+
+        :param name: A name of the span
+        :type name: str
+        :param category: A category of the span, e.g. action, task, request, parse
+        :type category: str
+        :param args: Additional values which are shown together with the span
+        :return: The open span
+        :rtype: Span
+        """
+        stack = self._get_stack()
+        parent = stack[-1] if stack else None
+        span = Span(next(self._span_ids), name, category, parent.id if parent else None)
+
+        stack.append(span)
+        start_time = _get_timestamp()
+        try:
+            yield span
+        finally:
+            end_time = _get_timestamp()
+            stack.pop()
+            self._add_event(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start_time,
+                    "dur": end_time - start_time,
+                    "args": {**args, "span_id": span.id, "parent_id": span.parent_id},
+                }
+            )
+
+    def get_current_span(self):
+        """Provides the innermost open span of the current thread or None if there is none"""
+        stack = self._get_stack()
+        return stack[-1] if stack else None
+
+    def start_link(self, span):
+        """Marks that work of the given span continues elsewhere, e.g. in a background task. It has to be called
+        inside the span."""
+        self._add_event({"name": span.name, "cat": span.category, "ph": "s", "id": span.id, "ts": _get_timestamp()})
+
+    @contextmanager
+    def continue_span(self, span):
+        """A context manager in which spans of the current thread become children of a span opened elsewhere
+
+        :param span: A span from another thread for which `start_link` was called, or None
+        :type span: Span or None
+        """
+        if span is None:
+            yield
+            return
+
+        stack = self._get_stack()
+        stack.append(span)
+        try:
+            with self.span(span.name, category=span.category, continued=True):
+                self._add_event(
+                    {
+                        "name": span.name,
+                        "cat": span.category,
+                        "ph": "f",
+                        "bp": "e",
+                        "id": span.id,
+                        "ts": _get_timestamp(),
+                    }
+                )
+                yield
+        finally:
+            stack.remove(span)
+
+    def get_events(self):
+        """Provides recorded trace events
+
+        :rtype: list(dict)
+        """
+        return list(self._events)
+
+    def clear(self):
+        """Removes all recorded events"""
+        self._events.clear()
+
+    def to_chrome_trace(self):
+        """Exports recorded events into a JSON string in Chrome trace-event format"""
+        return json.dumps({"traceEvents": self.get_events(), "displayTimeUnit": "ms"})
+
+    def _add_event(self, event):
+        """Adds an event of the current thread, appending to a bounded deque is thread-safe"""
+        self._events.append({**event, "pid": os.getpid(), "tid": threading.get_ident()})
+
+    def _get_stack(self):
+        """Provides a stack of open spans of the current thread"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+
+def traced(name=None, category="plugin"):
+    """A decorator which records a span for each call of a function
+
+    :param name: A name of spans, by default it is the name of the function
+    :type name: str or None
+    :param category: A category of spans
+    :type category: str
+    """
+
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def traced_function(*args, **kwargs):
+            with TRACER.span(span_name, category=category):
+                return function(*args, **kwargs)
+
+        return traced_function
+
+    return decorator
+
+
+def _get_timestamp():
+    """Provides a timestamp in microseconds, as required by Chrome trace-event format"""
+    return time.perf_counter_ns() // 1000
+
+
+TRACER = Tracer()